@@ -272,6 +272,12 @@ dbengine.html#create-engine-url-arguments>`_
     # initialize threading
     gobject.threads_init()
 
+    # memoise the partial parses, the infixNotation grammar of the
+    # search queries backtracks a lot without it.  this is a switch of
+    # pyparsing itself, it holds for every grammar in the process.
+    from pyparsing import ParserElement
+    ParserElement.enablePackrat()
+
     try:
         import bauble.db as db
     except Exception, e:
@@ -178,6 +178,7 @@ class ConnMgrPresenter(GenericEditorPresenter):
         'host_entry': 'host',
         'user_entry': 'user',
         'passwd_chkbx': 'passwd',
+        'performance_chkbx': 'performance',
         'pictureroot2_entry': 'pictureroot',
         'pictureroot_entry': 'pictureroot',
         }
@@ -189,7 +190,7 @@ class ConnMgrPresenter(GenericEditorPresenter):
             self.pictureroot = self.connection_name = \
             self.prev_connection_name = None
         self.use_defaults = True
-        self.passwd = False
+        self.passwd = self.performance = False
         ## following two look like overkill, since they will be initialized
         ## in the parent class constructor. but we need these attributes in
         ## place before we can invoke get_params
@@ -462,6 +463,8 @@ class ConnMgrPresenter(GenericEditorPresenter):
         if params['type'].lower() == "sqlite":
             filename = params['file'].replace('\\', '/')
             uri = "sqlite:///" + filename
+            if params.get('performance'):
+                uri += '?profile=performance'
             return uri
         subs['type'] = params['type'].lower()
         if 'port' in params:
@@ -568,6 +571,9 @@ class ConnMgrPresenter(GenericEditorPresenter):
             result = {'file': self.filename,
                       'default': self.use_defaults,
                       'pictures': self.pictureroot}
+            # absent, not False, so older connections do not look changed
+            if self.performance:
+                result['performance'] = True
         else:
             result = {'db': self.database,
                       'host': self.host,
@@ -586,6 +592,7 @@ class ConnMgrPresenter(GenericEditorPresenter):
             self.filename = params['file']
             self.use_defaults = params['default']
             self.pictureroot = params.get('pictures', '')
+            self.performance = params.get('performance', False)
         else:
             self.database = params['db']
             self.host = params['host']
@@ -24,9 +24,12 @@ logger = logging.getLogger(__name__)
 
 from sqlalchemy.orm import class_mapper
 
+from contextlib import contextmanager
+from functools import partial
 import datetime
 import os
 import re
+import sys
 import bauble.error as error
 from bauble.i18n import _
 
@@ -66,6 +69,13 @@ def sqlalchemy_debug(verbose):
 SQLALCHEMY_DEBUG = False
 sqlalchemy_debug(SQLALCHEMY_DEBUG)
 
+TRACK_SESSIONS = False
+"""
+When True at :func:`bauble.db.open`, every session remembers where it
+was created, see :class:`TrackedSession`.  A diagnostic, to find the
+sessions that are never closed.
+"""
+
 
 def get_or_create(session, model, **kwargs):
     instance = session.query(model).filter_by(**kwargs).first()
@@ -101,6 +111,134 @@ def natsort(attr, obj):
     return sorted(obj, key=utils.natsort_key)
 
 
+def natsort_value_key(value):
+    """a natsort key for a column value, which can be None or unicode
+    """
+    from bauble import utils
+    if value is None:
+        return utils.natsort_key('')
+    return utils.natsort_key(utils.utf8(value).encode('utf-8'))
+
+
+def natsort_row_key(row):
+    """the key sorting (id, value, ...) rows naturally on their values,
+    then on their id
+    """
+    return [natsort_value_key(value) for value in row[1:]] + [row[0]]
+
+
+def order_by_rows(query, order_by):
+    """return the (id, value, ...) rows of the objects selected by query,
+    with the values of their order_by attributes
+
+    order_by is a list of attribute names of the class of the query, a
+    name can also be a path through many-to-one relations, which are
+    then outer joined in the query, once per path.
+    """
+    target = query.column_descriptions[0]['type']
+    joined = {(): target}
+    order = []
+    for name in order_by:
+        steps = tuple(name.split('.'))
+        for i in range(1, len(steps)):
+            if steps[:i] not in joined:
+                relation = getattr(joined[steps[:i - 1]], steps[i - 1])
+                query = query.outerjoin(relation)
+                joined[steps[:i]] = relation.property.mapper.class_
+        order.append(getattr(joined[steps[:-1]], steps[-1]))
+    return query.with_entities(target.id, *order).all()
+
+
+class SortedChildren(object):
+    """the objects of klass having ids, in the order of ids
+
+    a list-like object whose objects are loaded when it is sliced, one
+    query per slice.
+    """
+
+    def __init__(self, session, klass, ids):
+        self.session = session
+        self.klass = klass
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1 or None][0]
+        ids = self.ids[index]
+        objs = dict((obj.id, obj)
+                    for obj in get_by_ids(self.session, self.klass, ids))
+        # objects deleted in the meantime are skipped
+        return [objs[i] for i in ids if i in objs]
+
+
+def sorted_query(query, order_by):
+    """return the objects selected by query naturally sorted on their
+    order_by attributes, see order_by_rows, as a SortedChildren
+    """
+    rows = order_by_rows(query, order_by)
+    rows.sort(key=natsort_row_key)
+    return SortedChildren(query.session,
+                          query.column_descriptions[0]['type'],
+                          [row[0] for row in rows])
+
+
+def sorted_children(attr, order_by, obj):
+    """return the objects in a relation of obj, naturally sorted
+
+    meant to be curried, like natsort, which loads and sorts all the
+    objects in python.  this function selects only the ids and the
+    order_by values of the objects, sorts them like natsort, so 10
+    comes after 2, and returns a SortedChildren, so the objects can be
+    fetched a page at a time by slicing it.
+
+    attr is like in natsort, the name of the relation or a path to it.
+    order_by is like in order_by_rows, the names of the attributes of
+    the related class to sort on.
+
+    e.g.:
+    from functools import partial
+    partial(sorted_children, 'plants', ['accession.code', 'code'])(location)
+    """
+    jumps = attr.split('.')
+    for attr in jumps[:-1]:
+        obj = getattr(obj, attr)
+    relation = getattr(type(obj), jumps[-1])
+    target = relation.property.mapper.class_
+    return sorted_query(orm.object_session(obj).query(target).
+                        with_parent(obj, jumps[-1]), order_by)
+
+
+def _current_user(connection):
+    """
+    Return the name of the user making changes through `connection`.
+
+    The name is computed once per DBAPI connection and kept in the
+    connection info dictionary.
+    """
+    try:
+        return connection.info['bauble.current_user']
+    except KeyError:
+        pass
+    user = None
+    try:
+        if connection.engine.name.startswith('sqlite'):
+            raise TypeError("this engine know nothing of users")
+        user = connection.execute('select current_user;').scalar()
+    except:
+        if 'USER' in os.environ and os.environ['USER']:
+            user = os.environ['USER']
+        elif 'USERNAME' in os.environ and os.environ['USERNAME']:
+            user = os.environ['USERNAME']
+    connection.info['bauble.current_user'] = user
+    return user
+
+
 class HistoryExtension(orm.MapperExtension):
     """
     HistoryExtension is a
@@ -108,40 +246,147 @@ class HistoryExtension(orm.MapperExtension):
     to all clases that inherit from bauble.db.Base so that all
     inserts, updates, and deletes made to the mapped objects are
     recorded in the `history` table.
+
+    The history rows are collected in the session while it flushes and
+    written with a single executemany when the flush is over, see
+    :func:`_write_history`.
     """
-    def _add(self, operation, mapper, instance):
+    def _add(self, operation, mapper, connection, instance):
         """
-        Add a new entry to the history table.
+        Add a new entry to the pending history rows of the session.
         """
-        user = None
-        try:
-            if engine.name.startswith('sqlite'):
-                raise TypeError("this engine know nothing of users")
-            import bauble.plugins.users as users
-            user = users.current_user()
-        except:
-            if 'USER' in os.environ and os.environ['USER']:
-                user = os.environ['USER']
-            elif 'USERNAME' in os.environ and os.environ['USERNAME']:
-                user = os.environ['USERNAME']
-
         row = {}
         for c in mapper.local_table.c:
             row[c.name] = utils.utf8(getattr(instance, c.name))
-        table = History.__table__
-        table.insert(dict(table_name=mapper.local_table.name,
-                          table_id=instance.id, values=str(row),
-                          operation=operation, user=user,
-                          timestamp=datetime.datetime.today())).execute()
+        entry = dict(table_name=mapper.local_table.name,
+                     table_id=instance.id, values=str(row),
+                     operation=operation, user=_current_user(connection),
+                     timestamp=datetime.datetime.today())
+        session = orm.object_session(instance)
+        if session is None:
+            connection.execute(History.__table__.insert(), entry)
+        else:
+            session.info.setdefault(_HISTORY_ROWS_KEY, []).append(entry)
 
     def after_update(self, mapper, connection, instance):
-        self._add('update', mapper, instance)
+        self._add('update', mapper, connection, instance)
 
     def after_insert(self, mapper, connection, instance):
-        self._add('insert', mapper, instance)
+        self._add('insert', mapper, connection, instance)
 
     def after_delete(self, mapper, connection, instance):
-        self._add('delete', mapper, instance)
+        self._add('delete', mapper, connection, instance)
+
+
+_HISTORY_ROWS_KEY = 'bauble.history_rows'
+
+history_listeners = []
+"""callables invoked with the set of the table names whose changes have
+just been written to the history table, or that have been bulk loaded
+without going through the history"""
+
+
+def _clear_history(session, flush_context, instances):
+    """drop the history rows left over by a flush that failed"""
+    session.info.pop(_HISTORY_ROWS_KEY, None)
+
+
+def _write_history(session, flush_context):
+    """write the history rows collected during the flush"""
+    rows = session.info.pop(_HISTORY_ROWS_KEY, None)
+    if rows:
+        session.execute(History.__table__.insert(), rows)
+        tables = set(row['table_name'] for row in rows)
+        for listener in history_listeners:
+            listener(tables)
+
+
+sa.event.listen(orm.Session, 'before_flush', _clear_history)
+sa.event.listen(orm.Session, 'after_flush', _write_history)
+
+
+def merge_top_level_count(total, count):
+    """merge the top level count dictionary `count` into `total`
+
+    set values are joined, numeric values are added.  `total` is
+    modified in place and returned.
+    """
+    for k, v in count.items():
+        if isinstance(v, set):
+            total[k] = v.union(total.get(k, set()))
+        else:
+            total[k] = v + total.get(k, 0)
+    return total
+
+
+def _top_level_count_by_objects(cls, session, ids):
+    """default top_level_count_by_ids: merge the per-object counts
+
+    this is the slow path, it loads every object and walks its
+    relations.  classes with many related objects should override
+    top_level_count_by_ids with set based queries.
+    """
+    result = {}
+    for obj in session.query(cls).filter(cls.id.in_(ids)):
+        merge_top_level_count(result, obj.top_level_count())
+    return result
+
+
+# the maximum number of ids passed in a single IN clause, older SQLite
+# versions do not accept more than 999 bound parameters per statement
+MAX_IN_IDS = 500
+TOP_LEVEL_COUNT_CHUNK = MAX_IN_IDS
+
+
+def get_by_ids(session, klass, ids):
+    """return the list of `klass` objects having the given ids
+
+    objects are loaded with one IN query per MAX_IN_IDS ids, the order
+    of the result is not specified.
+    """
+    ids = list(ids)
+    result = []
+    for start in range(0, len(ids), MAX_IN_IDS):
+        chunk = ids[start:start + MAX_IN_IDS]
+        result.extend(session.query(klass).filter(klass.id.in_(chunk)))
+    return result
+
+
+def class_of_table(table_name):
+    """return the class mapped to the table named table_name, or None
+    """
+    for klass in Base._decl_class_registry.values():
+        if getattr(klass, '__tablename__', None) == table_name:
+            return klass
+    return None
+
+
+def top_level_count(session, items, cancelled=None):
+    """compute the top level count of a list of database objects
+
+    :param session: the session used to run the count queries
+    :param items: a list of (class, id) pairs
+    :param cancelled: optional callable, when it returns True the count
+        is interrupted and None is returned
+
+    the result has the same shape as the merge of the
+    `top_level_count()` dictionaries of the single objects, but it is
+    computed by the `top_level_count_by_ids` class methods, in chunks
+    of TOP_LEVEL_COUNT_CHUNK ids per class.
+    """
+    by_class = {}
+    for klass, obj_id in items:
+        by_class.setdefault(klass, set()).add(obj_id)
+    result = {}
+    for klass, ids in by_class.items():
+        ids = sorted(ids)
+        for start in range(0, len(ids), TOP_LEVEL_COUNT_CHUNK):
+            if cancelled is not None and cancelled():
+                return None
+            chunk = ids[start:start + TOP_LEVEL_COUNT_CHUNK]
+            merge_top_level_count(
+                result, klass.top_level_count_by_ids(session, chunk))
+    return result
 
 
 class MapperBase(DeclarativeMeta):
@@ -166,6 +411,9 @@ class MapperBase(DeclarativeMeta):
             cls.__mapper_args__ = {'extension': HistoryExtension()}
         if 'top_level_count' not in dict_:
             cls.top_level_count = lambda x: {classname: 1}
+        if 'top_level_count_by_ids' not in dict_:
+            cls.top_level_count_by_ids = classmethod(
+                _top_level_count_by_objects)
         if 'search_view_markup_pair' not in dict_:
             cls.search_view_markup_pair = lambda x: (
                 utils.xml_safe(str(x)),
@@ -192,9 +440,26 @@ Session use::Uncategorized
 When you are finished with the session be sure to close the session
 with :func:`session.close()`. Failure to close sessions can lead to
 database deadlocks, particularly when using PostgreSQL based
-databases.
+databases.  Worker threads should get their session from
+:func:`bauble.db.session_scope()`, which closes it for them.
 """
 
+class TrackedSession(orm.Session):
+    """
+    A session that records the file, line and function that created it
+    in `created_at`, and logs it.  Only the calling frame is looked at.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TrackedSession, self).__init__(*args, **kwargs)
+        # 0 is here, 1 is the sessionmaker
+        frame = sys._getframe(2)
+        self.created_at = (frame.f_code.co_filename, frame.f_lineno,
+                           frame.f_code.co_name)
+        del frame
+        logger.debug('creating session %s:%s in %s' % self.created_at)
+
+
 Base = declarative_base(metaclass=MapperBase)
 """
 All tables/mappers in Ghini which use the SQLAlchemy declarative
@@ -235,8 +500,20 @@ class History(history_base):
         The name of the user who made the change.
       timestamp: :class:`sqlalchemy.types.DateTime`
         When the change was made.
+
+    The rows are browsed from the newest, by (timestamp, id), see
+    :class:`bauble.view.HistoryView`, and can be narrowed with
+    :meth:`History.filtered`.  The indexes of the table cover both.
     """
     __tablename__ = 'history'
+    __table_args__ = (
+        sa.Index('history_timestamp_id', 'timestamp', 'id'),
+        # mysql only indexes the beginning of a text column
+        sa.Index('history_table_name_table_id', 'table_name', 'table_id',
+                 mysql_length={'table_name': 255}),
+        sa.Index('history_user_timestamp', 'user', 'timestamp',
+                 mysql_length={'user': 255}),
+        )
     id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
     table_name = sa.Column(sa.Text, nullable=False)
     table_id = sa.Column(sa.Integer, nullable=False, autoincrement=False)
@@ -245,6 +522,132 @@ class History(history_base):
     user = sa.Column(sa.Text)
     timestamp = sa.Column(types.DateTime, nullable=False)
 
+    @classmethod
+    def filtered(cls, session, table_name=None, table_id=None, user=None,
+                 since=None, until=None):
+        """
+        Return a query of the history rows, narrowed to the changes to
+        table_name, to its row table_id, made by user, from since up to
+        but excluding until.  The arguments left to None do not narrow
+        the query.
+        """
+        q = session.query(cls)
+        if table_name is not None:
+            q = q.filter(cls.table_name == table_name)
+        if table_id is not None:
+            q = q.filter(cls.table_id == table_id)
+        if user is not None:
+            q = q.filter(cls.user == user)
+        if since is not None:
+            q = q.filter(cls.timestamp >= since)
+        if until is not None:
+            q = q.filter(cls.timestamp < until)
+        return q
+
+
+# the pool of connections to a database server: how many connections
+# stay open, how many more may be opened while they are all in use, and
+# after how many seconds a connection is replaced
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_RECYCLE = 3600
+
+
+def engine_options(uri):
+    """
+    Return the keyword arguments to :func:`sqlalchemy.create_engine`
+    that choose the connection pool for the database at uri.
+
+    The connections to a database server are kept in a bounded
+    QueuePool, that hands them to whatever thread needs one.  A SQLite
+    file keeps a single connection open and opens more only while it
+    is in use by another thread.  The sessions must give it back as
+    soon as they are done: the worker threads close theirs, see
+    session_scope(), and the long lived session of the SearchView ends
+    its read only transactions when the GUI is idle.  Each connection
+    to an in-memory SQLite database is a database of its own, so there
+    every thread keeps its connection.
+    """
+    from sqlalchemy.engine.url import make_url
+    from sqlalchemy.pool import QueuePool, SingletonThreadPool
+    url = make_url(uri)
+    if url.drivername.split('+')[0] != 'sqlite':
+        return dict(poolclass=QueuePool, pool_size=POOL_SIZE,
+                    max_overflow=POOL_MAX_OVERFLOW, pool_recycle=POOL_RECYCLE)
+    if url.database in (None, '', ':memory:'):
+        return dict(poolclass=SingletonThreadPool, pool_size=20)
+    return dict(poolclass=QueuePool, pool_size=1,
+                max_overflow=POOL_MAX_OVERFLOW,
+                connect_args={'check_same_thread': False})
+
+
+# the pragmas set on every connection to a SQLite file, by the name of
+# the profile given in the database uri, as in
+# sqlite:///path/to/file.db?profile=performance
+#
+# WAL, the write ahead log, needs a single computer: don't use it for
+# files on a network share.
+SQLITE_PROFILES = {
+    'performance': [('journal_mode', 'WAL'),
+                    ('synchronous', 'NORMAL'),
+                    ('cache_size', -65536),  # in KiB
+                    ('mmap_size', 268435456),
+                    ('temp_store', 'MEMORY'),
+                    ('foreign_keys', 'ON')],
+    }
+
+
+def _set_pragmas(pragmas, dbapi_connection, connection_record):
+    """
+    Set the (name, value) pragmas on a new SQLite connection.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+    finally:
+        cursor.close()
+
+
+def _ping_connection(connection, branch):
+    """
+    Make sure that a connection taken from the pool still reaches the
+    server, replacing it if it does not.
+    """
+    if branch:
+        return
+    # the ping must not close the connection
+    should_close_with_result = connection.should_close_with_result
+    connection.should_close_with_result = False
+    try:
+        connection.scalar(sa.select([1]))
+    except sa.exc.DBAPIError, e:
+        if not e.connection_invalidated:
+            raise
+        # the pool has been emptied, this connects again
+        connection.scalar(sa.select([1]))
+    finally:
+        connection.should_close_with_result = should_close_with_result
+
+
+@contextmanager
+def session_scope():
+    """
+    Return a context manager for a Session to use in a worker thread::
+
+        with db.session_scope() as session:
+            ...
+
+    The session is closed when the block is left, so that its
+    connection goes back to the pool right away.  Commit what needs to
+    be kept inside the block, the rest is rolled back.
+    """
+    session = Session()
+    try:
+        yield session
+    finally:
+        session.close()
+
 
 def open(uri, verify=True, show_error_dialogs=False):
     """
@@ -254,7 +657,9 @@ def open(uri, verify=True, show_error_dialogs=False):
     Return bauble.db.engine if successful else returns None and
     bauble.db.engine remains unchanged.
 
-    :param uri: The URI of the database to open.
+    :param uri: The URI of the database to open.  The URI of a SQLite
+        database may name one of the SQLITE_PROFILES, as in
+        sqlite:///ghini.db?profile=performance
     :type uri: str
 
     :param verify: Where the database we connect to should be verified
@@ -270,16 +675,23 @@ def open(uri, verify=True, show_error_dialogs=False):
     # ** WARNING: this can print your passwd
     logger.debug('db.open(%s)' % uri)
     from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.engine.url import make_url
     global engine
     new_engine = None
 
-    from sqlalchemy.pool import NullPool, SingletonThreadPool
-    from bauble.prefs import testing
-    poolclass = testing and SingletonThreadPool or NullPool
-    poolclass = SingletonThreadPool
-    new_engine = sa.create_engine(uri, echo=SQLALCHEMY_DEBUG,
+    url = make_url(uri)
+    # the profile is ours, the database driver does not know it
+    profile = url.query.pop('profile', None)
+    new_engine = sa.create_engine(url, echo=SQLALCHEMY_DEBUG,
                                   implicit_returning=False,
-                                  poolclass=poolclass, pool_size=20)
+                                  **engine_options(url))
+    if new_engine.dialect.name != 'sqlite':
+        sa.event.listen(new_engine, 'engine_connect', _ping_connection)
+    elif profile is not None:
+        if profile not in SQLITE_PROFILES:
+            logger.warning('unknown sqlite profile %s' % profile)
+        sa.event.listen(new_engine, 'connect',
+                        partial(_set_pragmas, SQLITE_PROFILES.get(profile, [])))
     # TODO: there is a problem here: the code may cause an exception, but we
     # immediately loose the 'new_engine', which should know about the
     # encoding used in the exception string.
@@ -294,12 +706,9 @@ def open(uri, verify=True, show_error_dialogs=False):
         global Session, engine
         engine = new_engine
         metadata.bind = engine  # make engine implicit for metadata
-        def temp():
-            import inspect
-            logger.debug('creating session %s' % str(inspect.stack()[1]))
-            return sessionmaker(bind=engine, autoflush=False)()
-        Session = sessionmaker(bind=engine, autoflush=False)
-        Session = temp
+        session_class = TrackedSession if TRACK_SESSIONS else orm.Session
+        Session = sessionmaker(bind=engine, autoflush=False,
+                               class_=session_class)
 
     if new_engine is not None and not verify:
         _bind()
@@ -312,6 +721,90 @@ def open(uri, verify=True, show_error_dialogs=False):
     return engine
 
 
+def _leading_columns(table):
+    """
+    Return the names of the columns of table that come first in its
+    primary key, one of its indexes or one of its unique constraints.
+    """
+    leading = set()
+    constraints = [table.primary_key] + list(table.indexes) + [
+        c for c in table.constraints if isinstance(c, sa.UniqueConstraint)]
+    for constraint in constraints:
+        columns = list(constraint.columns)
+        if columns:
+            leading.add(columns[0].name)
+    return leading
+
+
+def index_foreign_keys(tables=None):
+    """
+    Declare an index on every foreign key column of tables, by default
+    all the tables in the metadata, that is not already the first column
+    of the primary key, an index or a unique constraint.  The indexes
+    are named like the ones of Column(index=True).
+
+    This is called before creating the tables, after the plugins have
+    defined theirs.  Return the new indexes.
+    """
+    if tables is None:
+        tables = metadata.sorted_tables
+    declared = []
+    for table in tables:
+        leading = _leading_columns(table)
+        for fk in table.foreign_keys:
+            name = fk.parent.name
+            if name in leading:
+                continue
+            declared.append(sa.Index('ix_%s_%s' % (table.name, name),
+                                     fk.parent))
+            leading.add(name)
+    return declared
+
+
+def missing_indexes(connection):
+    """
+    Return the indexes declared in the metadata that the database at
+    connection lacks.  An index is found by its columns, whatever its
+    name, and a unique constraint on the same columns will do.  The
+    tables missing from the database are not looked at.
+    """
+    index_foreign_keys()
+    inspector = sa.inspect(connection)
+    table_names = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        live = set(tuple(index['column_names'])
+                   for index in inspector.get_indexes(table.name))
+        try:
+            live.update(tuple(constraint['column_names']) for constraint
+                        in inspector.get_unique_constraints(table.name))
+        except NotImplementedError:
+            pass
+        live.add(tuple(inspector.get_pk_constraint(table.name)
+                       ['constrained_columns']))
+        missing.extend(index for index in table.indexes
+                       if tuple(c.name for c in index.columns) not in live)
+    return missing
+
+
+def create_missing_indexes():
+    """
+    Create in the current database the indexes that it lacks, as for
+    a database created before they were declared.  Return the names of
+    the created indexes.
+    """
+    if not engine:
+        raise ValueError('engine is None, not connected to a database')
+    with engine.begin() as connection:
+        missing = missing_indexes(connection)
+        for index in missing:
+            logger.info('creating index %s' % index.name)
+            index.create(bind=connection)
+    return [index.name for index in missing]
+
+
 def create(import_defaults=True):
     """
     Create new Ghini database at the current connection
@@ -340,6 +833,7 @@ def create(import_defaults=True):
         # really only be creating those tables from registered
         # plugins, maybe with an uninstall() method on Plugin
         metadata.drop_all(bind=connection, checkfirst=True)
+        index_foreign_keys()
         metadata.create_all(bind=connection)
 
         # fill in the bauble meta table and install all the plugins
@@ -515,19 +1009,18 @@ class WithNotes:
 
 class DefiningPictures:
 
+    @property
+    def picture_names(self):
+        '''the names of the pictures in the notes, as the picture notes
+        hold them
+        '''
+        return [n.note for n in self.notes if n.category == '<picture>']
+
     @property
     def pictures(self):
         '''a list of gtk.Image objects
         '''
-
-        result = []
-        for n in self.notes:
-            if n.category != '<picture>':
-                continue
-            box = gtk.VBox()  # contains the image or the error message
-            utils.ImageLoader(box, n.note).start()
-            result.append(box)
-        return result
+        return [utils.picture_box(name) for name in self.picture_names]
 
 
 class Serializable:
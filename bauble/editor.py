@@ -22,9 +22,11 @@
 # editors for Ghini data
 #
 
+import bisect
 import datetime
 import os
 import sys
+import time
 import weakref
 
 import logging
@@ -39,7 +41,8 @@ from random import random
 import dateutil.parser as date_parser
 import lxml.etree as etree
 import pango
-from sqlalchemy.orm import object_mapper, object_session
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_mapper, object_session
 from sqlalchemy.orm.exc import UnmappedInstanceError
 
 from bauble.i18n import _
@@ -48,6 +51,7 @@ import bauble.db as db
 from bauble.error import check
 import bauble.paths as paths
 import bauble.prefs as prefs
+import bauble.sqlprofile as sqlprofile
 import bauble.utils as utils
 from bauble.error import CheckConditionError
 from types import StringTypes
@@ -197,6 +201,141 @@ def default_completion_match_func(completion, key_string, treeiter):
     return str(value).lower().startswith(key_string.lower())
 
 
+class CompletionIndex(object):
+    """
+    An in-memory prefix index of the names of a mapped class.
+
+    The index is a sorted list of lowercased keys with the id of the
+    object each key belongs to, so that finding the objects whose name
+    starts with the text typed in an entry is a binary search instead of
+    a LIKE query per key stroke.  It is built on first use, in the
+    session of the caller, so an editor finds the objects it flushed
+    but did not commit yet.  It is dropped when a flush in this process
+    writes to one of `tables`, and again when that change is committed,
+    and it is checked against the history table every `max_age` seconds
+    to pick up the changes made by other connections.
+
+    :param klass: the mapped class of the indexed objects
+    :param key_query: a callable that accepts a session and returns an
+      iterable of (key, id) pairs, in the order the completions should
+      be offered
+    :param tables: the names of the tables whose changes invalidate
+      the index
+
+    The index listens to the flushes and commits until close() is
+    called.
+    """
+
+    max_age = 60
+
+    # incremented each time an index is dropped, what was computed from
+    # an index is out of date when this changes
+    generation = 0
+
+    def __init__(self, klass, key_query, tables):
+        self.klass = klass
+        self.key_query = key_query
+        self.tables = set(tables)
+        self.keys = None
+        self.ids = None
+        self.engine = None
+        self.history_id = None
+        self.checked = 0
+        # a change to the tables was flushed and not committed yet
+        self.uncommitted = False
+        db.history_listeners.append(self.on_history)
+        event.listen(Session, 'after_commit', self.on_commit)
+
+    def close(self):
+        """stop listening to the flushes and commits and drop the index
+        """
+        if self.on_history in db.history_listeners:
+            db.history_listeners.remove(self.on_history)
+        if event.contains(Session, 'after_commit', self.on_commit):
+            event.remove(Session, 'after_commit', self.on_commit)
+        self.invalidate()
+
+    def on_history(self, tables):
+        if self.tables.intersection(tables):
+            self.uncommitted = True
+            self.invalidate()
+
+    def on_commit(self, session):
+        # the index may have been rebuilt in another session before the
+        # change was committed, without it
+        if self.uncommitted:
+            self.uncommitted = False
+            self.invalidate()
+
+    def invalidate(self):
+        self.keys = self.ids = None
+        CompletionIndex.generation += 1
+
+    def _last_history_id(self, session):
+        return session.query(func.max(db.History.id)).scalar()
+
+    def _refresh(self, session=None):
+        now = time.time()
+        own_session = session is None
+        if own_session:
+            session = db.Session()
+        try:
+            if self.keys is not None and self.engine is db.engine:
+                if now - self.checked < self.max_age:
+                    return
+                self.checked = now
+                if self._last_history_id(session) == self.history_id:
+                    return
+            self.history_id = self._last_history_id(session)
+            pairs = [(utils.to_unicode(key).lower(), id)
+                     for key, id in self.key_query(session) if key]
+        finally:
+            if own_session:
+                session.close()
+        # sort is stable, equal keys keep the order of key_query
+        pairs.sort(key=lambda pair: pair[0])
+        self.keys = [key for key, id in pairs]
+        self.ids = [id for key, id in pairs]
+        self.engine = db.engine
+        self.checked = now
+
+    def get_ids(self, prefix, exact=False, session=None):
+        """return the ids of the objects with a key starting with prefix
+
+        if exact is True only return the ids of the objects whose key is
+        prefix, still compared case insensitively.  an index out of date
+        is rebuilt in session, or in a session of its own.
+        """
+        self._refresh(session)
+        prefix = utils.to_unicode(prefix).lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        if exact:
+            end = bisect.bisect_right(self.keys, prefix, start)
+        else:
+            end = start
+            while end < len(self.keys) and self.keys[end].startswith(prefix):
+                end += 1
+        result = []
+        seen = set()
+        for id in self.ids[start:end]:
+            if id not in seen:
+                seen.add(id)
+                result.append(id)
+        return result
+
+    def get(self, session, prefix, exclude=None, exact=False):
+        """return the objects with a key starting with prefix
+
+        the objects are loaded in session with chunked IN queries and
+        returned in index order, the object with id exclude is skipped.
+        """
+        ids = [id for id in self.get_ids(prefix, exact, session)
+               if id != exclude]
+        objs = dict((obj.id, obj)
+                    for obj in db.get_by_ids(session, self.klass, ids))
+        return [objs[id] for id in ids if id in objs]
+
+
 class GenericEditorView(object):
     """
     A generic class meant (not) to be subclassed, to provide the view
@@ -1106,7 +1245,8 @@ class GenericEditorPresenter(object):
         '''
         objs = list(self.session)
         try:
-            self.session.flush()
+            with sqlprofile.operation('commit %s' % type(self).__name__):
+                self.session.flush()
             try:
                 bauble.gui.get_view().update()
             except Exception, e:
@@ -1530,6 +1670,9 @@ class GenericEditorPresenter(object):
         if not isinstance(widget, gtk.Entry):
             widget = self.view.widgets[widget]
         PROBLEM = hash(gtk.Buildable.get_name(widget))
+        # the key the current completions were computed for, and the
+        # CompletionIndex.generation then
+        completed = {}
 
         def add_completions(text):
             if get_completions is None:
@@ -1550,7 +1693,14 @@ class GenericEditorPresenter(object):
                 completion.set_model(completion_model)
 
             key_length = widget.get_completion().props.minimum_key_length
-            values = get_completions(text[:key_length])
+            key = text[:key_length]
+            if completed.get('key') == key and \
+                    completed.get('generation') == CompletionIndex.generation:
+                # the completion model already holds these completions
+                return
+            completed['key'] = key
+            completed['generation'] = CompletionIndex.generation
+            values = get_completions(key)
             logger.debug('completions to add: %s' % str([i for i in values]))
             gobject.idle_add(idle_callback, values)
 
@@ -1726,7 +1876,8 @@ class GenericModelViewPresenterEditor(object):
         '''
         objs = list(self.session)
         try:
-            self.session.commit()
+            with sqlprofile.operation('commit %s' % type(self).__name__):
+                self.session.commit()
             try:
                 bauble.gui.get_view().update()
             except Exception, e:
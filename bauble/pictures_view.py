@@ -41,6 +41,10 @@ class PicturesView(gtk.HBox):
     raises an exception because it does not define the 'pictures'
     property), the PicturesView object will silently accept the failure.
 
+    the pictures are shown by name, from the 'picture_names' property
+    of the objects, so that a picture that stays in the selection keeps
+    its widget and only the pictures new to the selection are loaded.
+
     """
 
     def __init__(self, parent=None, fake=False):
@@ -60,29 +64,49 @@ class PicturesView(gtk.HBox):
         parent.add(self.widgets.scrolledwindow2)
         parent.show_all()
         self.widgets.scrolledwindow2.show()
+        # the widget of each picture in view, by name
+        self.shown = {}
 
     def set_selection(self, selection):
         logger.debug("PicturesView.set_selection(%s)" % selection)
         if self.fake:
             return
         self.box = self.widgets.pictures_box
-        for k in self.box.children():
-            k.destroy()
 
+        # the picture names, or the picture widgets of the objects that
+        # only define 'pictures', in the order of the selection
+        wanted = []
         for o in selection:
             try:
-                pics = o.pictures
+                pics = o.picture_names
             except AttributeError:
-                logger.debug('object %s does not know of pictures' % o)
-                pics = []
+                try:
+                    pics = o.pictures
+                except AttributeError:
+                    logger.debug('object %s does not know of pictures' % o)
+                    pics = []
             for p in pics:
                 logger.debug('object %s has picture %s' % (o, p))
+                if p not in wanted:
+                    wanted.append(p)
+
+        for key in self.shown.keys():
+            if key not in wanted:
+                self.shown.pop(key).destroy()
+
+        for position, key in enumerate(wanted):
+            expander = self.shown.get(key)
+            if expander is None:
+                if isinstance(key, basestring):
+                    picture = utils.picture_box(key)
+                else:
+                    picture = key
                 expander = gtk.HBox()
-                expander.add(p)
-                self.box.pack_end(expander, expand=False, fill=False)
-                self.box.reorder_child(expander, 0)
+                expander.add(picture)
+                self.box.pack_start(expander, expand=False, fill=False)
+                self.shown[key] = expander
                 expander.show_all()
-                p.show()
+            self.box.reorder_child(expander, position)
 
         self.box.show_all()
 
@@ -23,7 +23,7 @@ import logging
 logger = logging.getLogger(__name__)
 #logger.setLevel(logging.DEBUG)
 
-from sqlalchemy.orm import object_session, eagerload
+from sqlalchemy.orm import object_session
 
 import bauble
 from bauble.i18n import _
@@ -34,7 +34,8 @@ from bauble.plugins.garden.accession import AccessionEditor, \
     Accession, AccessionInfoBox, AccessionNote, \
     acc_context_menu
 from bauble.plugins.garden.location import LocationEditor, \
-    Location, LocationInfoBox, loc_context_menu
+    Location, LocationInfoBox, loc_context_menu, location_code_index, \
+    location_name_index
 from bauble.plugins.garden.plant import PlantEditor, PlantNote, \
     Plant, PlantSearch, PlantInfoBox, plant_context_menu, \
     plant_delimiter_key, default_plant_delimiter
@@ -72,13 +73,14 @@ class GardenPlugin(pluginmgr.Plugin):
         from functools import partial
         mapper_search.add_meta(('accession', 'acc'), Accession, ['code'])
         SearchView.row_meta[Accession].set(
-            children=partial(db.natsort, "plants"),
+            children=partial(db.sorted_children, 'plants', ['code']),
             infobox=AccessionInfoBox,
             context_menu=acc_context_menu)
 
         mapper_search.add_meta(('location', 'loc'), Location, ['name', 'code'])
         SearchView.row_meta[Location].set(
-            children=partial(db.natsort, 'plants'),
+            children=partial(db.sorted_children, 'plants',
+                             ['accession.code', 'code']),
             infobox=LocationInfoBox,
             context_menu=loc_context_menu)
 
@@ -94,10 +96,9 @@ class GardenPlugin(pluginmgr.Plugin):
 
         def sd_kids(detail):
             session = object_session(detail)
-            results = session.query(Accession).join(Source).\
-                join(Contact).options(eagerload('species')).\
-                filter(Contact.id == detail.id).all()
-            return results
+            return db.sorted_query(
+                session.query(Accession).join(Source).join(Contact).
+                filter(Contact.id == detail.id), ['code'])
         SearchView.row_meta[Contact].set(
             children=sd_kids,
             infobox=ContactInfoBox,
@@ -216,18 +217,16 @@ def init_location_comboentry(presenter, combo, on_select, required=True):
             code, name = match.groups()
         else:
             code = name = text
-        codes = presenter.session.query(Location).\
-            filter(utils.ilike(Location.code, '%s' % utils.utf8(code)))
-        names = presenter.session.query(Location).\
-            filter(utils.ilike(Location.name, '%s' % utils.utf8(name)))
-        if codes.count() == 1:
+        codes = location_code_index.get(presenter.session, code, exact=True)
+        names = location_name_index.get(presenter.session, name, exact=True)
+        if len(codes) == 1:
             logger.debug('location matches code')
-            location = codes.first()
+            location = codes[0]
             presenter.remove_problem(PROBLEM, entry)
             on_select(location)
-        elif names.count() == 1:
+        elif len(names) == 1:
             logger.debug('location matches name')
-            location = names.first()
+            location = names[0]
             presenter.remove_problem(PROBLEM, entry)
             on_select(location)
         else:
@@ -574,6 +574,7 @@ class Accession(db.Base, db.Serializable, db.WithNotes):
     __tablename__ = 'accession'
     __mapper_args__ = {'order_by': 'accession.code',
                        'extension': AccessionMapperExtension()}
+    search_view_prefetch = ['species.genus', 'plants.location']
 
     # columns
     #: the accession code
@@ -710,6 +711,12 @@ class Accession(db.Base, db.Serializable, db.WithNotes):
         import operator
         return reduce(operator.add, [p.propagations for p in self.plants], [])
 
+    @property
+    def picture_names(self):
+        import operator
+        return reduce(operator.add,
+                      [p.picture_names for p in self.plants], [])
+
     @property
     def pictures(self):
         import operator
@@ -846,6 +853,33 @@ class Accession(db.Base, db.Serializable, db.WithNotes):
                 (7, 'Locations'): set([p.location.id for p in self.plants]),
                 (8, 'Sources'): set(sd and [sd.id] or [])}
 
+    @classmethod
+    def top_level_count_by_ids(cls, session, ids):
+        taxa = (session.query(cls.species_id, Species.genus_id,
+                              Genus.family_id).
+                join(cls.species, Species.genus).
+                filter(cls.id.in_(ids)).distinct().all())
+        plants = session.query(Plant).filter(Plant.accession_id.in_(ids))
+        nplants, quantity = plants.with_entities(
+            func.count(Plant.id), func.sum(Plant.quantity)).one()
+        locations = plants.with_entities(Plant.location_id).distinct()
+        sources = (session.query(Source.source_detail_id).
+                   filter(Source.accession_id.in_(ids),
+                          Source.source_detail_id != None).distinct())
+        return {(1, 'Accessions'): len(ids),
+                (2, 'Species'): set(r[0] for r in taxa),
+                (3, 'Genera'): set(r[1] for r in taxa),
+                (4, 'Families'): set(r[2] for r in taxa),
+                (5, 'Plantings'): nplants,
+                (6, 'Living plants'): quantity or 0,
+                (7, 'Locations'): set(i for (i, ) in locations),
+                (8, 'Sources'): set(i for (i, ) in sources)}
+
+
+accession_index = editor.CompletionIndex(
+    Accession, lambda session: session.query(Accession.code, Accession.id).
+    order_by(Accession.code), ['accession'])
+
 
 from bauble.plugins.garden.plant import Plant, PlantEditor
 
@@ -1225,11 +1259,8 @@ class VerificationPresenter(editor.GenericEditorPresenter):
 
             # species entries
             def sp_get_completions(text):
-                query = self.presenter().session.query(Species).join('genus').\
-                    filter(utils.ilike(Genus.genus, '%s%%' % text)).\
-                    filter(Species.id != self.model.id).\
-                    order_by(Species.sp)
-                return query
+                return species_index.get(self.presenter().session, text,
+                                         exclude=self.model.id)
 
             def sp_cell_data_func(col, cell, model, treeiter, data=None):
                 v = model[treeiter][0]
@@ -1814,18 +1845,9 @@ class AccessionEditorPresenter(editor.GenericEditorPresenter):
 
         # connect signals
         def sp_get_completions(text):
-            query = self.session.query(Species)
-            genus = ''
-            try:
-                genus = text.split(' ')[0]
-            except Exception:
-                pass
-            from utils import ilike
-            return query.filter(
-                and_(Species.genus_id == Genus.id,
-                     or_(ilike(Genus.genus, '%s%%' % text),
-                         ilike(Genus.genus, '%s%%' % genus)))).\
-                order_by(Species.sp)
+            # the genus names starting with the first word of text
+            # include those starting with text
+            return species_index.get(self.session, text.split(' ')[0])
 
         def on_select(value):
             logger.debug('on select: %s' % value)
@@ -2484,6 +2506,7 @@ class AccessionEditor(editor.GenericModelViewPresenterEditor):
 # import at the bottom to avoid circular dependencies
 from bauble.plugins.plants.genus import Genus
 from bauble.plugins.plants.species_model import Species, SpeciesSynonym
+from bauble.plugins.plants.species_editor import species_index
 
 
 #
@@ -2543,24 +2566,8 @@ class GeneralAccessionExpander(InfoExpander):
         self.widget_set_value('name_data', row.species_str(markup=True),
                               markup=True)
 
-        session = object_session(row)
-        plant_locations = {}
-        for plant in row.plants:
-            if plant.quantity == 0:
-                continue
-            q = plant_locations.setdefault(plant.location, 0)
-            plant_locations[plant.location] = q + plant.quantity
-        if plant_locations:
-            strs = []
-            for location, quantity in plant_locations.iteritems():
-                strs.append(_('%(quantity)s in %(location)s')
-                            % dict(location=str(location), quantity=quantity))
-            s = '\n'.join(strs)
-        else:
-            s = '0'
-        self.widget_set_value('living_plants_data', s)
-
-        nplants = session.query(Plant).filter_by(accession_id=row.id).count()
+        living_plants, nplants = self.get_loaded(row)
+        self.widget_set_value('living_plants_data', living_plants)
         self.widget_set_value('nplants_data', nplants)
         self.widget_set_value('date_recvd_data', row.date_recvd)
         self.widget_set_value('date_accd_data', row.date_accd)
@@ -2602,6 +2609,29 @@ class GeneralAccessionExpander(InfoExpander):
                     location_str = '(%s)' % location.code
             self.widget_set_value(label, location_str)
 
+    def load(self, row):
+        '''
+        return the living plants by location and the number of plants
+        of the accession
+        '''
+        session = object_session(row)
+        plant_locations = {}
+        for plant in row.plants:
+            if plant.quantity == 0:
+                continue
+            q = plant_locations.setdefault(plant.location, 0)
+            plant_locations[plant.location] = q + plant.quantity
+        if plant_locations:
+            strs = []
+            for location, quantity in plant_locations.iteritems():
+                strs.append(_('%(quantity)s in %(location)s')
+                            % dict(location=str(location), quantity=quantity))
+            s = '\n'.join(strs)
+        else:
+            s = '0'
+        nplants = session.query(Plant).filter_by(accession_id=row.id).count()
+        return s, nplants
+
 
 class SourceExpander(InfoExpander):
     def __init__(self, widgets):
@@ -2781,6 +2811,11 @@ class AccessionInfoBox(InfoBox):
 
         #self.show_all()
 
+    def load(self, row, expanders):
+        if isinstance(row, Collection):
+            row = row.source.accession
+        return super(AccessionInfoBox, self).load(row, expanders)
+
     def update(self, row):
         if isinstance(row, Collection):
             row = row.source.accession
@@ -28,7 +28,7 @@ import logging
 logger = logging.getLogger(__name__)
 #logger.setLevel(logging.DEBUG)
 
-from sqlalchemy import Column, Unicode, UnicodeText
+from sqlalchemy import Column, Unicode, UnicodeText, func
 from sqlalchemy.orm import relation, backref, validates
 from sqlalchemy.orm.session import object_session
 from sqlalchemy.exc import DBAPIError
@@ -37,7 +37,7 @@ from bauble.i18n import _
 import bauble
 import bauble.db as db
 from bauble.editor import GenericModelViewPresenterEditor, GenericEditorView, \
-    GenericEditorPresenter, UnicodeOrNoneValidator
+    GenericEditorPresenter, UnicodeOrNoneValidator, CompletionIndex
 import bauble.utils as utils
 import bauble.paths as paths
 from bauble.view import Action
@@ -107,11 +107,13 @@ class Location(db.Base, db.Serializable):
     """
     __tablename__ = 'location'
     __mapper_args__ = {'order_by': 'name'}
+    # the attributes __str__ shows, SearchView sorts the results on them
+    search_view_order = ['code', 'name']
 
     # columns
     # refers to beds by unique codes
     code = Column(Unicode(12), unique=True, nullable=False)
-    name = Column(Unicode(64))
+    name = Column(Unicode(64), index=True)
     description = Column(UnicodeText)
 
     # relations
@@ -167,6 +169,42 @@ class Location(db.Base, db.Serializable):
                                      for a in accessions
                                      if a.source and a.source.source_detail])}
 
+    @classmethod
+    def top_level_count_by_ids(cls, session, ids):
+        from bauble.plugins.garden.accession import Accession
+        from bauble.plugins.garden.plant import Plant
+        from bauble.plugins.garden.source import Source
+        from bauble.plugins.plants.genus import Genus
+        from bauble.plugins.plants.species_model import Species
+        plants = session.query(Plant).filter(Plant.location_id.in_(ids))
+        nplants, quantity = plants.with_entities(
+            func.count(Plant.id), func.sum(Plant.quantity)).one()
+        rows = (session.query(Plant.accession_id, Accession.species_id,
+                              Species.genus_id, Genus.family_id).
+                join(Plant.accession, Accession.species, Species.genus).
+                filter(Plant.location_id.in_(ids)).distinct().all())
+        sources = (session.query(Source.source_detail_id).
+                   join(Source.accession, Accession.plants).
+                   filter(Plant.location_id.in_(ids),
+                          Source.source_detail_id != None).distinct())
+        return {(1, 'Locations'): len(ids),
+                (2, 'Plantings'): nplants,
+                (3, 'Living plants'): quantity or 0,
+                (4, 'Accessions'): set(r[0] for r in rows),
+                (5, 'Species'): set(r[1] for r in rows),
+                (6, 'Genera'): set(r[2] for r in rows),
+                (7, 'Families'): set(r[3] for r in rows),
+                (8, 'Sources'): set(i for (i, ) in sources)}
+
+
+location_code_index = CompletionIndex(
+    Location, lambda session: session.query(Location.code, Location.id).
+    order_by(Location.code), ['location'])
+
+location_name_index = CompletionIndex(
+    Location, lambda session: session.query(Location.name, Location.id).
+    order_by(Location.name), ['location'])
+
 
 def mergevalues(value1, value2, formatter):
     """return the common value
@@ -475,13 +513,18 @@ class GeneralLocationExpander(InfoExpander):
         '''
         '''
         self.current_obj = row
-        from bauble.plugins.garden.plant import Plant
         self.widget_set_value('loc_name_data',
                               '<big>%s</big>' % utils.xml_safe(str(row)),
                               markup=True)
+        self.widget_set_value('loc_nplants_data', self.get_loaded(row))
+
+    def load(self, row):
+        '''
+        count the plants at the location
+        '''
+        from bauble.plugins.garden.plant import Plant
         session = object_session(row)
-        nplants = session.query(Plant).filter_by(location_id=row.id).count()
-        self.widget_set_value('loc_nplants_data', nplants)
+        return session.query(Plant).filter_by(location_id=row.id).count()
 
 
 class DescriptionExpander(InfoExpander):
@@ -444,6 +444,9 @@ class Plant(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
     __tablename__ = 'plant'
     __table_args__ = (UniqueConstraint('code', 'accession_id'), {})
     __mapper_args__ = {'order_by': ['plant.accession_id', 'plant.code']}
+    search_view_prefetch = ['accession.species.genus', 'location']
+    # the attributes __str__ shows, SearchView sorts the results on them
+    search_view_order = ['accession.code', 'code']
 
     # columns
     code = Column(Unicode(6), nullable=False)
@@ -473,9 +476,6 @@ class Plant(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
     def search_view_markup_pair(self):
         '''provide the two lines describing object for SearchView row.
         '''
-        import inspect
-        logger.debug('entering search_view_markup_pair %s, %s' % (
-            self, str(inspect.stack()[1])))
         sp_str = self.accession.species_str(markup=True)
         dead_color = "#9900ff"
         if self.quantity <= 0:
@@ -595,8 +595,33 @@ class Plant(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
                 (8, 'Sources'): set(sd and [sd.id] or []),
                 }
 
+    @classmethod
+    def top_level_count_by_ids(cls, session, ids):
+        from bauble.plugins.plants.genus import Genus
+        from bauble.plugins.garden.source import Source
+        rows = (session.query(cls.accession_id, Accession.species_id,
+                              Species.genus_id, Genus.family_id,
+                              cls.location_id).
+                join(cls.accession, Accession.species, Species.genus).
+                filter(cls.id.in_(ids)).distinct().all())
+        quantity = (session.query(func.sum(cls.quantity)).
+                    filter(cls.id.in_(ids)).scalar())
+        sources = (session.query(Source.source_detail_id).
+                   join(Source.accession, Accession.plants).
+                   filter(cls.id.in_(ids),
+                          Source.source_detail_id != None).distinct())
+        return {(1, 'Plantings'): len(ids),
+                (2, 'Accessions'): set(r[0] for r in rows),
+                (3, 'Species'): set(r[1] for r in rows),
+                (4, 'Genera'): set(r[2] for r in rows),
+                (5, 'Families'): set(r[3] for r in rows),
+                (6, 'Living plants'): quantity or 0,
+                (7, 'Locations'): set(r[4] for r in rows),
+                (8, 'Sources'): set(i for (i, ) in sources),
+                }
+
 
-from bauble.plugins.garden.accession import Accession
+from bauble.plugins.garden.accession import Accession, accession_index
 
 
 class PlantEditorView(GenericEditorView):
@@ -747,9 +772,7 @@ class PlantEditorPresenter(GenericEditorPresenter):
         # assign signal handlers to monitor changes now that the view has
         # been filled in
         def acc_get_completions(text):
-            query = self.session.query(Accession)
-            return query.filter(Accession.code.like(unicode('%s%%' % text))).\
-                order_by(Accession.code)
+            return accession_index.get(self.session, text)
 
         def on_select(value):
             self.set_model_attr('accession', value)
@@ -33,7 +33,7 @@ import gtk
 import gobject
 
 from sqlalchemy import Column, Unicode, Integer, ForeignKey,\
-    Float, UnicodeText, select
+    Float, UnicodeText, Index, select
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import relation, backref
 
@@ -200,6 +200,9 @@ class Collection(db.Base):
     :Constraints:
     """
     __tablename__ = 'collection'
+    # mysql only indexes the beginning of a text column
+    __table_args__ = (Index('ix_collection_locale', 'locale',
+                            mysql_length=255), {})
 
     # columns
     # ITF2 - F24 - Primary Collector's Name
@@ -268,6 +268,19 @@ class PlantTests(GardenTestCase):
         assert dup.changes is not []
         self.session.commit()
 
+    def test_picture_names(self):
+        p = Plant(accession=self.accession, location=self.location, code=u'2',
+                  quantity=1)
+        self.session.add(p)
+        for category, text in [(u'<picture>', u'a.jpg'), (None, u'note'),
+                               (u'<picture>', u'b.jpg')]:
+            note = PlantNote(note=text, category=category)
+            note.plant = p
+            note.date = datetime.date.today()
+        self.session.commit()
+        self.assertEquals(p.picture_names, [u'a.jpg', u'b.jpg'])
+        self.assertEquals(self.accession.picture_names, [u'a.jpg', u'b.jpg'])
+
     def test_search_view_markup_pair(self):
         # living plant
         p = Plant(accession=self.accession, location=self.location, code=u'2',
@@ -2325,6 +2338,90 @@ class GlobalFunctionsTests(GardenTestCase):
         self.assertEquals(mergevalues(None, None, '%s|%s'), '')
 
 
+class TopLevelCountTests(GardenTestCase):
+
+    def setUp(self):
+        super(TopLevelCountTests, self).setUp()
+        setUp_data()
+        contact = Contact(name=u'Somebody')
+        acc = self.session.query(Accession).get(1)
+        acc.source = Source(source_detail=contact)
+        self.session.commit()
+
+    def assert_same_count(self, klass):
+        objs = self.session.query(klass).all()
+        expect = {}
+        for obj in objs:
+            db.merge_top_level_count(expect, obj.top_level_count())
+        result = db.top_level_count(
+            self.session, [(klass, obj.id) for obj in objs])
+        as_numbers = lambda d: dict(
+            (k, isinstance(v, set) and len(v) or v) for k, v in d.items())
+        self.assertEquals(as_numbers(result), as_numbers(expect))
+
+    def test_family(self):
+        self.assert_same_count(Family)
+
+    def test_genus(self):
+        self.assert_same_count(Genus)
+
+    def test_species(self):
+        self.assert_same_count(Species)
+
+    def test_accession(self):
+        self.assert_same_count(Accession)
+
+    def test_plant(self):
+        self.assert_same_count(Plant)
+
+    def test_location(self):
+        self.assert_same_count(Location)
+
+    def test_chunked(self):
+        original = db.TOP_LEVEL_COUNT_CHUNK
+        db.TOP_LEVEL_COUNT_CHUNK = 1
+        try:
+            self.assert_same_count(Plant)
+            self.assert_same_count(Species)
+        finally:
+            db.TOP_LEVEL_COUNT_CHUNK = original
+
+    def test_sorted_children(self):
+        from functools import partial
+        for location in self.session.query(Location):
+            expect = sorted(location.plants, key=lambda p: (
+                utils.natsort_key(p.accession.code),
+                utils.natsort_key(p.code)))
+            kids = partial(db.sorted_children, 'plants',
+                           ['accession.code', 'code'])(location)
+            self.assertEquals(list(kids), expect)
+            self.assertEquals(kids[1:2], expect[1:2])
+
+    def test_sorted_children_natural_order(self):
+        acc = self.session.query(Accession).get(1)
+        location = self.session.query(Location).first()
+        for code in (u'10', u'2', u'1'):
+            self.session.add(Plant(accession=acc, location=location,
+                                   code=u'x%s' % code, quantity=1))
+        self.session.commit()
+        kids = db.sorted_children('plants', ['code'], acc)
+        codes = [p.code for p in kids if p.code.startswith(u'x')]
+        self.assertEquals(codes, [u'x1', u'x2', u'x10'])
+        self.assertEquals([p.code for p in kids[-2:]], [u'x2', u'x10'])
+
+    def test_contact_children_natural_order(self):
+        from bauble.view import SearchView
+        contact = Contact(name=u'Somebody else')
+        species = self.session.query(Species).first()
+        for code in (u'10', u'2', u'1'):
+            self.session.add(Accession(
+                species=species, code=u'x%s' % code,
+                source=Source(source_detail=contact)))
+        self.session.commit()
+        kids = SearchView.row_meta[Contact].get_children(contact)
+        self.assertEquals([a.code for a in kids], [u'x1', u'x2', u'x10'])
+
+
 class ContactTests(GardenTestCase):
 
     def __init__(self, *args):
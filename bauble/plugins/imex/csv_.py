@@ -26,6 +26,9 @@
 
 import os
 import csv
+from cStringIO import StringIO
+import Queue
+import threading
 import traceback
 
 import logging
@@ -124,6 +127,45 @@ class UnicodeWriter(object):
             self.writerow(row)
 
 
+class SQLiteTransaction(object):
+    """
+    A transaction on a sqlite connection begun with an explicit BEGIN.
+
+    pysqlite commits on its own before any statement that is not an
+    INSERT, UPDATE, DELETE or REPLACE, like the DROP and CREATE TABLE of
+    an import, and connection.begin() doesn't emit a BEGIN.  For the
+    life of the transaction pysqlite's own transaction handling is off,
+    and the transaction is a SQLAlchemy transaction too, so SQLAlchemy
+    doesn't commit the statements on its own either.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.dbapi_connection = connection.connection.connection
+        self.isolation_level = self.dbapi_connection.isolation_level
+        self.dbapi_connection.isolation_level = None
+        self.transaction = connection.begin()
+        connection.execute('BEGIN')
+
+    def _end(self, statement, method):
+        try:
+            self.connection.execute(statement)
+        finally:
+            method()
+            self.dbapi_connection.isolation_level = self.isolation_level
+
+    def commit(self):
+        self._end('COMMIT', self.transaction.commit)
+
+    def rollback(self):
+        try:
+            self._end('ROLLBACK', self.transaction.rollback)
+        except Exception, e:
+            # sqlite already rolled back after some errors, don't hide
+            # the error that made us roll back
+            logger.warning('rollback failed: %s' % e)
+
+
 class Importer(object):
 
     def start(self, **kwargs):
@@ -158,6 +200,16 @@ class CSVImporter(Importer):
 
     """
 
+    # the number of rows sent to the database at a time by the COPY and
+    # sqlite bulk paths
+    bulk_update_every = 4096
+
+    # pragmas set on sqlite databases for the time of an import.  the
+    # whole import, drops included, is one SQLiteTransaction: it syncs
+    # once, and the journal on disk rolls it back after a crash, so the
+    # journal stays and synchronous only goes down to NORMAL
+    sqlite_pragmas = {'synchronous': 'NORMAL'}
+
     def __init__(self):
         super(CSVImporter, self).__init__()
         self.__error = False   # flag to indicate error on import
@@ -235,6 +287,55 @@ class CSVImporter(Importer):
         del writer
         return filename
 
+    @staticmethod
+    def _is_empty(filename):
+        """return True if filename holds no rows besides the header"""
+        f = open(filename, 'rb')
+        try:
+            f.readline()
+            return not f.readline().strip()
+        finally:
+            f.close()
+
+    @staticmethod
+    def _set_sqlite_pragmas(connection, pragmas):
+        """set the pragmas on an sqlite connection
+
+        :param pragmas: a dictionary of pragma names to values
+
+        returns a dictionary with the values the pragmas had before.
+        """
+        saved = {}
+        for name, value in pragmas.items():
+            saved[name] = connection.execute('PRAGMA %s' % name).scalar()
+            connection.execute('PRAGMA %s = %s' % (name, value))
+        return saved
+
+    @staticmethod
+    def _copy_rows(connection, table, column_keys, rows):
+        """insert rows into table with a postgresql COPY statement
+
+        the rows are written to an in memory CSV buffer that is streamed
+        to the server with psycopg2's copy_expert, on the cursor of the
+        connection so the rows are part of the current transaction.
+        """
+        buf = StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([utils.utf8(row[key])
+                             if row.get(key) is not None else None
+                             for key in column_keys])
+        buf.seek(0)
+        preparer = connection.dialect.identifier_preparer
+        statement = 'COPY %s (%s) FROM STDIN WITH CSV' % (
+            preparer.format_table(table),
+            ', '.join(preparer.quote(key) for key in column_keys))
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(statement, buf)
+        finally:
+            cursor.close()
+
     def run(self, filenames, metadata, force=False):
         '''
         A generator method for importing filenames into the database.
@@ -247,20 +348,9 @@ class CSVImporter(Importer):
         '''
         transaction = None
         connection = None
+        saved_pragmas = None
         self.__error_exc = BaubleError(_('Unknown Error.'))
 
-        try:
-            # user a contextual connect in case whoever called this
-            # method called it inside a transaction then we can pick
-            # up the parent connection and the transaction
-            connection = metadata.bind.connect()
-            transaction = connection.begin()
-        except Exception, e:
-            msg = _('Error connecting to database.\n\n%s') % \
-                utils.xml_safe(e)
-            utils.message_dialog(msg, gtk.MESSAGE_ERROR)
-            return
-
         # create a mapping of table names to filenames
         filename_dict = {}
         for f in filenames:
@@ -293,13 +383,34 @@ class CSVImporter(Importer):
             utils.message_dialog(msg, gtk.MESSAGE_ERROR)
             return
 
-        total_lines = 0
-        filesizes = {}
+        # the progress is measured in bytes, so that the files don't
+        # have to be read an extra time just to count their lines
+        total_bytes = 0
         for filename in filenames:
-            #get the total number of lines for all the files
-            nlines = len(open(filename).readlines())
-            filesizes[filename] = nlines
-            total_lines += nlines
+            total_bytes += os.path.getsize(filename)
+
+        try:
+            # user a contextual connect in case whoever called this
+            # method called it inside a transaction then we can pick
+            # up the parent connection and the transaction
+            connection = metadata.bind.connect()
+            is_sqlite = connection.dialect.name == 'sqlite'
+            use_copy = (connection.dialect.name == 'postgresql' and
+                        connection.dialect.driver == 'psycopg2')
+            if is_sqlite:
+                # pragmas can't be changed inside a transaction
+                saved_pragmas = self._set_sqlite_pragmas(
+                    connection, self.sqlite_pragmas)
+                transaction = SQLiteTransaction(connection)
+            else:
+                transaction = connection.begin()
+        except Exception, e:
+            if saved_pragmas is not None:
+                self._set_sqlite_pragmas(connection, saved_pragmas)
+            msg = _('Error connecting to database.\n\n%s') % \
+                utils.xml_safe(e)
+            utils.message_dialog(msg, gtk.MESSAGE_ERROR)
+            return
 
         created_tables = []
 
@@ -308,7 +419,7 @@ class CSVImporter(Importer):
             if table.name not in created_tables:
                 created_tables.append(table.name)
 
-        steps_so_far = 0
+        bytes_so_far = 0
         cleaned = None
         insert = None
         depends = set()  # the type will be changed to a [] later
@@ -338,15 +449,21 @@ class CSVImporter(Importer):
                     metadata.drop_all(bind=connection, tables=depends)
                 else:
                     # user doesn't want to drop dependencies so we just quit
+                    transaction.rollback()
                     return
 
-            # commit the dependency drops
-            transaction.commit()
-            transaction = connection.begin()
+            # commit the dependency drops, sqlite keeps them in the
+            # transaction of the whole import
+            if not is_sqlite:
+                transaction.commit()
+                transaction = connection.begin()
 
             # update_every determines how many rows we will insert at
             # a time and consequently how often we update the gui
-            update_every = 127
+            if use_copy or is_sqlite:
+                update_every = self.bulk_update_every
+            else:
+                update_every = 127
 
             # import the tables one at a time, breaking every so often
             # so the GUI can update
@@ -360,15 +477,15 @@ class CSVImporter(Importer):
                 yield  # allow progress bar update
 
                 # don't do anything if the file is empty:
-                if filesizes[filename] <= 1:
-                    if not table.exists():
+                if self._is_empty(filename):
+                    if not table.exists(bind=connection):
                         create_table(table)
                     continue
                 # check if the table was in the depends because they
                 # could have been dropped whereas table.exists() can
                 # return true for a dropped table if the transaction
                 # hasn't been committed
-                if table in depends or not table.exists():
+                if table in depends or not table.exists(bind=connection):
                     logger.info('%s does not exist. creating.' % table.name)
                     logger.debug('%s does not exist. creating.' % table.name)
                     create_table(table)
@@ -396,8 +513,9 @@ class CSVImporter(Importer):
                     break
 
                 # commit the drop of the table we're importing
-                transaction.commit()
-                transaction = connection.begin()
+                if not is_sqlite:
+                    transaction.commit()
+                    transaction = connection.begin()
 
                 # open a temporary reader to get the column keys so we
                 # can later precompile our insert statement
@@ -435,16 +553,23 @@ class CSVImporter(Importer):
                 # columns in the CSV file and the columns with
                 # defaults
                 column_keys = list(csv_columns.union(defaults.keys()))
-                insert = table.insert(bind=connection).\
-                    compile(column_keys=column_keys)
+                if use_copy:
+                    column_keys = [c for c in column_names
+                                   if c in column_keys]
+                else:
+                    insert = table.insert(bind=connection).\
+                        compile(column_keys=column_keys)
 
                 values = []
 
                 def do_insert():
-                    if values:
+                    if values and use_copy:
+                        self._copy_rows(connection, table, column_keys,
+                                        values)
+                    elif values:
                         connection.execute(insert, *values)
                     del values[:]
-                    percent = float(steps_so_far)/float(total_lines)
+                    percent = float(bytes_so_far + f.tell()) / total_bytes
                     if 0 < percent < 1.0:
                         pb_set_fraction(percent)
 
@@ -485,8 +610,7 @@ class CSVImporter(Importer):
                             # as True automatically...probably because
                             # bool('False') == True
                     values.append(line)
-                    steps_so_far += 1
-                    if steps_so_far % update_every == 0:
+                    if len(values) == update_every:
                         do_insert()
                         yield
 
@@ -495,15 +619,20 @@ class CSVImporter(Importer):
 
                 # insert the remainder that were less than update every
                 do_insert()
+                f.close()
+                bytes_so_far += os.path.getsize(filename)
 
                 # we have commit after create after each table is imported
                 # or Postgres will complain if two tables that are
-                # being imported have a foreign key relationship
-                transaction.commit()
+                # being imported have a foreign key relationship, sqlite
+                # imports all tables in the one transaction
+                if not is_sqlite:
+                    transaction.commit()
+                    transaction = connection.begin()
                 logger.debug('%s: %s' % (
                     table.name,
-                    table.select().alias().count().execute().fetchone()[0]))
-                transaction = connection.begin()
+                    connection.execute(
+                        table.select().alias().count()).scalar()))
 
             logger.debug('creating: %s' % ', '.join([d.name for d in depends]))
             # TODO: need to get those tables from depends that need to
@@ -521,6 +650,13 @@ class CSVImporter(Importer):
             raise
         else:
             transaction.commit()
+            tables = set(table.name for table, filename in sorted_tables)
+            for listener in db.history_listeners:
+                listener(tables)
+        finally:
+            if is_sqlite:
+                self._set_sqlite_pragmas(connection, saved_pragmas)
+            connection.close()
 
         # unfortunately inserting an explicit value into a column that
         # has a sequence doesn't update the sequence, we shortcut this
@@ -590,6 +726,12 @@ class CSVImporter(Importer):
 
 class CSVExporter(object):
 
+    # the number of tables exported in parallel, each by a thread with
+    # its own connection
+    threads = 4
+    # the number of rows written between two updates of the gui
+    update_every = 30
+
     def start(self, path=None):
         if path is None:
             d = gtk.FileChooserDialog(_("Select a directory"), None,
@@ -630,49 +772,106 @@ class CSVExporter(object):
                 if utils.yes_no_dialog(msg):
                     return
 
+        tables = [(table, filename_template % table.name)
+                  for table in db.metadata.sorted_tables]
+        if db.engine.name == 'sqlite' or self.threads < 2:
+            # an in-memory database is not shared between connections
+            # and sqlite serializes readers anyway, so export the tables
+            # one after the other from the task itself
+            connection = db.engine.connect()
+            try:
+                for table, filename in tables:
+                    steps_so_far += 1
+                    self._set_progress(table, filename, steps_so_far, ntables)
+                    for i in self._write_table(connection, table, filename):
+                        yield
+            finally:
+                connection.close()
+            return
+
+        pending = Queue.Queue()
+        for item in tables:
+            pending.put(item)
+        done = Queue.Queue()
+        workers = [threading.Thread(target=self._export_worker,
+                                    args=(pending, done))
+                   for i in range(min(self.threads, ntables))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        while steps_so_far < ntables:
+            try:
+                table, filename, error = done.get(timeout=0.1)
+            except Queue.Empty:
+                yield
+                continue
+            if error is not None:
+                # stop the other workers after their current table
+                while not pending.empty():
+                    pending.get_nowait()
+                raise error
+            steps_so_far += 1
+            self._set_progress(table, filename, steps_so_far, ntables)
+            yield
+
+    @staticmethod
+    def _set_progress(table, filename, steps_so_far, ntables):
+        pb_set_fraction(float(steps_so_far) / float(ntables))
+        msg = _('exporting %(table)s table to %(filename)s')\
+            % {'table': table.name, 'filename': filename}
+        bauble.task.set_message(msg)
+        logger.info("exporting %s" % table.name)
+
+    def _export_worker(self, pending, done):
+        """export the tables in pending until it is empty
+
+        runs in its own thread with its own connection, puts a (table,
+        filename, error) triple in done for each table it handled.
+        """
+        connection = db.engine.connect()
+        try:
+            while True:
+                try:
+                    table, filename = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    for i in self._write_table(connection, table, filename):
+                        pass
+                except Exception, e:
+                    logger.error(traceback.format_exc())
+                    done.put((table, filename, e))
+                    return
+                done.put((table, filename, None))
+        finally:
+            connection.close()
+
+    def _write_table(self, connection, table, filename):
+        """write the rows of table to filename
+
+        the rows are streamed from a server side cursor straight into the
+        file, so only one batch of rows is in memory at any time.  this is
+        a generator, it yields every update_every rows.
+        """
         def replace(s):
             if isinstance(s, (str, unicode)):
                 s.replace('\n', '\\n')
             return s
 
-        def write_csv(filename, rows):
-            f = open(filename, 'wb')
+        result = connection.execution_options(stream_results=True).\
+            execute(table.select())
+        f = open(filename, 'wb')
+        try:
             writer = UnicodeWriter(f, quotechar=QUOTE_CHAR,
                                    quoting=QUOTE_STYLE)
-            writer.writerows(rows)
-            f.close()
-
-        update_every = 30
-        for table in db.metadata.sorted_tables:
-            filename = filename_template % table.name
-            steps_so_far += 1
-            fraction = float(steps_so_far)/float(ntables)
-            pb_set_fraction(fraction)
-            msg = _('exporting %(table)s table to %(filename)s')\
-                % {'table': table.name, 'filename': filename}
-            bauble.task.set_message(msg)
-            logger.info("exporting %s" % table.name)
-
-            # get the data
-            results = table.select().execute().fetchall()
-
-            # create empty files with only the column names
-            if len(results) == 0:
-                write_csv(filename, [table.c.keys()])
-                yield
-                continue
-
-            rows = []
-            rows.append(table.c.keys())  # append col names
-            ctr = 0
-            for row in results:
-                values = map(replace, row.values())
-                rows.append(values)
-                if ctr == update_every:
+            writer.writerow(table.c.keys())  # the column names
+            for ctr, row in enumerate(result, 1):
+                writer.writerow(map(replace, row.values()))
+                if ctr % self.update_every == 0:
                     yield
-                    ctr = 0
-                ctr += 1
-            write_csv(filename, rows)
+        finally:
+            result.close()
+            f.close()
 
 
 class CSVImportCommandHandler(pluginmgr.CommandHandler):
@@ -35,7 +35,7 @@ from bauble.plugins.garden import Accession, Location, Plant
 import bauble.plugins.garden.test as garden_test
 import bauble.plugins.plants.test as plants_test
 from bauble.plugins.imex.csv_ import CSVImporter, CSVExporter, QUOTE_CHAR, \
-    QUOTE_STYLE
+    QUOTE_STYLE, SQLiteTransaction
 from bauble.plugins.imex.iojson import JSONImporter, JSONExporter
 from bauble.test import BaubleTestCase
 import json
@@ -350,6 +350,40 @@ class CSVTests2(ImexTestCase):
             "bad sequence: highest_id(%s) > nexval(%s) -- %s" % \
             (highest_id, nextval, maxid)
 
+    def test_sqlite_pragmas_restored(self):
+        """
+        Test that the pragmas set for a sqlite import are reset afterwards
+        """
+        if db.engine.name != 'sqlite':
+            return
+        conn = db.engine.contextual_connect()
+        synchronous = conn.execute('PRAGMA synchronous').scalar()
+        filename = os.path.join('bauble', 'plugins', 'plants', 'default',
+                                'family.txt')
+        importer = CSVImporter()
+        importer.start([filename], force=True)
+        self.assertEquals(conn.execute('PRAGMA synchronous').scalar(),
+                          synchronous)
+        nlines = len(open(filename).readlines())
+        self.assertEquals(
+            conn.execute('SELECT count(*) FROM family').scalar(), nlines - 1)
+
+    def test_sqlite_transaction_rolls_back_ddl(self):
+        if db.engine.name != 'sqlite':
+            return
+        from sqlalchemy import MetaData, Table
+        table = Table('imex_test', MetaData(),
+                      Column('id', Integer, primary_key=True))
+        conn = db.engine.connect()
+        try:
+            transaction = SQLiteTransaction(conn)
+            table.create(bind=conn)
+            conn.execute(table.insert(), id=1)
+            transaction.rollback()
+            self.assertFalse(table.exists(bind=conn))
+        finally:
+            conn.close()
+
     def test_import(self):
         # TODO: create a test to check that we aren't using an insert
         # statement for import that assumes a column value from the previous
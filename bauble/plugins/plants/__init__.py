@@ -79,17 +79,111 @@ from threading import Thread
 from gobject import idle_add
 
 
-class LabelUpdater(Thread):
-    def __init__(self, widget, query, *args, **kwargs):
-        super(LabelUpdater, self).__init__(*args, **kwargs)
-        self.query = query
-        self.widget = widget
+# the counters shown in the splash screen, label name and the statement
+# computing its value
+splash_garden_statistics = [
+    ('splash_nplttot', "select count(*) from plant"),
+    ('splash_npltuse', "select count(*) from plant where quantity>0"),
+    ('splash_npltnot', "select count(*) from plant where quantity=0"),
+    ('splash_nacctot', "select count(*) from accession"),
+    ('splash_naccuse', "select count(distinct accession.id) "
+     "from accession "
+     "join plant on plant.accession_id=accession.id "
+     "where plant.quantity>0"),
+    ('splash_naccnot', "select count(id) "
+     "from accession "
+     "where id not in "
+     "(select accession_id from plant "
+     " where plant.quantity>0)"),
+    ('splash_nloctot', "select count(*) from location"),
+    ('splash_nlocuse', "select count(distinct location.id) "
+     "from location "
+     "join plant on plant.location_id=location.id "
+     "where plant.quantity>0"),
+    ('splash_nlocnot', "select count(id) "
+     "from location "
+     "where id not in "
+     "(select location_id from plant "
+     " where plant.quantity>0)"),
+    ]
+
+splash_statistics = [
+    ('splash_nspcuse', "select count(distinct species.id) "
+     "from species join accession "
+     "on accession.species_id=species.id"),
+    ('splash_ngenuse', "select count(distinct species.genus_id) "
+     "from species join accession "
+     "on accession.species_id=species.id"),
+    ('splash_nfamuse', "select count(distinct genus.family_id) from genus "
+     "join species on species.genus_id=genus.id "
+     "join accession on accession.species_id=species.id "),
+    ('splash_nspctot', "select count(*) from species"),
+    ('splash_ngentot', "select count(*) from genus"),
+    ('splash_nfamtot', "select count(*) from family"),
+    ('splash_nspcnot', "select count(id) from species "
+     "where id not in "
+     "(select distinct species.id "
+     " from species join accession "
+     " on accession.species_id=species.id)"),
+    ('splash_ngennot', "select count(id) from genus "
+     "where id not in "
+     "(select distinct species.genus_id "
+     " from species join accession "
+     " on accession.species_id=species.id)"),
+    ('splash_nfamnot', "select count(id) from family "
+     "where id not in "
+     "(select distinct genus.family_id from genus "
+     "join species on species.genus_id=genus.id "
+     "join accession on accession.species_id=species.id)"),
+    ]
+
+# (engine, statistics names) -> (last history id, values)
+_statistics_cache = {}
+db.history_listeners.append(lambda tables: _statistics_cache.clear())
+
+
+def get_statistics(session, statistics):
+    """
+    Return a dictionary of the values of statistics
+
+    :param statistics: a list of (name, statement) pairs, each statement
+      selects a single value
+
+    All statements are run as scalar subqueries of one select.  The
+    result is cached until a new row is written to the history table.
+    """
+    from bauble.db import History
+    from sqlalchemy import func
+    last_change = session.query(func.max(History.id)).scalar()
+    key = (session.get_bind(), tuple(name for name, stmt in statistics))
+    cached = _statistics_cache.get(key)
+    if cached is not None and cached[0] == last_change:
+        return cached[1]
+    stmt = 'select %s' % ', '.join('(%s) as %s' % (query, name)
+                                   for name, query in statistics)
+    row = session.execute(stmt).first()
+    values = dict((name, row[i]) for i, (name, q) in enumerate(statistics))
+    _statistics_cache[key] = (last_change, values)
+    return values
+
+
+class StatisticsUpdater(Thread):
+    """compute the statistics and show them in the labels named like them
+    """
+
+    def __init__(self, widgets, statistics, *args, **kwargs):
+        super(StatisticsUpdater, self).__init__(*args, **kwargs)
+        self.widgets = widgets
+        self.statistics = statistics
 
     def run(self):
-        ssn = db.Session()
-        value, = ssn.execute(self.query).first()
-        idle_add(lambda x: self.widget.set_text(str(x)), value)
-        ssn.close()
+        with db.session_scope() as ssn:
+            values = get_statistics(ssn, self.statistics)
+
+        def set_labels():
+            for name, value in values.items():
+                getattr(self.widgets, name).set_text(str(value))
+        idle_add(set_labels)
 
 
 class SplashInfoBox(pluginmgr.View):
@@ -214,95 +308,11 @@ class SplashInfoBox(pluginmgr.View):
 
         self.name_tooltip_query = name_tooltip_query
 
-        # LabelUpdater objects **can** run in a thread.
+        # the StatisticsUpdater runs in a thread.
+        statistics = list(splash_statistics)
         if 'GardenPlugin' in pluginmgr.plugins:
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_nplttot,
-                             "select count(*) from plant"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_npltuse,
-                             "select count(*) from plant where quantity>0"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_npltnot,
-                             "select count(*) from plant where quantity=0"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_nacctot,
-                             "select count(*) from accession"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_naccuse,
-                             "select count(distinct accession.id) "
-                             "from accession "
-                             "join plant on plant.accession_id=accession.id "
-                             "where plant.quantity>0"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_naccnot,
-                             "select count(id) "
-                             "from accession "
-                             "where id not in "
-                             "(select accession_id from plant "
-                             " where plant.quantity>0)"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_nloctot,
-                             "select count(*) from location"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_nlocuse,
-                             "select count(distinct location.id) "
-                             "from location "
-                             "join plant on plant.location_id=location.id "
-                             "where plant.quantity>0"))
-            self.start_thread(
-                LabelUpdater(self.widgets.splash_nlocnot,
-                             "select count(id) "
-                             "from location "
-                             "where id not in "
-                             "(select location_id from plant "
-                             " where plant.quantity>0)"))
-
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_nspcuse,
-                         "select count(distinct species.id) "
-                         "from species join accession "
-                         "on accession.species_id=species.id"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_ngenuse,
-                         "select count(distinct species.genus_id) "
-                         "from species join accession "
-                         "on accession.species_id=species.id"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_nfamuse,
-                         "select count(distinct genus.family_id) from genus "
-                         "join species on species.genus_id=genus.id "
-                         "join accession on accession.species_id=species.id "))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_nspctot,
-                         "select count(*) from species"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_ngentot,
-                         "select count(*) from genus"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_nfamtot,
-                         "select count(*) from family"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_nspcnot,
-                         "select count(id) from species "
-                         "where id not in "
-                         "(select distinct species.id "
-                         " from species join accession "
-                         " on accession.species_id=species.id)"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_ngennot,
-                         "select count(id) from genus "
-                         "where id not in "
-                         "(select distinct species.genus_id "
-                         " from species join accession "
-                         " on accession.species_id=species.id)"))
-        self.start_thread(
-            LabelUpdater(self.widgets.splash_nfamnot,
-                         "select count(id) from family "
-                         "where id not in "
-                         "(select distinct genus.family_id from genus "
-                         "join species on species.genus_id=genus.id "
-                         "join accession on accession.species_id=species.id)"))
+            statistics = splash_garden_statistics + statistics
+        self.start_thread(StatisticsUpdater(self.widgets, statistics))
 
     def on_sqb_clicked(self, btn_no, *args):
         try:
@@ -328,30 +338,34 @@ class PlantsPlugin(pluginmgr.Plugin):
 
         mapper_search = search.get_strategy('MapperSearch')
 
+        from functools import partial
         mapper_search.add_meta(('family', 'fam'), Family, ['family'])
-        SearchView.row_meta[Family].set(children="genera",
-                                        infobox=FamilyInfoBox,
-                                        context_menu=family_context_menu)
+        SearchView.row_meta[Family].set(
+            children=partial(db.sorted_children, 'genera', ['genus']),
+            infobox=FamilyInfoBox,
+            context_menu=family_context_menu)
 
         mapper_search.add_meta(('genus', 'gen'), Genus, ['genus'])
-        SearchView.row_meta[Genus].set(children="species",
-                                       infobox=GenusInfoBox,
-                                       context_menu=genus_context_menu)
+        SearchView.row_meta[Genus].set(
+            children=partial(db.sorted_children, 'species',
+                             ['sp', 'infrasp1']),
+            infobox=GenusInfoBox,
+            context_menu=genus_context_menu)
 
-        from functools import partial
         search.add_strategy(SynonymSearch)
         mapper_search.add_meta(('species', 'sp'), Species,
                                ['sp', 'sp2', 'infrasp1', 'infrasp2',
                                 'infrasp3', 'infrasp4'])
         SearchView.row_meta[Species].set(
-            children=partial(db.natsort, 'accessions'),
+            children=partial(db.sorted_children, 'accessions', ['code']),
             infobox=SpeciesInfoBox,
             context_menu=species_context_menu)
 
         mapper_search.add_meta(('vernacular', 'vern', 'common'),
                                VernacularName, ['name'])
         SearchView.row_meta[VernacularName].set(
-            children=partial(db.natsort, 'species.accessions'),
+            children=partial(db.sorted_children, 'species.accessions',
+                             ['code']),
             infobox=VernacularNameInfoBox,
             context_menu=vernname_context_menu)
 
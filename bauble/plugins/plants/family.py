@@ -277,6 +277,36 @@ class Family(db.Base, db.Serializable, db.WithNotes):
                                      for a in accessions
                                      if a.source and a.source.source_detail])}
 
+    @classmethod
+    def top_level_count_by_ids(cls, session, ids):
+        from bauble.plugins.garden.accession import Accession
+        from bauble.plugins.garden.plant import Plant
+        from bauble.plugins.garden.source import Source
+        species = (session.query(Species.genus_id, Species.id).
+                   join(Species.genus).
+                   filter(Genus.family_id.in_(ids)).all())
+        naccessions = (session.query(Accession).
+                       join(Accession.species, Species.genus).
+                       filter(Genus.family_id.in_(ids)).count())
+        plants = (session.query(Plant).
+                  join(Plant.accession, Accession.species, Species.genus).
+                  filter(Genus.family_id.in_(ids)))
+        nplants, quantity = plants.with_entities(
+            func.count(Plant.id), func.sum(Plant.quantity)).one()
+        locations = plants.with_entities(Plant.location_id).distinct()
+        sources = (session.query(Source.source_detail_id).
+                   join(Source.accession, Accession.species, Species.genus).
+                   filter(Genus.family_id.in_(ids),
+                          Source.source_detail_id != None).distinct())
+        return {(1, 'Families'): set(ids),
+                (2, 'Genera'): set(g for (g, s) in species),
+                (3, 'Species'): set(s for (g, s) in species),
+                (4, 'Accessions'): naccessions,
+                (5, 'Plantings'): nplants,
+                (6, 'Living plants'): quantity or 0,
+                (7, 'Locations'): set(i for (i, ) in locations),
+                (8, 'Sources'): set(i for (i, ) in sources)}
+
 
 ## defining the latin alias to the class.
 Familia = Family
@@ -332,6 +362,11 @@ class FamilySynonym(db.Base):
         return Family.str(self.synonym)
 
 
+family_index = editor.CompletionIndex(
+    Family, lambda session: session.query(Family.family, Family.id).
+    order_by(Family.family), ['family'])
+
+
 #
 # late bindings
 #
@@ -482,10 +517,7 @@ class SynonymsPresenter(editor.GenericEditorPresenter):
         self.init_treeview()
 
         def fam_get_completions(text):
-            query = self.session.query(Family)
-            return query.filter(and_(Family.family.like('%s%%' % text),
-                                     Family.id != self.model.id)).\
-                order_by(Family.family)
+            return family_index.get(self.session, text, exclude=self.model.id)
 
         self._selected = None
 
@@ -745,64 +777,85 @@ class GeneralFamilyExpander(InfoExpander):
         utils.make_label_clickable(self.widgets.fam_nplants_data,
                                    on_nplants_clicked)
 
+    def load(self, row):
+        '''
+        count the genera, species, accessions and plants in the family
+
+        :param row: the family to count for
+        '''
+        session = object_session(row)
+        # get the number of genera
+        loaded = dict(ngen=session.query(Genus).
+                      filter_by(family_id=row.id).count())
+
+        # get the number of species
+        loaded['nsp'] = (session.query(Species).join('genus').
+                         filter_by(family_id=row.id).count())
+        if loaded['nsp']:
+            loaded['ngen_in_sp'] = (session.query(Species.genus_id).
+                                    join('genus', 'family').
+                                    filter_by(id=row.id).distinct().count())
+
+        # stop here if no GardenPlugin
+        if 'GardenPlugin' not in pluginmgr.plugins:
+            return loaded
+
+        # get the number of accessions in the family
+        from bauble.plugins.garden.accession import Accession
+        from bauble.plugins.garden.plant import Plant
+
+        loaded['nacc'] = (session.query(Accession).
+                          join('species', 'genus', 'family').
+                          filter_by(id=row.id).count())
+        if loaded['nacc']:
+            loaded['nsp_in_acc'] = (session.query(Accession.species_id).
+                                    join('species', 'genus', 'family').
+                                    filter_by(id=row.id).distinct().count())
+
+        # get the number of plants in the family
+        loaded['nplants'] = (session.query(Plant).
+                             join('accession', 'species', 'genus', 'family').
+                             filter_by(id=row.id).count())
+        if loaded['nplants']:
+            loaded['nacc_in_plants'] = session.query(Plant.accession_id).\
+                join('accession', 'species', 'genus', 'family').\
+                filter_by(id=row.id).distinct().count()
+        return loaded
+
     def update(self, row):
         '''
         update the expander
 
         :param row: the row to get the values from
         '''
+        loaded = self.get_loaded(row)
         self.current_obj = row
         self.widget_set_value('fam_name_data', '<big>%s</big>' % row,
                               markup=True)
-        session = object_session(row)
-        # get the number of genera
-        ngen = session.query(Genus).filter_by(family_id=row.id).count()
-        self.widget_set_value('fam_ngen_data', ngen)
+        self.widget_set_value('fam_ngen_data', loaded['ngen'])
 
-        # get the number of species
-        nsp = (session.query(Species).join('genus').
-               filter_by(family_id=row.id).count())
-        if nsp == 0:
+        if loaded['nsp'] == 0:
             self.widget_set_value('fam_nsp_data', 0)
         else:
-            ngen_in_sp = (session.query(Species.genus_id).
-                          join('genus', 'family').
-                          filter_by(id=row.id).distinct().count())
             self.widget_set_value('fam_nsp_data', '%s in %s genera'
-                                  % (nsp, ngen_in_sp))
+                                  % (loaded['nsp'], loaded['ngen_in_sp']))
 
         # stop here if no GardenPlugin
         if 'GardenPlugin' not in pluginmgr.plugins:
             return
 
-        # get the number of accessions in the family
-        from bauble.plugins.garden.accession import Accession
-        from bauble.plugins.garden.plant import Plant
-
-        nacc = (session.query(Accession).
-                join('species', 'genus', 'family').
-                filter_by(id=row.id).count())
-        if nacc == 0:
-            self.widget_set_value('fam_nacc_data', nacc)
+        if loaded['nacc'] == 0:
+            self.widget_set_value('fam_nacc_data', 0)
         else:
-            nsp_in_acc = (session.query(Accession.species_id).
-                          join('species', 'genus', 'family').
-                          filter_by(id=row.id).distinct().count())
             self.widget_set_value('fam_nacc_data', '%s in %s species'
-                                  % (nacc, nsp_in_acc))
+                                  % (loaded['nacc'], loaded['nsp_in_acc']))
 
-        # get the number of plants in the family
-        nplants = (session.query(Plant).
-                   join('accession', 'species', 'genus', 'family').
-                   filter_by(id=row.id).count())
-        if nplants == 0:
-            self.widget_set_value('fam_nplants_data', nplants)
+        if loaded['nplants'] == 0:
+            self.widget_set_value('fam_nplants_data', 0)
         else:
-            nacc_in_plants = session.query(Plant.accession_id).\
-                join('accession', 'species', 'genus', 'family').\
-                filter_by(id=row.id).distinct().count()
             self.widget_set_value('fam_nplants_data', '%s in %s accessions'
-                                  % (nplants, nacc_in_plants))
+                                  % (loaded['nplants'],
+                                     loaded['nacc_in_plants']))
 
 
 class SynonymsExpander(InfoExpander):
@@ -162,6 +162,7 @@ class Genus(db.Base, db.Serializable, db.WithNotes):
 
     rank = 'genus'
     link_keys = ['accepted']
+    search_view_prefetch = ['family']
 
     def search_view_markup_pair(self):
         '''provide the two lines describing object for SearchView row.
@@ -349,6 +350,36 @@ class Genus(db.Base, db.Serializable, db.WithNotes):
                                      for a in accessions
                                      if a.source and a.source.source_detail])}
 
+    @classmethod
+    def top_level_count_by_ids(cls, session, ids):
+        from bauble.plugins.garden.accession import Accession
+        from bauble.plugins.garden.plant import Plant
+        from bauble.plugins.garden.source import Source
+        families = (session.query(cls.family_id).
+                    filter(cls.id.in_(ids)).distinct())
+        nspecies = (session.query(Species).
+                    filter(Species.genus_id.in_(ids)).count())
+        naccessions = (session.query(Accession).join(Accession.species).
+                       filter(Species.genus_id.in_(ids)).count())
+        plants = (session.query(Plant).
+                  join(Plant.accession, Accession.species).
+                  filter(Species.genus_id.in_(ids)))
+        nplants, quantity = plants.with_entities(
+            func.count(Plant.id), func.sum(Plant.quantity)).one()
+        locations = plants.with_entities(Plant.location_id).distinct()
+        sources = (session.query(Source.source_detail_id).
+                   join(Source.accession, Accession.species).
+                   filter(Species.genus_id.in_(ids),
+                          Source.source_detail_id != None).distinct())
+        return {(1, 'Genera'): set(ids),
+                (2, 'Families'): set(i for (i, ) in families),
+                (3, 'Species'): nspecies,
+                (4, 'Accessions'): naccessions,
+                (5, 'Plantings'): nplants,
+                (6, 'Living plants'): quantity or 0,
+                (7, 'Locations'): set(i for (i, ) in locations),
+                (8, 'Sources'): set(i for (i, ) in sources)}
+
 
 class GenusNote(db.Base):
     """
@@ -393,8 +424,14 @@ class GenusSynonym(db.Base):
         return str(self.synonym)
 
 
+genus_index = editor.CompletionIndex(
+    Genus, lambda session: session.query(Genus.genus, Genus.id).
+    order_by(Genus.genus), ['genus'])
+
+
 # late bindings
-from bauble.plugins.plants.family import Family, FamilySynonym
+from bauble.plugins.plants.family import Family, FamilySynonym, \
+    family_index
 from bauble.plugins.plants.species_model import Species
 from bauble.plugins.plants.species_editor import edit_species
 
@@ -499,9 +536,7 @@ class GenusEditorPresenter(editor.GenericEditorPresenter):
 
         # connect signals
         def fam_get_completions(text):
-            query = self.session.query(Family)
-            return query.filter(Family.family.like('%s%%' % text)).\
-                order_by(Family.family)
+            return family_index.get(self.session, text)
 
         def on_select(value):
             for kid in self.view.widgets.message_box_parent.get_children():
@@ -614,10 +649,7 @@ class SynonymsPresenter(editor.GenericEditorPresenter):
         self.init_treeview()
 
         def gen_get_completions(text):
-            query = self.session.query(Genus)
-            return query.filter(and_(Genus.genus.like('%s%%' % text),
-                                     Genus.id != self.model.id)).\
-                order_by(Genus.genus)
+            return genus_index.get(self.session, text, exclude=self.model.id)
 
         self._selected = None
 
@@ -894,13 +926,52 @@ class GeneralGenusExpander(InfoExpander):
         utils.make_label_clickable(
             self.widgets.gen_nplants_data, on_nplants_clicked)
 
+    def load(self, row):
+        '''
+        count the species, accessions and plants in the genus
+
+        :param row: the genus to count for
+        '''
+        session = object_session(row)
+        # get the number of species
+        loaded = dict(nsp=(session.query(Species).
+                           join('genus').
+                           filter_by(id=row.id).count()))
+
+        # stop here if no GardenPlugin
+        if 'GardenPlugin' not in pluginmgr.plugins:
+            return loaded
+
+        from bauble.plugins.garden.accession import Accession
+        from bauble.plugins.garden.plant import Plant
+
+        # get number of accessions
+        loaded['nacc'] = (session.query(Accession).
+                          join('species', 'genus').
+                          filter_by(id=row.id).count())
+        if loaded['nacc']:
+            loaded['nsp_in_acc'] = (session.query(Accession.species_id).
+                                    join('species', 'genus').
+                                    filter_by(id=row.id).distinct().count())
+
+        # get the number of plants in the genus
+        loaded['nplants'] = (session.query(Plant).
+                             join('accession', 'species', 'genus').
+                             filter_by(id=row.id).count())
+        if loaded['nplants']:
+            loaded['nacc_in_plants'] = (
+                session.query(Plant.accession_id).
+                join('accession', 'species', 'genus').
+                filter_by(id=row.id).distinct().count())
+        return loaded
+
     def update(self, row):
         '''
         update the expander
 
         :param row: the row to get the values from
         '''
-        session = object_session(row)
+        loaded = self.get_loaded(row)
         self.current_obj = row
         self.widget_set_value('gen_name_data', '<big>%s</big> %s' %
                               (row, utils.xml_safe(unicode(row.author))),
@@ -908,44 +979,24 @@ class GeneralGenusExpander(InfoExpander):
         self.widget_set_value('gen_fam_data',
                               (utils.xml_safe(unicode(row.family))))
 
-        # get the number of species
-        nsp = (session.query(Species).
-               join('genus').
-               filter_by(id=row.id).count())
-        self.widget_set_value('gen_nsp_data', nsp)
+        self.widget_set_value('gen_nsp_data', loaded['nsp'])
 
         # stop here if no GardenPlugin
         if 'GardenPlugin' not in pluginmgr.plugins:
             return
 
-        from bauble.plugins.garden.accession import Accession
-        from bauble.plugins.garden.plant import Plant
-
-        # get number of accessions
-        nacc = (session.query(Accession).
-                join('species', 'genus').
-                filter_by(id=row.id).count())
-        if nacc == 0:
-            self.widget_set_value('gen_nacc_data', nacc)
+        if loaded['nacc'] == 0:
+            self.widget_set_value('gen_nacc_data', 0)
         else:
-            nsp_in_acc = (session.query(Accession.species_id).
-                          join('species', 'genus').
-                          filter_by(id=row.id).distinct().count())
             self.widget_set_value('gen_nacc_data', '%s in %s species'
-                                  % (nacc, nsp_in_acc))
+                                  % (loaded['nacc'], loaded['nsp_in_acc']))
 
-        # get the number of plants in the genus
-        nplants = (session.query(Plant).
-                   join('accession', 'species', 'genus').
-                   filter_by(id=row.id).count())
-        if nplants == 0:
-            self.widget_set_value('gen_nplants_data', nplants)
+        if loaded['nplants'] == 0:
+            self.widget_set_value('gen_nplants_data', 0)
         else:
-            nacc_in_plants = (session.query(Plant.accession_id).
-                              join('accession', 'species', 'genus').
-                              filter_by(id=row.id).distinct().count())
             self.widget_set_value('gen_nplants_data', '%s in %s accessions'
-                                  % (nplants, nacc_in_plants))
+                                  % (loaded['nplants'],
+                                     loaded['nacc_in_plants']))
 
 
 class SynonymsExpander(InfoExpander):
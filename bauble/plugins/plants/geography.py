@@ -30,6 +30,48 @@ from sqlalchemy.orm import object_session, relation, backref
 import bauble.db as db
 
 
+def _supports_recursive_cte(dialect):
+    """return True if the database understands WITH RECURSIVE"""
+    if dialect.name == 'postgresql':
+        return True
+    if dialect.name == 'sqlite':
+        return dialect.dbapi.sqlite_version_info >= (3, 8, 3)
+    return False
+
+
+def get_geography_descendants(session, geo_id):
+    """
+    Return the ids of geo_id and all the geography units under it
+
+    Where the database supports recursive common table expressions the
+    result is a select statement, to be used in an IN clause, so that
+    the whole tree is walked by the database in the query using it.
+    Otherwise the parent of every geography unit is fetched with a
+    single query and the tree is walked in Python.
+    """
+    geo_table = Geography.__table__
+    if _supports_recursive_cte(session.get_bind().dialect):
+        tree = select([geo_table.c.id]).\
+            where(geo_table.c.id == geo_id).\
+            cte('geography_tree', recursive=True)
+        tree = tree.union_all(
+            select([geo_table.c.id]).
+            where(geo_table.c.parent_id == tree.c.id))
+        return select([tree.c.id])
+
+    children = {}
+    for id, parent_id in session.execute(
+            select([geo_table.c.id, geo_table.c.parent_id])):
+        children.setdefault(parent_id, []).append(id)
+    result = set()
+    pending = [geo_id]
+    while pending:
+        id = pending.pop()
+        result.add(id)
+        pending.extend(children.get(id, []))
+    return result
+
+
 def get_species_in_geography(geo):
     """
     Return all the Species that have distribution in geo
@@ -38,26 +80,12 @@ def get_species_in_geography(geo):
     if not session:
         ValueError('get_species_in_geography(): geography is not in a session')
 
-    # get all the geography children under geo
     from bauble.plugins.plants.species_model import SpeciesDistribution, \
         Species
-    # get the children of geo
-    geo_table = geo.__table__
-    master_ids = set([geo.id])
-    # populate master_ids with all the geography ids that represent
-    # the children of particular geography id
-
-    def get_geography_children(parent_id):
-        stmt = select([geo_table.c.id], geo_table.c.parent_id == parent_id)
-        kids = [r[0] for r in db.engine.execute(stmt).fetchall()]
-        for kid in kids:
-            grand_kids = get_geography_children(kid)
-            master_ids.update(grand_kids)
-        return kids
-    geokids = get_geography_children(geo.id)
-    master_ids.update(geokids)
+    geo_ids = get_geography_descendants(session, geo.id)
     q = session.query(Species).join(SpeciesDistribution).\
-        filter(SpeciesDistribution.geography_id.in_(master_ids))
+        filter(SpeciesDistribution.geography_id.in_(geo_ids)).\
+        order_by(Species.id)
     return list(q)
 
 
@@ -171,7 +199,7 @@ class Geography(db.Base):
     __tablename__ = 'geography'
 
     # columns
-    name = Column(Unicode(255), nullable=False)
+    name = Column(Unicode(255), nullable=False, index=True)
     tdwg_code = Column(String(6))
     iso_code = Column(String(7))
     parent_id = Column(Integer, ForeignKey('geography.id'))
@@ -170,6 +170,32 @@ class SynonymSearch(search.SearchStrategy):
                 results.extend([syn.species for syn in q])
         return results
 
+    def search_keys(self, text, session):
+        """
+        Like search() but return the (class, id) keys of the accepted
+        names, with one IN query per synonym table and chunk of ids.
+        """
+        from genus import Genus, GenusSynonym
+        super(SynonymSearch, self).search(text, session)
+        if not prefs[self.return_synonyms_pref]:
+            return set()
+        mapper_search = search.get_strategy('MapperSearch')
+        ids = {}
+        for klass, obj_id in mapper_search.search_keys(text, session):
+            ids.setdefault(klass, []).append(obj_id)
+        results = set()
+        for klass, synonym in ((Species, SpeciesSynonym),
+                               (Genus, GenusSynonym)):
+            accepted_id = getattr(synonym, '%s_id' % klass.__tablename__)
+            synonym_ids = ids.get(klass, [])
+            for start in range(0, len(synonym_ids), db.MAX_IN_IDS):
+                chunk = synonym_ids[start:start + db.MAX_IN_IDS]
+                results.update(
+                    (klass, accepted) for (accepted, ) in
+                    session.query(accepted_id).
+                    filter(synonym.synonym_id.in_(chunk)))
+        return results
+
 
 #
 # Species infobox for SearchView
@@ -315,7 +341,6 @@ class GeneralSpeciesExpander(InfoExpander):
         :param row: the row to get the values from
         '''
         self.current_obj = row
-        session = object_session(row)
         # link function
         on_label_clicked = lambda l, e, x: select_in_search_results(x)
         # Link to family
@@ -368,23 +393,38 @@ class GeneralSpeciesExpander(InfoExpander):
         if 'GardenPlugin' not in pluginmgr.plugins:
             return
 
+        loaded = self.get_loaded(row)
+        self.widget_set_value('sp_nacc_data', loaded['nacc'])
+        if loaded['nplants'] == 0:
+            self.widget_set_value('sp_nplants_data', 0)
+        else:
+            self.widget_set_value('sp_nplants_data', '%s in %s accessions'
+                                  % (loaded['nplants'],
+                                     loaded['nacc_in_plants']))
+
+    def load(self, row):
+        '''
+        count the accessions and plants of the species
+
+        :param row: the species to count for
+        '''
+        if 'GardenPlugin' not in pluginmgr.plugins:
+            return None
+
         from bauble.plugins.garden.accession import Accession
         from bauble.plugins.garden.plant import Plant
 
-        nacc = session.query(Accession).join('species').\
-            filter_by(id=row.id).count()
-        self.widget_set_value('sp_nacc_data', nacc)
-
-        nplants = session.query(Plant).join('accession', 'species').\
+        session = object_session(row)
+        loaded = {}
+        loaded['nacc'] = session.query(Accession).join('species').\
             filter_by(id=row.id).count()
-        if nplants == 0:
-            self.widget_set_value('sp_nplants_data', nplants)
-        else:
-            nacc_in_plants = session.query(Plant.accession_id).\
+        loaded['nplants'] = session.query(Plant).\
+            join('accession', 'species').filter_by(id=row.id).count()
+        if loaded['nplants']:
+            loaded['nacc_in_plants'] = session.query(Plant.accession_id).\
                 join('accession', 'species').\
                 filter_by(id=row.id).distinct().count()
-            self.widget_set_value('sp_nplants_data', '%s in %s accessions'
-                                  % (nplants, nacc_in_plants))
+        return loaded
 
 
 class SpeciesInfoBox(InfoBox):
@@ -470,3 +510,8 @@ class VernacularNameInfoBox(SpeciesInfoBox):
             row.__class__.__name__, row))
         if isinstance(row, VernacularName):
             super(VernacularNameInfoBox, self).update(row.species)
+
+    def load(self, row, expanders):
+        if isinstance(row, VernacularName):
+            row = row.species
+        return super(VernacularNameInfoBox, self).load(row, expanders)
@@ -44,12 +44,18 @@ import bauble.paths as paths
 import bauble.editor as editor
 from bauble.plugins.plants.geography import GeographyMenu
 from bauble.plugins.plants.family import Family
-from bauble.plugins.plants.genus import Genus, GenusSynonym
+from bauble.plugins.plants.genus import Genus, GenusSynonym, genus_index
 from bauble.plugins.plants.species_model import (
     Species, SpeciesDistribution, VernacularName, SpeciesSynonym, Habit,
     infrasp_rank_values, compare_rank)
 
 
+species_index = editor.CompletionIndex(
+    Species, lambda session: session.query(Genus.genus, Species.id).
+    filter(Species.genus_id == Genus.id).order_by(Genus.genus, Species.sp),
+    ['genus', 'species'])
+
+
 class SpeciesEditorPresenter(editor.GenericEditorPresenter):
 
     PROBLEM_INVALID_GENUS = 1
@@ -121,9 +127,7 @@ class SpeciesEditorPresenter(editor.GenericEditorPresenter):
 
         # connect signals
         def gen_get_completions(text):
-            clause = utils.ilike(Genus.genus, '%s%%' % unicode(text))
-            return self.session.query(Genus).filter(clause).\
-                order_by(Genus.genus)
+            return genus_index.get(self.session, text)
 
         def sp_species_TPL_callback(found, accepted):
             # both found and accepted are dictionaries, their keys here
@@ -942,11 +946,8 @@ class SynonymsPresenter(editor.GenericEditorPresenter):
         self.init_treeview()
 
         def sp_get_completions(text):
-            query = self.session.query(Species).join('genus').\
-                filter(utils.ilike(Genus.genus, '%s%%' % text)).\
-                filter(Species.id != self.model.id).\
-                order_by(Genus.genus, Species.sp)
-            return query
+            return species_index.get(self.session, text,
+                                     exclude=self.model.id)
 
         def on_select(value):
             sensitive = True
@@ -27,8 +27,10 @@ logger = logging.getLogger(__name__)
 from sqlalchemy.ext.associationproxy import association_proxy
 
 from sqlalchemy import Column, Boolean, Unicode, Integer, ForeignKey, \
-    UnicodeText, func, UniqueConstraint
-from sqlalchemy.orm import relation, backref, synonym
+    UnicodeText, func, UniqueConstraint, event
+from sqlalchemy.orm import relation, backref, synonym, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 import bauble.db as db
 import bauble.error as error
 import bauble.utils as utils
@@ -154,6 +156,13 @@ class Species(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
 
     rank = 'species'
     link_keys = ['accepted']
+    # relations used by search_view_markup_pair, SearchView loads them
+    # for all the rows on screen at once
+    search_view_prefetch = ['genus.family', 'vernacular_names',
+                            '_syn.species.genus']
+    # the attributes str() shows, SearchView sorts the results on them
+    search_view_order = ['genus.genus', 'sp', 'sp2', 'infrasp1',
+                         'infrasp2', 'infrasp3', 'infrasp4', 'cv_group']
 
     def search_view_markup_pair(self):
         '''provide the two lines describing object for SearchView row.
@@ -279,22 +288,22 @@ class Species(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
     cv_group = Column(Unicode(50))
     trade_name = Column(Unicode(64))
 
-    infrasp1 = Column(Unicode(64))
+    infrasp1 = Column(Unicode(64), index=True)
     infrasp1_rank = Column(types.Enum(values=infrasp_rank_values.keys(),
                                       translations=infrasp_rank_values))
     infrasp1_author = Column(Unicode(64))
 
-    infrasp2 = Column(Unicode(64))
+    infrasp2 = Column(Unicode(64), index=True)
     infrasp2_rank = Column(types.Enum(values=infrasp_rank_values.keys(),
                                       translations=infrasp_rank_values))
     infrasp2_author = Column(Unicode(64))
 
-    infrasp3 = Column(Unicode(64))
+    infrasp3 = Column(Unicode(64), index=True)
     infrasp3_rank = Column(types.Enum(values=infrasp_rank_values.keys(),
                                       translations=infrasp_rank_values))
     infrasp3_author = Column(Unicode(64))
 
-    infrasp4 = Column(Unicode(64))
+    infrasp4 = Column(Unicode(64), index=True)
     infrasp4_rank = Column(types.Enum(values=infrasp_rank_values.keys(),
                                       translations=infrasp_rank_values))
     infrasp4_author = Column(Unicode(64))
@@ -508,8 +517,12 @@ class Species(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
         if not session:
             logger.warn('species:accepted - object not in session')
             return None
-        syn = session.query(SpeciesSynonym).filter(
-            SpeciesSynonym.synonym_id == self.id).first()
+        if '_syn' in self.__dict__:
+            # already loaded, e.g. prefetched by the SearchView
+            syn = self._syn[0] if self._syn else None
+        else:
+            syn = session.query(SpeciesSynonym).filter(
+                SpeciesSynonym.synonym_id == self.id).first()
         accepted = syn and syn.species
         return accepted
 
@@ -632,6 +645,34 @@ class Species(db.Base, db.Serializable, db.DefiningPictures, db.WithNotes):
                                      for a in self.accessions
                                      if a.source and a.source.source_detail])}
 
+    @classmethod
+    def top_level_count_by_ids(cls, session, ids):
+        from genus import Genus
+        from bauble.plugins.garden.accession import Accession
+        from bauble.plugins.garden.plant import Plant
+        from bauble.plugins.garden.source import Source
+        taxa = (session.query(cls.genus_id, Genus.family_id).
+                join(cls.genus).filter(cls.id.in_(ids)).distinct().all())
+        naccessions = (session.query(Accession).
+                       filter(Accession.species_id.in_(ids)).count())
+        plants = (session.query(Plant).join(Plant.accession).
+                  filter(Accession.species_id.in_(ids)))
+        nplants, quantity = plants.with_entities(
+            func.count(Plant.id), func.sum(Plant.quantity)).one()
+        locations = plants.with_entities(Plant.location_id).distinct()
+        sources = (session.query(Source.source_detail_id).
+                   join(Source.accession).
+                   filter(Accession.species_id.in_(ids),
+                          Source.source_detail_id != None).distinct())
+        return {(1, 'Species'): len(ids),
+                (2, 'Genera'): set(g for (g, f) in taxa),
+                (3, 'Families'): set(f for (g, f) in taxa),
+                (4, 'Accessions'): naccessions,
+                (5, 'Plantings'): nplants,
+                (6, 'Living plants'): quantity or 0,
+                (7, 'Locations'): set(i for (i, ) in locations),
+                (8, 'Sources'): set(i for (i, ) in sources)}
+
 
 class SpeciesNote(db.Base, db.Serializable):
     """
@@ -703,6 +744,31 @@ class SpeciesSynonym(db.Base):
         return str(self.synonym)
 
 
+def _set_loaded_syn(target, inserted):
+    '''
+    Keep the _syn of the synonym species in step with the inserted or
+    deleted SpeciesSynonym target, if it is loaded: _syn has no backref
+    and Species.accepted reads it when it is loaded.
+    '''
+    session = object_session(target)
+    if session is None:
+        return
+    synonym = session.identity_map.get(
+        identity_key(Species, target.synonym_id))
+    if synonym is None or '_syn' not in synonym.__dict__:
+        return
+    syn = [i for i in synonym.__dict__['_syn'] if i is not target]
+    if inserted:
+        syn.append(target)
+    set_committed_value(synonym, '_syn', syn)
+
+
+event.listen(SpeciesSynonym, 'after_insert',
+             lambda mapper, connection, target: _set_loaded_syn(target, True))
+event.listen(SpeciesSynonym, 'after_delete',
+             lambda mapper, connection, target: _set_loaded_syn(target, False))
+
+
 class VernacularName(db.Base, db.Serializable):
     """
     :Table name: vernacular_name
@@ -728,6 +794,7 @@ class VernacularName(db.Base, db.Serializable):
     species_id = Column(Integer, ForeignKey('species.id'), nullable=False)
     __table_args__ = (UniqueConstraint('name', 'language',
                                        'species_id', name='vn_index'), {})
+    search_view_prefetch = ['species.genus']
 
     def search_view_markup_pair(self):
         """provide the two lines describing object for SearchView row.
@@ -776,6 +843,10 @@ class VernacularName(db.Base, db.Serializable):
         except:
             return None
 
+    @property
+    def picture_names(self):
+        return self.species.picture_names
+
     @property
     def pictures(self):
         return self.species.pictures
@@ -1105,6 +1105,23 @@ class SpeciesTests(PlantTestCase):
         self.assertEquals(sp3.accepted, sp1) 
         self.assertEquals(sp4.accepted, None)
 
+    def test_accepted_follows_loaded_syn(self):
+        sp1 = Species(id=61, epithet=u'sp61', genus_id=1)
+        sp2 = Species(id=62, epithet=u'sp62', genus_id=1)
+        sp3 = Species(id=63, epithet=u'sp63', genus_id=1)
+        self.session.add_all([sp1, sp2, sp3])
+        self.session.commit()
+        # as after a prefetch by the SearchView
+        self.assertEquals(sp2._syn, [])
+        sp2.accepted = sp1
+        self.assertEquals(sp2.accepted, sp1)
+        sp2.accepted = sp3
+        self.assertEquals(sp2.accepted, sp3)
+        self.session.commit()
+        self.session.delete(sp3)
+        self.session.commit()
+        self.assertEquals(sp2.accepted, None)
+
     def test_remove_callback_no_accessions_no_confirm(self):
         # T_0
         caricaceae = Family(family=u'Caricaceae')
@@ -1257,6 +1274,24 @@ class GeographyTests(PlantTestCase):
         species = get_species_in_geography(north_america)
         self.assert_([s.id for s in species] == [sp1.id, sp2.id, sp3.id])
 
+    def test_get_geography_descendants(self):
+        import bauble.plugins.plants.geography as geography
+        mexico_id = 53
+        ids = geography.get_geography_descendants(self.session, mexico_id)
+        if not isinstance(ids, set):
+            ids = set(r[0] for r in self.session.execute(ids))
+        self.assertTrue(set([53, 267, 665]).issubset(ids))
+        self.assertFalse(45 in ids)
+        # the walk in python gives the same result as the database
+        supports_cte = geography._supports_recursive_cte
+        geography._supports_recursive_cte = lambda dialect: False
+        try:
+            self.assertEquals(
+                geography.get_geography_descendants(self.session, mexico_id),
+                ids)
+        finally:
+            geography._supports_recursive_cte = supports_cte
+
     def test_species_distribution_str(self):
         # create a some species
         sp1 = Species(genus=self.genus, sp=u'sp1')
@@ -1991,3 +2026,26 @@ class BaubleSearchSearchTest(BaubleTestCase):
         bauble.search.search("So ha", self.session)
         self.assertTrue('SearchStrategy "So ha"(SynonymSearch)' in 
                    self.handler.messages['bauble.search']['debug'])
+
+
+class SplashStatisticsTests(PlantTestCase):
+
+    def test_statistics_in_one_statement(self):
+        from bauble.plugins.plants import get_statistics, splash_statistics
+        values = get_statistics(self.session, splash_statistics)
+        self.assertEquals(values['splash_nfamtot'],
+                          self.session.query(Family).count())
+        self.assertEquals(values['splash_nspctot'],
+                          self.session.query(Species).count())
+        self.assertEquals(values['splash_nspcuse'], 0)
+
+    def test_statistics_cached_until_change(self):
+        from bauble.plugins.plants import get_statistics, splash_statistics
+        values = get_statistics(self.session, splash_statistics)
+        self.assertTrue(get_statistics(self.session, splash_statistics)
+                        is values)
+        self.session.add(Family(family=u'Cactaceae'))
+        self.session.commit()
+        newvalues = get_statistics(self.session, splash_statistics)
+        self.assertEquals(newvalues['splash_nfamtot'],
+                          values['splash_nfamtot'] + 1)
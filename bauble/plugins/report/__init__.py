@@ -41,6 +41,7 @@ import bauble.utils as utils
 import bauble.paths as paths
 from bauble.prefs import prefs
 import bauble.pluginmgr as pluginmgr
+import bauble.sqlprofile as sqlprofile
 from bauble.plugins.plants import Family, Genus, Species, VernacularName
 from bauble.plugins.garden import Accession, Plant, Location
 from bauble.plugins.tag import Tag
@@ -625,7 +626,10 @@ class ReportTool(pluginmgr.Tool):
                 formatter, settings = dialog.start()
                 if formatter is None:
                     break
-                ok = formatter.format([row[0] for row in model], **settings)
+                with sqlprofile.operation(
+                        'report %s' % type(formatter).__name__):
+                    ok = formatter.format([row[0] for row in model],
+                                          **settings)
                 if ok:
                     break
         except AssertionError, e:
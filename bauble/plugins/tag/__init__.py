@@ -32,10 +32,10 @@ logger = logging.getLogger(__name__)
 #logger.setLevel(logging.DEBUG)
 
 from sqlalchemy import (
-    Column, Unicode, UnicodeText, Integer, String, ForeignKey)
+    Column, Unicode, UnicodeText, Integer, String, ForeignKey, Index)
 from sqlalchemy.orm import relation
 from sqlalchemy.orm.exc import DetachedInstanceError
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from sqlalchemy.exc import DBAPIError, InvalidRequestError
 from sqlalchemy.orm.session import object_session
 
@@ -266,7 +266,7 @@ class Tag(db.Base):
     _objects = relation('TaggedObj', cascade='all, delete-orphan',
                         backref='tag')
 
-    __my_own_timestamp = None
+    __last_history = None
     __last_objects = None
 
     def __str__(self):
@@ -297,18 +297,13 @@ class Tag(db.Base):
         reuse last result if nothing was changed in the database since
         list was retrieved.
         """
-        if self.__my_own_timestamp is not None:
-            # should I update my list?
-            session = object_session(self)
-            last_history = session.query(db.History)\
-                .order_by(db.History.timestamp.desc())\
-                .limit(1).one()
-            if last_history.timestamp > self.__my_own_timestamp:
-                self.__last_objects = None
+        session = object_session(self)
+        last_history = session.query(func.max(db.History.id)).scalar()
+        if last_history != self.__last_history:
+            self.__last_objects = None
         if self.__last_objects is None:
             # here I update my list
-            from datetime import datetime
-            self.__my_own_timestamp = datetime.now()
+            self.__last_history = last_history
             self.__last_objects = self.get_tagged_objects()
         # here I return my list
         return self.__last_objects
@@ -354,9 +349,7 @@ class Tag(db.Base):
     def search_view_markup_pair(self):
         '''provide the two lines describing object for SearchView row.
         '''
-        import inspect
-        logging.debug('entering search_view_markup_pair %s, %s' % (
-            self, str(inspect.stack()[1])))
+        logger.debug('entering search_view_markup_pair %s' % self)
         objects = self.objects
         classes = set(type(o) for o in objects)
         if len(classes) == 1:
@@ -393,6 +386,7 @@ class TaggedObj(db.Base):
 
     """
     __tablename__ = 'tagged_obj'
+    __table_args__ = (Index('tagged_obj_class_id', 'obj_class', 'obj_id'), {})
 
     # columns
     obj_id = Column(Integer, autoincrement=False)
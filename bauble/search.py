@@ -27,7 +27,8 @@ import logging
 logger = logging.getLogger(__name__)
 #logger.setLevel(logging.DEBUG)
 
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, select, union_all, literal_column
+from sqlalchemy import Integer
 from sqlalchemy import Unicode
 from sqlalchemy import UnicodeText
 from sqlalchemy.orm import class_mapper
@@ -36,6 +37,7 @@ from sqlalchemy.orm.properties import (
 RelationProperty = RelationshipProperty
 
 import bauble
+import bauble.db as db
 from bauble.error import check
 import bauble.utils as utils
 from bauble.i18n import _
@@ -53,6 +55,44 @@ def search(text, session=None):
     return list(results)
 
 
+def search_keys(text, session=None):
+    """
+    Like :func:`search` but return the (class, id) keys of the objects
+    found, without loading them.
+    """
+    results = set()
+    for strategy in _search_strategies.values():
+        logger.debug("applying search strategy %s from module %s" %
+                     (type(strategy).__name__, type(strategy).__module__))
+        results.update(strategy.search_keys(text, session))
+    return list(results)
+
+
+def query_objects(queries):
+    """return the set of the objects selected by queries
+    """
+    result = set()
+    for query in queries:
+        result.update(query.all())
+    if None in result:
+        logger.warn('removing None from result set')
+        result.discard(None)
+    return result
+
+
+def query_keys(queries):
+    """return the set of (class, id) keys of the objects selected by
+    queries, only the ids are selected
+    """
+    result = set()
+    for query in queries:
+        cls = query.column_descriptions[0]['type']
+        result.update((cls, obj_id)
+                      for (obj_id, ) in query.with_entities(cls.id)
+                      if obj_id is not None)
+    return result
+
+
 class NoneToken(object):
     def __init__(self, t=None):
         pass
@@ -159,8 +199,17 @@ class TypedValueToken(ValueABC):
             constructor, converter = self.constructor[t[1]]
         except KeyError:
             return
-        params = tuple(converter(i) for i in t[3].express())
-        self.value = constructor(*params)
+        self.constructor = constructor
+        self.params = tuple(converter(i) for i in t[3].express())
+        # fail on bad parameters while parsing
+        self.value
+
+    @property
+    def value(self):
+        # computed when the statement is invoked, not when it is parsed:
+        # parsed statements are cached, and |datetime|-1| is the day
+        # before the search, not before the first search of that text
+        return self.constructor(*self.params)
 
     def __repr__(self):
         return "%s" % (self.value)
@@ -374,13 +423,27 @@ class ParenthesisedQuery(object):
         return self.query.needs_join(env)
 
 
+class QueryEnvironment(object):
+    """
+    What the filter of a QueryAction is evaluated against: the domain
+    class, the session and the search strategy of one invoke.  The
+    parsed QueryAction is cached, so it must not keep them.
+    """
+
+    def __init__(self, search_strategy, domain, session):
+        self.search_strategy = search_strategy
+        self.domain = domain
+        self.session = session
+        self.domains = []
+
+
 class QueryAction(object):
     def __init__(self, t):
-        self.domain = t[0]
+        self.domain = self.domain_name = t[0]
         self.filter = t[1][0]
 
     def __repr__(self):
-        return "SELECT * FROM %s WHERE %s" % (self.domain, self.filter)
+        return "SELECT * FROM %s WHERE %s" % (self.domain_name, self.filter)
 
     def invoke(self, search_strategy):
         """
@@ -391,35 +454,37 @@ class QueryAction(object):
         database types. For example, on a PostgreSQL database you can
         use ilike but this would raise an error on SQLite.
         """
+        return query_objects(self.queries(search_strategy))
 
-        logger.debug('QueryAction:invoke - %s(%s) %s(%s)' %
+    def keys(self, search_strategy):
+        return query_keys(self.queries(search_strategy))
+
+    def queries(self, search_strategy):
+        logger.debug('QueryAction:queries - %s(%s) %s(%s)' %
                      (type(self.domain), self.domain,
                       type(self.filter), self.filter))
-        domain = self.domain
+        # parsed statements are cached and invoked again, the domain
+        # class and the session go in an environment of this invoke.
+        domain = self.domain_name
         check(domain in search_strategy._domains or
               domain in search_strategy._shorthand,
               'Unknown search domain: %s' % domain)
-        self.domain = search_strategy._shorthand.get(domain, domain)
-        self.domain = search_strategy._domains[domain][0]
-        self.search_strategy = search_strategy
-
-        result = set()
-        if search_strategy._session is not None:
-            self.domains = self.filter.needs_join(self)
-            self.session = search_strategy._session
-            records = self.filter.evaluate(self).all()
-            result.update(records)
+        domain = search_strategy._shorthand.get(domain, domain)
 
-        if None in result:
-            logger.warn('removing None from result set')
-            result = set(i for i in result if i is not None)
-        return result
+        if search_strategy._session is None:
+            return []
+        env = QueryEnvironment(search_strategy,
+                               search_strategy._domains[domain][0],
+                               search_strategy._session)
+        env.domains = self.filter.needs_join(env)
+        return [self.filter.evaluate(env)]
 
 
 class StatementAction(object):
     def __init__(self, t):
         self.content = t[0]
         self.invoke = lambda x: self.content.invoke(x)
+        self.keys = lambda x: self.content.keys(x)
 
     def __repr__(self):
         return repr(self.content)
@@ -440,16 +505,17 @@ class BinomialNameAction(object):
 
     def invoke(self, search_strategy):
         logger.debug('BinomialNameAction:invoke')
+        return query_objects(self.queries(search_strategy))
+
+    def keys(self, search_strategy):
+        return query_keys(self.queries(search_strategy))
+
+    def queries(self, search_strategy):
         from bauble.plugins.plants.genus import Genus
         from bauble.plugins.plants.species import Species
-        result = search_strategy._session.query(Species).filter(
+        return [search_strategy._session.query(Species).filter(
             Species.sp.startswith(self.species_epithet)).join(Genus).filter(
-            Genus.genus.startswith(self.genus_epithet)).all()
-        result = set(result)
-        if None in result:
-            logger.warn('removing None from result set')
-            result = set(i for i in result if i is not None)
-        return result
+            Genus.genus.startswith(self.genus_epithet))]
 
 
 class DomainExpressionAction(object):
@@ -472,10 +538,15 @@ class DomainExpressionAction(object):
 
     def invoke(self, search_strategy):
         logger.debug('DomainExpressionAction:invoke')
+        return query_objects(self.queries(search_strategy))
+
+    def keys(self, search_strategy):
+        return query_keys(self.queries(search_strategy))
+
+    def queries(self, search_strategy):
+        domain = search_strategy._shorthand.get(self.domain, self.domain)
         try:
-            if self.domain in search_strategy._shorthand:
-                self.domain = search_strategy._shorthand[self.domain]
-            cls, properties = search_strategy._domains[self.domain]
+            cls, properties = search_strategy._domains[domain]
         except KeyError:
             raise KeyError(_('Unknown search domain: %s') % self.domain)
 
@@ -485,12 +556,9 @@ class DomainExpressionAction(object):
         ## domain values. each domain class should define its own 'I have
         ## accessions' filter. see issue #42
 
-        result = set()
-
         # select all objects from the domain
         if self.values == '*':
-            result.update(query.all())
-            return result
+            return [query]
 
         mapper = class_mapper(cls)
 
@@ -507,14 +575,9 @@ class DomainExpressionAction(object):
             condition = lambda col: \
                 lambda val: mapper.c[col].op(self.cond)(val)
 
-        for col in properties:
-            ors = or_(*map(condition(col), self.values.express()))
-            result.update(query.filter(ors).all())
-
-        if None in result:
-            logger.warn('removing None from result set')
-            result = set(i for i in result if i is not None)
-        return result
+        return [query.filter(or_(*map(condition(col),
+                                      self.values.express())))
+                for col in properties]
 
 
 class AggregatingAction(object):
@@ -565,13 +628,62 @@ class ValueListAction(object):
         """
 
         logger.debug('ValueListAction:invoke')
+        session = search_strategy._session
+        result = set()
+        for cls, cls_ids in self.ids(search_strategy).items():
+            result.update(db.get_by_ids(session, cls, cls_ids))
+
+        def replace(i):
+            try:
+                replacement = i.replacement()
+                logger.debug('replacing %s by %s in result set' %
+                             (i, replacement))
+                return replacement
+            except:
+                return i
+        result = set([replace(i) for i in result])
+        logger.debug("result is now %s" % result)
+        if None in result:
+            logger.warn('removing None from result set')
+            result = set(i for i in result if i is not None)
+        return result
+
+    def keys(self, search_strategy):
+        """
+        Like invoke() but return (class, id) keys.  Only the objects of
+        the classes that replace themselves in the results are loaded.
+        """
+        result = set()
+        replaced = []
+        for cls, cls_ids in self.ids(search_strategy).items():
+            if hasattr(cls, 'replacement'):
+                replaced.append((cls, cls_ids))
+            else:
+                result.update((cls, obj_id) for obj_id in cls_ids)
+        session = search_strategy._session
+        for cls, cls_ids in replaced:
+            for obj in db.get_by_ids(session, cls, cls_ids):
+                replacement = obj.replacement()
+                if replacement is not None:
+                    result.add((type(replacement), replacement.id))
+        return result
+
+    def ids(self, search_strategy):
+        """
+        Return a dict of the classes to the set of ids of their objects
+        matching any of the values.
+        """
         # make searches case-insensitive, in postgres use ilike,
         # in other use upper()
         like = lambda table, col, val: \
             utils.ilike(table.c[col], ('%%%s%%' % val))
 
-        result = set()
-        for cls, columns in search_strategy._properties.iteritems():
+        # one SELECT type, id per searchable class, all joined in a single
+        # UNION ALL statement; the type is the position in `classes`.
+        classes = search_strategy._properties.keys()
+        selects = []
+        for ndx, cls in enumerate(classes):
+            columns = search_strategy._properties[cls]
             column_cross_value = [(c, v) for c in columns
                                   for v in self.express()]
             # as of SQLAlchemy>=0.4.2 we convert the value to a unicode
@@ -586,25 +698,19 @@ class ValueListAction(object):
                     return v
 
             table = class_mapper(cls)
-            q = search_strategy._session.query(cls)  # prepares SELECT
-            q = q.filter(or_(*[like(table, c, unicol(c, v))
-                               for c, v in column_cross_value]))
-            result.update(q.all())
+            selects.append(
+                select([literal_column(str(ndx), Integer).label('type'),
+                        table.c['id'].label('id')]).
+                where(or_(*[like(table, c, unicol(c, v))
+                            for c, v in column_cross_value])))
 
-        def replace(i):
-            try:
-                replacement = i.replacement()
-                logger.debug('replacing %s by %s in result set' %
-                             (i, replacement))
-                return replacement
-            except:
-                return i
-        result = set([replace(i) for i in result])
-        logger.debug("result is now %s" % result)
-        if None in result:
-            logger.warn('removing None from result set')
-            result = set(i for i in result if i is not None)
-        return result
+        ids = {}
+        if not selects:
+            return ids
+        session = search_strategy._session
+        for ndx, obj_id in session.execute(union_all(*selects)):
+            ids.setdefault(classes[ndx], set()).add(obj_id)
+        return ids
 
 
 from pyparsing import (
@@ -705,15 +811,26 @@ class SearchParser(object):
                  | value_list('value_list')
                  ).setParseAction(StatementAction)('statement')
 
+    # number of parsed statements kept by each parser
+    cache_size = 64
+
+    def __init__(self):
+        self.cache = utils.Cache(self.cache_size)
+
     def parse_string(self, text):
         '''request pyparsing object to parse text
 
         `text` can be either a query, or a domain expression, or a list of
         values. the `self.statement` pyparsing object parses the input text
         and return a pyparsing.ParseResults object that represents the input
+
+        results are cached by the stripped text, so that repeated searches
+        are not parsed again.  strings that do not parse are not cached.
         '''
 
-        return self.statement.parseString(text)
+        text = text.strip()
+        return self.cache.get(
+            text, lambda: self.statement.parseString(text))
 
 
 class SearchStrategy(object):
@@ -732,6 +849,13 @@ class SearchStrategy(object):
         logger.debug('SearchStrategy "%s"(%s)' % (text, self.__class__.__name__))
         pass
 
+    def search_keys(self, text, session=None):
+        '''
+        Return the (class, id) keys of the objects search() returns.
+        Strategies that can select the ids only should override it.
+        '''
+        return set((type(obj), obj.id) for obj in self.search(text, session))
+
 
 class MapperSearch(SearchStrategy):
 
@@ -808,13 +932,30 @@ class MapperSearch(SearchStrategy):
         self._results.clear()
         statement = self.parser.parse_string(text.decode()).statement
         logger.debug("statement : %s(%s)" % (type(statement), statement))
-        self._results.update(statement.invoke(self))
+        try:
+            self._results.update(statement.invoke(self))
+        finally:
+            # don't keep the session alive until the next search
+            self._session = None
         logger.debug('search returns %s(%s)'
                      % (type(self._results), self._results))
 
         # these _results get filled in when the parse actions are called
         return self._results
 
+    def search_keys(self, text, session=None):
+        """
+        Returns a set() of the (class, id) keys of the database hits for
+        the text search string, without loading the objects.
+        """
+        super(MapperSearch, self).search(text, session)
+        self._session = session
+        statement = self.parser.parse_string(text.decode()).statement
+        try:
+            return statement.keys(self)
+        finally:
+            self._session = None
+
 
 ## list of search strategies to be tried on each search string
 _search_strategies = {'MapperSearch': MapperSearch()}
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of ghini.desktop.
+#
+# ghini.desktop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ghini.desktop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ghini.desktop. If not, see <http://www.gnu.org/licenses/>.
+#
+# sqlprofile.py
+#
+
+"""
+Count the SQL statements run by each user action.
+
+The profiling is off until :func:`enable` is called, for example by the
+`:sqlprofile on` command.  Then the statements run by the cursors of
+every engine are added to the operations open in the same thread, see
+:func:`operation`, and each operation logs a summary when it ends: how
+many statements it ran, how long they took and which statement shapes
+were repeated.  A shape that runs more than N_PLUS_ONE times in one
+operation is reported as a likely N+1, a relation loaded row by row.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# the number of runs of the same shape in one operation that is still fine
+N_PLUS_ONE = 10
+
+enabled = False
+
+# the summaries of the last operations, the newest last
+recent = deque(maxlen=20)
+
+_local = threading.local()
+
+_space = re.compile(r'\s+')
+_literal = re.compile(r"%\(\w+\)s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_param_list = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def shape(statement):
+    """
+    Return statement without its literals, parameter names and the
+    length of its parameter lists, so that the statements that only
+    differ in their values have the same shape.
+    """
+    statement = _space.sub(' ', statement.strip())
+    statement = _literal.sub('?', statement)
+    return _param_list.sub('(?, ...)', statement)
+
+
+class Profile(object):
+    """
+    The statements run during one operation.
+
+    :ivar name: the name of the operation
+    :ivar count: how many statements were run
+    :ivar elapsed: how many seconds they took
+    :ivar shapes: a dict of shape to [count, elapsed]
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.elapsed = 0.0
+        self.shapes = {}
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.elapsed += elapsed
+        entry = self.shapes.setdefault(shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def repeated(self, threshold=None):
+        """
+        Return the (shape, count, elapsed) of the shapes that ran more
+        than threshold times, by default N_PLUS_ONE, the most run first.
+        """
+        if threshold is None:
+            threshold = N_PLUS_ONE
+        return sorted(((s, count, elapsed)
+                       for s, (count, elapsed) in self.shapes.items()
+                       if count > threshold),
+                      key=lambda item: -item[1])
+
+    def summary(self):
+        lines = ['%s: %d statements, %d shapes, %.3fs' %
+                 (self.name, self.count, len(self.shapes), self.elapsed)]
+        for s, count, elapsed in self.repeated():
+            lines.append('  possible N+1, %d times, %.3fs: %s' %
+                         (count, elapsed, s))
+        return '\n'.join(lines)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('sqlprofile_start', []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    starts = conn.info.get('sqlprofile_start')
+    if not starts:
+        # enabled while the statement was running
+        return
+    elapsed = time.time() - starts.pop()
+    for profile in getattr(_local, 'stack', ()):
+        profile.record(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    # the statement raised, there won't be an after_cursor_execute
+    conn = exception_context.connection
+    starts = conn is not None and conn.info.get('sqlprofile_start')
+    if starts:
+        starts.pop()
+
+
+def enable():
+    """
+    Start profiling the statements of all the engines.
+    """
+    global enabled
+    if enabled:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    enabled = True
+
+
+def disable():
+    """
+    Stop profiling, the statements run no code of ours anymore.
+    """
+    global enabled
+    if not enabled:
+        return
+    event.remove(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.remove(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.remove(Engine, 'handle_error', _handle_error)
+    enabled = False
+
+
+def report(profile):
+    """
+    Log the summary of profile and keep it in recent.
+    """
+    summary = profile.summary()
+    recent.append(summary)
+    if profile.repeated():
+        logger.warning(summary)
+    else:
+        logger.info(summary)
+
+
+@contextmanager
+def operation(name):
+    """
+    Profile the statements run in the with block, by this thread, as
+    the operation name, and report them at the end of the block.  The
+    statements of a nested operation also count for the outer ones.
+
+    Yield the :class:`Profile`, or None while profiling is disabled.
+    """
+    if not enabled:
+        yield None
+        return
+    profile = Profile(name)
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(profile)
+    try:
+        yield profile
+    finally:
+        stack.remove(profile)
+        report(profile)
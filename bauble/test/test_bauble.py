@@ -260,6 +260,43 @@ class HistoryTests(BaubleTestCase):
             order_by(db.History.timestamp.desc()).first()
         assert history.table_name == 'family' and history.operation == 'delete'
 
+    def test_history_rows_written_per_flush(self):
+        from bauble.plugins.plants import Family
+        self.session.add_all([Family(family=u'Family%s' % i)
+                              for i in range(3)])
+        self.session.flush()
+        self.assertFalse('bauble.history_rows' in self.session.info)
+        self.assertEquals(self.session.query(db.History).
+                          filter_by(table_name='family',
+                                    operation='insert').count(), 3)
+
+    def test_history_follows_session_rollback(self):
+        from bauble.plugins.plants import Family
+        before = self.session.query(db.History).count()
+        self.session.add(Family(family=u'Family'))
+        self.session.flush()
+        self.session.rollback()
+        self.assertEquals(self.session.query(db.History).count(), before)
+
+    def test_filtered(self):
+        import datetime
+        from bauble.plugins.plants import Family
+        f1 = Family(family=u'Family1')
+        f2 = Family(family=u'Family2')
+        self.session.add_all([f1, f2])
+        self.session.commit()
+        f1.family = u'Family3'
+        self.session.commit()
+        rows = db.History.filtered(self.session, table_name='family',
+                                   table_id=f1.id).all()
+        self.assertEquals(sorted(r.operation for r in rows),
+                          ['insert', 'update'])
+        now = datetime.datetime.today()
+        self.assertEquals(db.History.filtered(
+            self.session, table_name='family', since=now).count(), 0)
+        self.assertEquals(db.History.filtered(
+            self.session, table_name='family', until=now).count(), 3)
+
 
 class MVPTests(BaubleTestCase):
 
@@ -356,6 +356,9 @@ class ConnMgrPresenterTests(BaubleTestCase):
                   'pictures': '/tmp/'}
         self.assertEquals(presenter.parameters_to_uri(params),
                           'sqlite:////tmp/test.db')
+        params['performance'] = True
+        self.assertEquals(presenter.parameters_to_uri(params),
+                          'sqlite:////tmp/test.db?profile=performance')
         params = {'type': 'PostgreSQL',
                   'passwd': False,
                   'pictures': '/tmp/',
@@ -36,3 +36,95 @@ class GlobalFunctionsTests(BaubleTestCase):
         self.assertEquals(db.class_of_object("accession_note"),
                           bauble.plugins.garden.accession.AccessionNote)
         self.assertEquals(db.class_of_object("not_existing"), None)
+
+
+class EngineOptionsTests(BaubleTestCase):
+
+    def test_pool_per_dialect(self):
+        from sqlalchemy.pool import QueuePool, SingletonThreadPool
+        options = db.engine_options('postgresql://user@localhost/bauble')
+        self.assertEquals(options['poolclass'], QueuePool)
+        self.assertEquals(options['pool_size'], db.POOL_SIZE)
+        options = db.engine_options('sqlite:///bauble.db')
+        self.assertEquals(options['poolclass'], QueuePool)
+        self.assertEquals(options['pool_size'], 1)
+        options = db.engine_options('sqlite:///:memory:')
+        self.assertEquals(options['poolclass'], SingletonThreadPool)
+
+    def test_session_scope_closes_session(self):
+        from bauble.plugins.plants.family import Family
+        self.session.add(Family(family=u'family'))
+        self.session.commit()
+        with db.session_scope() as session:
+            family = session.query(Family).first()
+            self.assertTrue(family in session)
+        self.assertFalse(family in session)
+
+    def test_set_pragmas(self):
+        import os
+        import sqlite3
+        import tempfile
+        handle, filename = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            connection = sqlite3.connect(filename)
+            db._set_pragmas(db.SQLITE_PROFILES['performance'], connection,
+                            None)
+            cursor = connection.cursor()
+            self.assertEquals(
+                cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEquals(
+                cursor.execute('PRAGMA foreign_keys').fetchone()[0], 1)
+            self.assertEquals(
+                cursor.execute('PRAGMA temp_store').fetchone()[0], 2)
+            connection.close()
+        finally:
+            os.remove(filename)
+
+
+class IndexTests(BaubleTestCase):
+
+    def test_foreign_keys_are_indexed(self):
+        for table in db.metadata.sorted_tables:
+            leading = db._leading_columns(table)
+            for fk in table.foreign_keys:
+                self.assertTrue(fk.parent.name in leading,
+                                '%s.%s' % (table.name, fk.parent.name))
+
+    def test_search_domains_are_indexed(self):
+        from bauble.search import MapperSearch
+        for cls, properties in MapperSearch._properties.items():
+            table = cls.__table__
+            leading = db._leading_columns(table)
+            for name in properties:
+                if name in table.c:
+                    self.assertTrue(name in leading,
+                                    '%s.%s' % (table.name, name))
+
+    def test_create_missing_indexes(self):
+        self.assertEquals(db.missing_indexes(db.engine), [])
+        index = db.metadata.tables['plant'].indexes
+        index = [i for i in index if i.name == 'ix_plant_location_id'][0]
+        index.drop(bind=db.engine)
+        self.assertEquals(db.missing_indexes(db.engine), [index])
+        self.assertEquals(db.create_missing_indexes(),
+                          ['ix_plant_location_id'])
+        self.assertEquals(db.missing_indexes(db.engine), [])
+
+
+class SessionTests(BaubleTestCase):
+
+    def test_plain_sessions_by_default(self):
+        self.assertFalse(isinstance(self.session, db.TrackedSession))
+
+    def test_tracked_session_knows_its_creator(self):
+        from sqlalchemy.orm import sessionmaker
+        Session = sessionmaker(bind=db.engine, class_=db.TrackedSession)
+        session = Session()
+        try:
+            filename, lineno, name = session.created_at
+            self.assertEquals(name,
+                              'test_tracked_session_knows_its_creator')
+            self.assertTrue(filename.startswith(__file__.rstrip('co')))
+        finally:
+            session.close()
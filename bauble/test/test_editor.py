@@ -23,7 +23,8 @@
 
 import os
 
-from bauble.editor import GenericEditorView
+from bauble.editor import GenericEditorView, CompletionIndex
+import bauble.db as db
 import bauble.prefs as prefs
 import bauble.paths as paths
 import bauble.utils as utils
@@ -67,6 +68,73 @@ class BaubleTests(BaubleTestCase):
         view.widget_add('statusbar', label)
 
 
+class CompletionIndexTests(BaubleTestCase):
+
+    def setUp(self):
+        super(CompletionIndexTests, self).setUp()
+        from bauble.plugins.plants.family import Family
+        self.Family = Family
+        self.session.add_all([Family(family=name) for name in
+                              (u'Cactaceae', u'Orchidaceae', u'Caricaceae')])
+        self.session.commit()
+        self.index = CompletionIndex(
+            Family, lambda session: session.query(Family.family, Family.id).
+            order_by(Family.family), ['family'])
+
+    def tearDown(self):
+        self.index.close()
+        super(CompletionIndexTests, self).tearDown()
+
+    def names(self, prefix, **kwargs):
+        return [f.family for f in
+                self.index.get(self.session, prefix, **kwargs)]
+
+    def test_prefix_lookup(self):
+        self.assertEquals(self.names(u'ca'), [u'Cactaceae', u'Caricaceae'])
+        self.assertEquals(self.names(u'Orch'), [u'Orchidaceae'])
+        self.assertEquals(self.names(u'x'), [])
+        self.assertEquals(self.names(u'cactaceae', exact=True),
+                          [u'Cactaceae'])
+        self.assertEquals(self.names(u'cact', exact=True), [])
+        cactaceae = self.session.query(self.Family).filter_by(
+            family=u'Cactaceae').one()
+        self.assertEquals(self.names(u'ca', exclude=cactaceae.id),
+                          [u'Caricaceae'])
+
+    def test_close_stops_listening(self):
+        self.assertTrue(self.index.on_history in db.history_listeners)
+        self.index.close()
+        self.assertFalse(self.index.on_history in db.history_listeners)
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+        self.assertFalse(event.contains(Session, 'after_commit',
+                                        self.index.on_commit))
+
+    def test_flush_invalidates_index(self):
+        self.assertEquals(self.names(u'cal'), [])
+        self.session.add(self.Family(family=u'Calceolariaceae'))
+        self.session.commit()
+        self.assertEquals(self.names(u'cal'), [u'Calceolariaceae'])
+
+    def test_flushed_objects_are_offered(self):
+        self.assertEquals(self.names(u'cal'), [])
+        self.session.add(self.Family(family=u'Calceolariaceae'))
+        self.session.flush()
+        self.assertEquals(self.names(u'cal'), [u'Calceolariaceae'])
+        self.session.rollback()
+
+    def test_commit_invalidates_index(self):
+        self.session.add(self.Family(family=u'Calceolariaceae'))
+        self.session.flush()
+        # rebuilt before the commit
+        self.names(u'cal')
+        self.assertTrue(self.index.keys is not None)
+        generation = CompletionIndex.generation
+        self.session.commit()
+        self.assertTrue(self.index.keys is None)
+        self.assertTrue(CompletionIndex.generation > generation)
+
+
 class PleaseIgnoreMe:
     '''these cannot be tested in a non-windowed environment
     '''
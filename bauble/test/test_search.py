@@ -312,6 +312,15 @@ class SearchTests(BaubleTestCase):
         g = list(results)[0]
         self.assertEqual(g.id, self.genus.id)
 
+    def test_search_by_values_across_domains(self):
+        "search by values returns objects from all matching domains"
+        mapper_search = search.get_strategy('MapperSearch')
+
+        results = mapper_search.search('family1 genus1', self.session)
+        self.assertEquals(sorted((type(i).__name__, i.id) for i in results),
+                          [('Family', self.family.id),
+                           ('Genus', self.genus.id)])
+
     def test_search_by_expression_family_eq(self):
         mapper_search = search.get_strategy('MapperSearch')
         self.assertTrue(isinstance(mapper_search, search.MapperSearch))
@@ -739,6 +748,12 @@ class SearchTests(BaubleTestCase):
         s = 'Schetti'
         results = mapper_search.search(s, self.session)
         self.assertEqual(results, [g3])
+        g3_id = g3.id
+        self.session.expunge_all()
+        self.assertEqual(mapper_search.search_keys(s, self.session),
+                         set([(Genus, g3_id)]))
+        # the accepted names are not loaded
+        self.assertEqual(len(self.session.identity_map), 0)
 
     def test_search_by_query_synonyms_disabled(self):
         """SynonymSearch strategy gives all synonyms of given taxon."""
@@ -759,6 +774,7 @@ class SearchTests(BaubleTestCase):
         s = 'Schetti'
         results = mapper_search.search(s, self.session)
         self.assertEqual(results, [])
+        self.assertEqual(mapper_search.search_keys(s, self.session), set())
 
     def test_search_by_query_vernacural(self):
         """can find species by vernacular name"""
@@ -782,6 +798,24 @@ class SearchTests(BaubleTestCase):
         s = "rojo"
         results = mapper_search.search(s, self.session)
         self.assertEqual(results, set([sp]))
+        self.assertEqual(mapper_search.search_keys(s, self.session),
+                         set([(Species, sp.id)]))
+
+    def test_search_keys(self):
+        "search_keys returns the keys of what search returns"
+        mapper_search = search.get_strategy('MapperSearch')
+        for s in ['family1 genus1', 'genus=genus1', 'genus=*',
+                  'genus where family.family=family1',
+                  'genus where family.family=family1 or genus=genus1']:
+            self.assertEquals(
+                mapper_search.search_keys(s, self.session),
+                set((type(i), i.id)
+                    for i in mapper_search.search(s, self.session)))
+        self.session.expunge_all()
+        self.assertEquals(search.search_keys('genus1', self.session),
+                          [(self.Genus, self.genus.id)])
+        # the objects were not loaded
+        self.assertEquals(len(self.session.identity_map), 0)
 
 
 class InOperatorSearch(BaubleTestCase):
@@ -1074,6 +1108,43 @@ class BuildingSQLStatements(BaubleTestCase):
         self.assertEqual(str(results.statement),
                          "SELECT * FROM species WHERE (BETWEEN id 0.0 1.0)")
 
+    def test_parsed_statement_is_cached(self):
+        'parsing the same text twice returns the cached statement'
+        sp = self.SearchParser()
+        first = sp.parse_string('species where id between 0 and 1')
+        second = sp.parse_string(' species where id between 0 and 1 ')
+        self.assertTrue(first is second)
+        other = sp.parse_string('species where id between 0 and 2')
+        self.assertFalse(first is other)
+
+    def test_cached_typed_value_is_computed_at_invoke(self):
+        'a cached |datetime| offset is computed each time it is used'
+        sp = self.SearchParser()
+        results = sp.parse_string('species where _created > |datetime|-1|')
+        value = results.statement.content.filter.operands[1]
+        calls = []
+        value.constructor = lambda *args: calls.append(args) or len(calls)
+        self.assertEquals(value.express(), 1)
+        self.assertEquals(value.express(), 2)
+        self.assertEquals(calls, [(-1, ), (-1, )])
+
+    def test_invoked_query_keeps_no_session(self):
+        'the cached QueryAction does not keep the session of its search'
+        from bauble import search
+        mapper_search = search.get_strategy('MapperSearch')
+        mapper_search.search('species where id = 1', self.session)
+        sp = mapper_search.parser
+        action = sp.parse_string('species where id = 1').statement.content
+        self.assertFalse(hasattr(action, 'session'))
+        self.assertEquals(action.domain, 'species')
+        self.assertEquals(mapper_search._session, None)
+
+    def test_parse_error_is_not_cached(self):
+        'a string that does not parse is not cached'
+        sp = self.SearchParser()
+        self.assertRaises(ParseException, sp.parse_string, '(')
+        self.assertFalse('(' in sp.cache.storage)
+
 
 class ParseTypedValue(BaubleTestCase):
     def test_parse_typed_value_floats(self):
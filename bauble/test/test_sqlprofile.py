@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of ghini.desktop.
+#
+# ghini.desktop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ghini.desktop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ghini.desktop. If not, see <http://www.gnu.org/licenses/>.
+#
+# test_sqlprofile.py
+#
+
+from bauble.test import BaubleTestCase
+from bauble import db
+from bauble import sqlprofile
+
+
+class SQLProfileTests(BaubleTestCase):
+
+    def tearDown(self):
+        sqlprofile.disable()
+        super(SQLProfileTests, self).tearDown()
+
+    def test_shape(self):
+        self.assertEquals(
+            sqlprofile.shape("SELECT a FROM t\n  WHERE t.id = 12 "
+                             "AND t.name = 'it''s' LIMIT ?"),
+            'SELECT a FROM t WHERE t.id = ? AND t.name = ? LIMIT ?')
+        self.assertEquals(
+            sqlprofile.shape('SELECT a FROM t WHERE t.id IN (?, ?, ?)'),
+            sqlprofile.shape('SELECT a FROM t WHERE t.id IN (?, ?)'))
+        self.assertEquals(
+            sqlprofile.shape('SELECT a FROM t WHERE t.id = %(id_1)s'),
+            'SELECT a FROM t WHERE t.id = ?')
+
+    def test_disabled_records_nothing(self):
+        with sqlprofile.operation('nothing') as profile:
+            db.engine.execute('SELECT 1').close()
+        self.assertEquals(profile, None)
+
+    def test_failed_statement_is_forgotten(self):
+        sqlprofile.enable()
+        conn = db.engine.connect()
+        try:
+            self.assertRaises(Exception, conn.execute,
+                              'SELECT * FROM no_such_table')
+            self.assertEquals(conn.info.get('sqlprofile_start'), [])
+        finally:
+            conn.close()
+
+    def test_repeated_shape_is_reported(self):
+        from bauble.plugins.plants.family import Family
+        families = [Family(family=u'family%s' % i) for i in range(12)]
+        self.session.add_all(families)
+        self.session.commit()
+        ids = [f.id for f in families]
+        self.session.expunge_all()
+        sqlprofile.enable()
+        with sqlprofile.operation('one by one') as profile:
+            for id in ids:
+                self.session.query(Family).get(id)
+        self.assertEquals(profile.count, 12)
+        repeated = profile.repeated()
+        self.assertEquals(len(repeated), 1)
+        self.assertEquals(repeated[0][1], 12)
+        self.assertTrue('possible N+1' in sqlprofile.recent[-1])
+        with sqlprofile.operation('at once') as profile:
+            self.session.query(Family).all()
+        self.assertEquals(profile.repeated(), [])
@@ -18,6 +18,8 @@
 # You should have received a copy of the GNU General Public License
 # along with ghini.desktop. If not, see <http://www.gnu.org/licenses/>.
 
+import os
+
 import bauble.utils as utils
 from unittest import TestCase
 
@@ -107,6 +109,17 @@ class CacheTest(TestCase):
         self.assertEquals(invoked, [1, 1, 1])
         self.assertEquals(sorted(cache.storage.keys()), [1, 4])
 
+    def test_respect_weight(self):
+        from bauble.utils import Cache
+
+        cache = Cache(10, weigh=len)
+        cache.get('a', lambda: 'aaaa')
+        cache.get('b', lambda: 'bbbbbb')
+        cache.get('a', lambda: 'aaaa')
+        cache.get('c', lambda: 'cc')
+        self.assertEquals(cache.storage.keys(), ['a', 'c'])
+        self.assertEquals(cache.weight, 6)
+
 
 class GlobalFuncs(TestCase):
     def test_safe_int_valid(self):
@@ -123,3 +136,37 @@ class GlobalFuncs(TestCase):
 
     def test_safe_numeric_valid_not(self):
         self.assertEquals(utils.safe_numeric('123a.2'), 0)
+
+
+class ThumbnailsTest(TestCase):
+
+    def setUp(self):
+        import tempfile
+        from bauble.utils import thumbnails
+        self.thumbnails = thumbnails
+        self.cache_dir = thumbnails.cache_dir
+        self.directory = tempfile.mkdtemp()
+        thumbnails.cache_dir = lambda: os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        import shutil
+        self.thumbnails.cache_dir = self.cache_dir
+        shutil.rmtree(self.directory)
+
+    def test_thumbnail_is_made_once(self):
+        from PIL import Image
+        filename = os.path.join(self.directory, 'picture.png')
+        Image.new('RGB', (1000, 500)).save(filename)
+        path = self.thumbnails.get(filename)
+        self.assertEquals(Image.open(path).size, (400, 200))
+        self.assertEquals(self.thumbnails.get(filename), path)
+        # a changed picture gets a new thumbnail
+        Image.new('RGB', (100, 100)).save(filename)
+        os.utime(filename, (0, 0))
+        self.assertNotEquals(self.thumbnails.get(filename), path)
+
+    def test_no_thumbnail_of_non_pictures(self):
+        filename = os.path.join(self.directory, 'notes.txt')
+        with open(filename, 'w') as f:
+            f.write('not a picture')
+        self.assertEquals(self.thumbnails.get(filename), None)
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of ghini.desktop.
+#
+# ghini.desktop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ghini.desktop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ghini.desktop. If not, see <http://www.gnu.org/licenses/>.
+#
+# test_view.py
+#
+
+import logging
+logger = logging.getLogger(__name__)
+
+from bauble.test import BaubleTestCase
+from bauble.view import SearchResultsModel
+
+
+class SearchResultsModelTests(BaubleTestCase):
+
+    def setUp(self):
+        super(SearchResultsModelTests, self).setUp()
+        from bauble.plugins.plants.family import Family
+        self.Family = Family
+        self.families = [Family(family=u'family%s' % i) for i in range(5)]
+        self.session.add_all(self.families)
+        self.session.commit()
+        self.keys = [(Family, f.id) for f in self.families]
+
+    def test_rows_are_loaded_lazily(self):
+        model = SearchResultsModel(self.session, self.keys)
+        model.load_batch = 2
+        self.assertEquals(model.iter_n_children(None), 5)
+        self.assertEquals(list(model.loaded_values()), [])
+        self.assertEquals(model[(0, )][0], self.families[0])
+        # one batch was loaded, not the whole model
+        self.assertEquals(list(model.loaded_values()), self.families[:2])
+        self.assertEquals([row[0] for row in model], self.families)
+
+    def test_loading_is_profiled(self):
+        from bauble import sqlprofile
+        model = SearchResultsModel(self.session, self.keys)
+        sqlprofile.enable()
+        try:
+            self.assertEquals(model[(0, )][0], self.families[0])
+        finally:
+            sqlprofile.disable()
+        self.assertTrue(sqlprofile.recent[-1].startswith('populate:'))
+
+    def test_placeholder_child(self):
+        model = SearchResultsModel(self.session, self.keys,
+                                   lambda klass: klass is self.Family)
+        treeiter = model.get_iter((1, ))
+        self.assertTrue(model.iter_has_child(treeiter))
+        self.assertEquals(model[(1, 0)][0], '-')
+
+    def test_find_does_not_load(self):
+        model = SearchResultsModel(self.session, self.keys)
+        model.append(model.get_iter((1, )), [self.families[3]])
+        found = model.find(self.families[3])
+        self.assertEquals(sorted(model.get_path(i) for i in found),
+                          [(1, 0), (3, )])
+        self.assertEquals(list(model.loaded_values()), [self.families[3]])
+        self.assertEquals(model.find(u'-'), [])
+
+    def test_append_and_remove(self):
+        model = SearchResultsModel(self.session, self.keys)
+        parent = model.get_iter((2, ))
+        child = model.append(parent, ['child'])
+        self.assertEquals(model.get_path(child), (2, 0))
+        self.assertEquals(model.iter_n_children(parent), 1)
+        model.remove(child)
+        self.assertEquals(model.iter_n_children(parent), 0)
+        model.remove(model.get_iter((0, )))
+        self.assertEquals(model[(0, )][0], self.families[1])
+        self.assertEquals(model.get_path(model.get_iter((3, ))), (3, ))
+        model.clear()
+        self.assertEquals(model.iter_n_children(None), 0)
+
+
+class InfoExpanderLoadTests(BaubleTestCase):
+
+    def test_loaded_values_are_used_once(self):
+        from bauble.view import InfoExpander
+        from bauble.plugins.plants.family import Family
+
+        class Expander(InfoExpander):
+            def load(self, row):
+                return 'loaded now'
+
+        family = Family(family=u'family')
+        self.session.add(family)
+        self.session.commit()
+        expander = Expander('label')
+        expander.loaded = ((Family, family.id), 'loaded before')
+        self.assertEquals(expander.get_loaded(family), 'loaded before')
+        self.assertEquals(expander.get_loaded(family), 'loaded now')
+        # values loaded for another row are not used
+        expander.loaded = ((Family, family.id + 1), 'loaded before')
+        self.assertEquals(expander.get_loaded(family), 'loaded now')
+
+    def test_infobox_loads_the_given_expanders(self):
+        from bauble.view import InfoBox, InfoExpander
+        from bauble.plugins.plants.family import Family
+
+        class Expander(InfoExpander):
+            def load(self, row):
+                return row.family
+
+        family = Family(family=u'family')
+        self.session.add(family)
+        self.session.commit()
+        infobox = InfoBox()
+        expander = Expander('label')
+        infobox.add_expander(expander)
+        expanders = infobox.get_expanders()
+        self.assertEquals(expanders, [expander])
+        self.assertEquals(infobox.load(family, expanders),
+                          {expander: ((Family, family.id), u'family')})
+        self.assertEquals(infobox.load(family, []), {})
+
+
+class HistoryPagingTests(BaubleTestCase):
+
+    def test_next_rows_pages_through_history(self):
+        from bauble import db
+        from bauble.view import AppendThousandRows
+        from bauble.plugins.plants.family import Family
+        for i in range(7):
+            self.session.add(Family(family=u'family%s' % i))
+            self.session.commit()
+        expected = [h.id for h in self.session.query(db.History).order_by(
+            db.History.timestamp.desc(), db.History.id.desc())]
+        ids = []
+        key = None
+        while True:
+            rows = AppendThousandRows.next_rows(self.session, key, 3)
+            ids.extend(row.id for row in rows)
+            if len(rows) < 3:
+                break
+            key = rows[-1].timestamp, rows[-1].id
+        self.assertEquals(ids, expected)
+
+    def test_parse_values(self):
+        from bauble.view import HistoryView
+        self.assertEquals(HistoryView.parse_values("{'id': '1'}"),
+                          {'id': '1'})
+        self.assertEquals(HistoryView.parse_values("__import__('os')"), {})
+        self.assertEquals(HistoryView.parse_values("['id']"), {})
+
+    def test_parse_filters(self):
+        import datetime
+        from bauble.view import HistoryView
+        filters = HistoryView.parse_filters(
+            {'table_name': 'accession', 'table_id': ' 12 ', 'user': '',
+             'since': '2015-01-31'})
+        self.assertEquals(filters, {'table_name': u'accession',
+                                    'table_id': 12,
+                                    'since': datetime.datetime(2015, 1, 31)})
+        self.assertRaises(ValueError, HistoryView.parse_filters,
+                          {'table_id': 'abc'})
+
+
+class SearchViewTestCase(BaubleTestCase):
+
+    def setUp(self):
+        super(SearchViewTestCase, self).setUp()
+        from bauble.view import SearchView
+        self.view = SearchView()
+
+    def tearDown(self):
+        self.view.session.close()
+        super(SearchViewTestCase, self).tearDown()
+
+    def show(self, objs):
+        """
+        Show objs in the results of the view and compute the markup of
+        all the top level rows, as painting them would.
+        """
+        self.view.populate_results([(type(obj), obj.id) for obj in objs])
+        model = self.view.results_view.get_model()
+        for row in model:
+            self.view.markup_cache[self.view.markup_key(row[0])] = \
+                self.view.row_markup(row[0])
+        return model
+
+
+class RefreshChangedRowsTests(SearchViewTestCase):
+
+    def test_renamed_genus_refreshes_species_rows(self):
+        from bauble.plugins.plants import Family, Genus, Species
+        family = Family(family=u'Orchidaceae')
+        genus = Genus(genus=u'Maxillaria', family=family)
+        species = Species(sp=u'variabilis', genus=genus)
+        self.session.add_all([family, genus, species])
+        self.session.commit()
+        model = self.show([species])
+        key = (Species, (species.id, ))
+        self.assertTrue('Maxillaria' in self.view.markup_cache[key])
+        genus.genus = u'Camaridium'
+        self.session.commit()
+        changed, inserted = self.view.read_changes()
+        self.assertFalse(key in changed)
+        self.view.refresh_changed_rows(model, changed)
+        self.assertFalse(key in self.view.markup_cache)
+        markup = self.view.row_markup(model[(0, )][0])
+        self.assertTrue('Camaridium' in markup)
+        self.assertFalse('Maxillaria' in markup)
+
+    def test_markup_dependencies(self):
+        from bauble.view import SearchView
+        from bauble.plugins.plants import Family, Genus, Species
+        from bauble.plugins.garden import Plant
+        self.assertTrue(Genus in SearchView.markup_dependencies(Species))
+        self.assertTrue(Family in SearchView.markup_dependencies(Genus))
+        self.assertTrue(Species in SearchView.markup_dependencies(Plant))
+        self.assertFalse(Species in SearchView.markup_dependencies(Family))
+
+
+class SortedKeysTests(SearchViewTestCase):
+
+    def test_groups_are_sorted_unloaded(self):
+        from bauble.plugins.plants import Family
+        families = [Family(family=u'family%s' % i) for i in (10, 2, 1)]
+        self.session.add_all(families)
+        self.session.commit()
+        keys = [(Family, f.id) for f in families]
+        self.assertEquals(self.view.sorted_keys(keys),
+                          [keys[2], keys[1], keys[0]])
+        self.assertEquals(len(self.view.session.identity_map), 0)
+
+    def test_species_are_sorted_on_genus_first(self):
+        from bauble.plugins.plants import Family, Genus, Species
+        family = Family(family=u'family')
+        genus_a = Genus(genus=u'Aa', family=family)
+        genus_b = Genus(genus=u'Bb', family=family)
+        species = [Species(sp=u'aa', genus=genus_b),
+                   Species(sp=u'bb', genus=genus_a),
+                   Species(sp=u'aa', genus=genus_a)]
+        self.session.add_all(species)
+        self.session.commit()
+        keys = [(Species, sp.id) for sp in species]
+        self.assertEquals(self.view.sorted_keys(keys),
+                          [keys[2], keys[1], keys[0]])
+
+
+class MarkupCacheTests(SearchViewTestCase):
+
+    def setUp(self):
+        super(MarkupCacheTests, self).setUp()
+        from bauble.plugins.plants.family import Family
+        from bauble.plugins.plants.genus import Genus
+        self.family = Family(family=u'family')
+        self.genus = Genus(genus=u'genus', family=self.family)
+        self.session.add_all([self.family, self.genus])
+        self.session.commit()
+        self.show([self.family, self.genus])
+        self.family_key = (Family, (self.family.id, ))
+        self.genus_key = (Genus, (self.genus.id, ))
+
+    def test_markup_is_cached(self):
+        self.assertEquals(sorted(self.view.markup_cache.keys()),
+                          sorted([self.family_key, self.genus_key]))
+        self.assertTrue('family' in self.view.markup_cache[self.family_key])
+
+    def test_no_changes(self):
+        self.assertEquals(self.view.read_changes(), (set(), False))
+
+    def test_changed_row_is_forgotten(self):
+        self.family.family = u'family2'
+        self.session.commit()
+        changed, inserted = self.view.read_changes()
+        self.assertEquals(changed, set([self.family_key]))
+        self.assertFalse(inserted)
+        self.view.forget_changed(changed)
+        self.assertEquals(self.view.markup_cache.keys(), [self.genus_key])
+        # the changes are read only once
+        self.assertEquals(self.view.read_changes(), (set(), False))
+
+    def test_insert_is_reported(self):
+        from bauble.plugins.plants.genus import Genus
+        genus = Genus(genus=u'genus2', family=self.family)
+        self.session.add(genus)
+        self.session.commit()
+        changed, inserted = self.view.read_changes()
+        self.assertTrue((Genus, (genus.id, )) in changed)
+        self.assertTrue(inserted)
+
+    def test_prefetch_loads_relations(self):
+        from bauble.plugins.plants.genus import Genus
+        self.view.session.expire_all()
+        genus = self.view.session.query(Genus).get(self.genus.id)
+        self.assertFalse('family' in genus.__dict__)
+        self.view.prefetch(Genus, [genus.id])
+        self.assertTrue('family' in genus.__dict__)
+
+
+class ReleaseConnectionTests(SearchViewTestCase):
+
+    def test_read_only_transaction_is_ended(self):
+        from bauble.plugins.plants import Family
+        session = self.view.session
+        family = session.query(Family).first()
+        self.assertTrue(session.transaction._connections)
+        self.view.release_connection(session)
+        self.assertFalse(session.transaction._connections)
+        # the objects are not expired
+        if family is not None:
+            self.assertTrue('family' in family.__dict__)
+
+    def test_changes_keep_the_transaction(self):
+        from bauble.plugins.plants import Family
+        session = self.view.session
+        session.add(Family(family=u'Unflushed'))
+        session.flush()
+        self.view.release_connection(session)
+        self.assertTrue(session.transaction._connections)
+        session.rollback()
@@ -24,8 +24,10 @@
 """
 A common set of utility functions used throughout Ghini.
 """
+from collections import OrderedDict
 import datetime
 import os
+import Queue
 import re
 import textwrap
 import xml.sax.saxutils as saxutils
@@ -58,47 +60,86 @@ def read_in_chunks(file_object, chunk_size=1024):
         yield data
 
 
-class Cache:
-    '''a simple class for caching images
+class Cache(object):
+    '''a least recently used cache
 
     you instantiate a size 10 cache like this:
-    >>> cache = ImageCache(10)
+    >>> cache = Cache(10)
 
     if `getter` is a function that returns a picture, you don't immediately
     invoke it, you use the cache like this:
     >>> image = cache.get(name, getter)
 
-    internally, the cache is stored in a dictionary, the key is the name of
-    the image, the value is a pair with first the timestamp of the last usage
-    of that key and second the value.
+    the size is the number of values the cache holds, or, if you give a
+    `weigh` function, the total weigh(value) of the values it holds, like
+    the number of bytes of decoded pictures.  when the cache grows beyond
+    its size, the least recently used values are dropped.
+
+    internally, the cache is stored in an ordered dictionary, the key is
+    the name of the image, the value is a pair with first the weight and
+    second the value, the most recently used key last.  the cache can be
+    shared between threads, the getter is invoked outside of its lock.
     '''
 
-    def __init__(self, size):
+    def __init__(self, size, weigh=None):
         self.size = size
-        self.storage = {}
+        self.weigh = weigh or (lambda value: 1)
+        self.weight = 0
+        self.storage = OrderedDict()
+        self.lock = threading.Lock()
 
     def get(self, key, getter, on_hit=lambda x: None):
-        if key in self.storage:
-            value = self.storage[key][1]
-            on_hit(value)
-        else:
-            if len(self.storage) == self.size:
-                # remove the oldest entry
-                k = min(zip(self.storage.values(), self.storage.keys()))[1]
-                del self.storage[k]
-            value = getter()
-        import time
-        self.storage[key] = time.time(), value
+        with self.lock:
+            entry = self.storage.pop(key, None)
+            if entry is not None:
+                self.storage[key] = entry
+        if entry is not None:
+            on_hit(entry[1])
+            return entry[1]
+        value = getter()
+        weight = self.weigh(value)
+        with self.lock:
+            entry = self.storage.pop(key, None)
+            if entry is not None:
+                self.weight -= entry[0]
+            self.storage[key] = weight, value
+            self.weight += weight
+            while self.weight > self.size and len(self.storage) > 1:
+                oldest, entry = self.storage.popitem(last=False)
+                self.weight -= entry[0]
         return value
 
 
-class ImageLoader(threading.Thread):
-    cache = Cache(12)  # class-global cached results
+def pixbuf_bytes(pixbuf):
+    '''the number of bytes of the pixel data of pixbuf'''
+    return pixbuf.get_rowstride() * pixbuf.get_height()
+
+
+class ImageLoader(object):
+    '''load a picture into box, a gtk.Container
+
+    the picture is read, decoded and scaled by one of a fixed number of
+    worker threads, the ones that call start() just queue it.  the
+    scaled pictures are kept in a cache bounded by their size in bytes,
+    local pictures are read from their thumbnail on disk, see
+    bauble.utils.thumbnails.
+    if box is destroyed before a worker gets to its picture, the picture
+    is not loaded.
+    '''
+
+    # class-global cached results, of at most 32MB of decoded pixels
+    cache = Cache(32 * 1024 * 1024, weigh=pixbuf_bytes)
+    # number of worker threads and the queue they get the loaders from
+    workers = 4
+    queue = Queue.Queue()
+    threads = []
+    # the largest width or height of the scaled pictures
+    max_size = 400
 
-    def __init__(self, box, url, *args, **kwargs):
-        super(ImageLoader, self).__init__(*args, **kwargs)
+    def __init__(self, box, url):
         self.box = box  # will hold image or label
-        self.loader = gtk.gdk.PixbufLoader()
+        self.cancelled = False
+        box.connect('destroy', self.on_box_destroyed)
         if (url.startswith('http://') or url.startswith('https://')):
             self.reader_function = self.read_global_url
             self.url = url
@@ -108,65 +149,100 @@ class ImageLoader(threading.Thread):
             pfolder = prefs.prefs[prefs.picture_root_pref]
             self.url = os.path.join(pfolder, url)
 
-    def callback(self):
-        pixbuf = self.loader.get_pixbuf()
+    def on_box_destroyed(self, box):
+        self.cancelled = True
+
+    def start(self):
+        '''queue the picture for the worker threads'''
+        cls = ImageLoader
+        while len(cls.threads) < cls.workers:
+            thread = threading.Thread(target=cls.work)
+            thread.daemon = True
+            thread.start()
+            cls.threads.append(thread)
+        cls.queue.put(self)
+
+    @classmethod
+    def work(cls):
+        while True:
+            loader = cls.queue.get()
+            if not loader.cancelled:
+                loader.run()
+
+    def run(self):
         try:
-            pixbuf = pixbuf.apply_embedded_orientation()
-            scale_x = pixbuf.get_width() / 400
-            scale_y = pixbuf.get_height() / 400
-            scale = max(scale_x, scale_y, 1)
-            x = int(pixbuf.get_width() / scale)
-            y = int(pixbuf.get_height() / scale)
-            scaled_buf = pixbuf.scale_simple(x, y, gtk.gdk.INTERP_BILINEAR)
-            if self.box.get_children():
-                image = self.box.get_children()[0]
-            else:
-                image = gtk.Image()
-                self.box.add(image)
-            image.set_from_pixbuf(scaled_buf)
-        except glib.GError, e:
-            logger.debug("picture %s caused glib.GError %s" %
-                         (self.url, e))
+            pixbuf = self.cache.get(self.url, self.read_scaled)
+        except (IOError, glib.GError), e:
+            logger.debug("picture %s caused %s %s" %
+                         (self.url, type(e).__name__, e))
             text = _('picture file %s not found.') % self.url
-            label = gtk.Label()
-            label.set_text(text)
-            self.box.add(label)
+            gobject.idle_add(self.show_text, text)
         except Exception, e:
             logger.warning("picture %s caused Exception %s:%s" %
                            (self.url, type(e), e))
-            label = gtk.Label()
-            label.set_text(str(e))
-            self.box.add(label)
+            gobject.idle_add(self.show_text, str(e))
+        else:
+            gobject.idle_add(self.show_pixbuf, pixbuf)
+
+    def read_scaled(self):
+        '''read and decode the picture, scaled to max_size'''
+        if self.reader_function == self.read_local_url:
+            # a local picture is decoded once, into its thumbnail
+            from bauble.utils import thumbnails
+            thumbnail = thumbnails.get(self.url)
+            if thumbnail is not None:
+                return gtk.gdk.pixbuf_new_from_file(thumbnail)
+        loader = gtk.gdk.PixbufLoader()
+        try:
+            self.reader_function(loader)
+        finally:
+            loader.close()
+        pixbuf = loader.get_pixbuf().apply_embedded_orientation()
+        scale = max(pixbuf.get_width() / float(self.max_size),
+                    pixbuf.get_height() / float(self.max_size), 1)
+        x = int(pixbuf.get_width() / scale)
+        y = int(pixbuf.get_height() / scale)
+        return pixbuf.scale_simple(x, y, gtk.gdk.INTERP_BILINEAR)
+
+    def show_pixbuf(self, pixbuf):
+        if self.cancelled:
+            return
+        if self.box.get_children():
+            image = self.box.get_children()[0]
+        else:
+            image = gtk.Image()
+            self.box.add(image)
+        image.set_from_pixbuf(pixbuf)
         self.box.show_all()
 
-    def loader_notified(self, pixbufloader):
-        gobject.idle_add(self.callback)
-
-    def run(self):
-        self.loader.connect("closed", self.loader_notified)
-        self.cache.get(
-            self.url, self.reader_function, on_hit=self.loader.write)
-        self.loader.close()
+    def show_text(self, text):
+        if self.cancelled:
+            return
+        label = gtk.Label()
+        label.set_text(text)
+        self.box.add(label)
+        self.box.show_all()
 
-    def read_global_url(self):
-        self.loader.connect("area-prepared", self.loader_notified)
+    def read_global_url(self, loader):
         import urllib
         import contextlib
-        pieces = []
         with contextlib.closing(urllib.urlopen(self.url)) as f:
             for piece in read_in_chunks(f, 4096):
-                self.loader.write(piece)
-                pieces.append(piece)
-        return ''.join(pieces)
+                loader.write(piece)
 
-    def read_local_url(self):
-        self.loader.connect("area-prepared", self.loader_notified)
-        pieces = []
+    def read_local_url(self, loader):
         with open(self.url, "rb") as f:
             for piece in read_in_chunks(f, 4096):
-                self.loader.write(piece)
-                pieces.append(piece)
-        return ''.join(pieces)
+                loader.write(piece)
+
+
+def picture_box(name):
+    '''a gtk.VBox that is going to hold the picture name, or the
+    message explaining why it could not be loaded
+    '''
+    box = gtk.VBox()
+    ImageLoader(box, name).start()
+    return box
 
 
 def find_dependent_tables(table, metadata=None):
@@ -339,14 +415,6 @@ def clear_model(obj_with_model):
     if model is None:
         return
 
-    ncols = model.get_n_columns()
-
-    def del_cb(model, path, iter, data=None):
-        for c in xrange(0, ncols):
-            v = model.get_value(iter, c)
-            del v
-        del iter
-    model.foreach(del_cb)
     model.clear()
     del model
     obj_with_model.set_model(None)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of ghini.desktop.
+#
+# ghini.desktop is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ghini.desktop is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ghini.desktop. If not, see <http://www.gnu.org/licenses/>.
+#
+# thumbnails.py
+#
+
+"""
+The on-disk cache of the thumbnails of the pictures.
+
+The thumbnail of a picture is stored in the thumbnails directory of the
+user data, under the sha1 of the absolute path, modification time and
+size of the picture, so that a changed picture gets a new thumbnail and
+the original is only decoded once.  The thumbnails are made with PIL.
+"""
+
+import hashlib
+import os
+
+import logging
+logger = logging.getLogger(__name__)
+
+from bauble import paths
+
+# the largest width or height of a thumbnail
+size = 400
+
+
+def cache_dir():
+    """
+    Return the directory holding the thumbnails.
+    """
+    return os.path.join(paths.user_dir(), 'thumbnails')
+
+
+def thumbnail_path(filename):
+    """
+    Return the path of the thumbnail of the picture filename, whether
+    the thumbnail exists or not.
+
+    Raise OSError if filename does not exist.
+    """
+    filename = os.path.abspath(filename)
+    st = os.stat(filename)
+    key = '%s\0%r\0%s' % (filename, st.st_mtime, st.st_size)
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return os.path.join(cache_dir(), hashlib.sha1(key).hexdigest() + '.png')
+
+
+# the transpositions that undo the EXIF orientation of a picture
+_orientation_transpose = {3: 'ROTATE_180', 6: 'ROTATE_270', 8: 'ROTATE_90'}
+
+
+def make(filename):
+    """
+    Make the thumbnail of the picture filename, if it does not exist
+    yet, and return its path.
+    """
+    path = thumbnail_path(filename)
+    if os.path.exists(path):
+        return path
+    from PIL import Image
+    im = Image.open(filename)
+    # let the JPEG decoder skip what the thumbnail does not need
+    im.draft('RGB', (size, size))
+    try:
+        orientation = im._getexif().get(274)
+    except Exception:
+        orientation = None
+    if orientation in _orientation_transpose:
+        im = im.transpose(getattr(Image, _orientation_transpose[orientation]))
+    im.thumbnail((size, size), Image.ANTIALIAS)
+    if im.mode not in ('1', 'L', 'LA', 'RGB', 'RGBA'):
+        im = im.convert('RGBA')
+    if not os.path.isdir(cache_dir()):
+        os.makedirs(cache_dir())
+    # write under a temporary name, a reader never sees half a thumbnail
+    temp = '%s.%s.tmp' % (path, os.getpid())
+    im.save(temp, 'PNG')
+    try:
+        os.rename(temp, path)
+    except OSError:
+        # on windows the thumbnail may have been made in the meantime
+        os.remove(temp)
+    return path
+
+
+def get(filename):
+    """
+    Return the path of the thumbnail of the picture filename, making it
+    if needed, or None if the thumbnail can't be made.
+    """
+    try:
+        return make(filename)
+    except ImportError:
+        logger.debug('PIL is not available, no thumbnails')
+    except Exception, e:
+        logger.debug("can't make thumbnail of %s: %s(%s)" %
+                     (filename, type(e).__name__, e))
+    return None
+
+
+def make_all(directory, processes=None):
+    """
+    Make the missing thumbnails of the pictures in directory and its
+    subdirectories, with a pool of processes.  Return the number of
+    pictures with a thumbnail.
+    """
+    import multiprocessing
+    skip = os.path.abspath(cache_dir())
+    filenames = []
+    for dirpath, dirnames, names in os.walk(directory):
+        # neither our thumbnails nor the ones of the picture editor
+        dirnames[:] = [
+            d for d in dirnames if d != 'thumbs' and
+            os.path.abspath(os.path.join(dirpath, d)) != skip]
+        filenames.extend(os.path.join(dirpath, name) for name in names)
+    pool = multiprocessing.Pool(processes)
+    try:
+        made = pool.imap_unordered(get, filenames, chunksize=8)
+        return len([path for path in made if path is not None])
+    finally:
+        pool.close()
+        pool.join()
@@ -20,7 +20,6 @@
 #
 # Description: the default view
 #
-import itertools
 import os
 import sys
 import traceback
@@ -34,9 +33,14 @@ import gtk
 import gobject
 import pango
 import threading
+from ast import literal_eval
+import dateutil.parser as date_parser
 
 from bauble.i18n import _
 from pyparsing import ParseException
+import sqlalchemy as sa
+from sqlalchemy import func
+import sqlalchemy.orm as orm
 from sqlalchemy.orm import object_session
 import sqlalchemy.exc as saexc
 
@@ -47,6 +51,7 @@ from bauble import paths
 from bauble import pluginmgr
 from bauble import prefs
 from bauble import search
+from bauble import sqlprofile
 from bauble import utils
 from bauble import editor
 from bauble import pictures_view
@@ -123,6 +128,8 @@ class InfoExpander(gtk.Expander):
         self.vbox.set_border_width(5)
         self.add(self.vbox)
         self.widgets = widgets
+        # ((class, id), data) prepared by load() for the next update()
+        self.loaded = None
         if not self.expanded_pref:
             self.set_expanded(True)
         self.connect("notify::expanded", self.on_expanded)
@@ -145,6 +152,26 @@ class InfoExpander(gtk.Expander):
         '''
         raise NotImplementedError("InfoExpander.update(): not implemented")
 
+    def load(self, row):
+        '''
+        Return the values update() needs that take queries of their own,
+        like the number of related objects, or None.
+
+        The SearchView calls this from a worker thread, with row in a
+        session of the worker, so it should not touch any widget.
+        '''
+        return None
+
+    def get_loaded(self, row):
+        '''
+        Return what load() returned for row in the worker thread, or
+        call load() now if the worker did not load this row.
+        '''
+        loaded, self.loaded = self.loaded, None
+        if loaded is not None and loaded[0] == (type(row), row.id):
+            return loaded[1]
+        return self.load(row)
+
 
 class PropertiesExpander(InfoExpander):
 
@@ -327,6 +354,35 @@ class InfoBox(gtk.Notebook):
         page_num = self.get_current_page()
         self.get_nth_page(page_num).update(row)
 
+    def get_expanders(self):
+        """
+        Return the expanders of the current page, the ones load() is
+        for.  Call it in the GTK thread.
+        """
+        page = self.get_nth_page(self.get_current_page())
+        if not isinstance(page, InfoBoxPage):
+            return []
+        return page.expanders.values()
+
+    def load(self, row, expanders):
+        """
+        Return the values loaded by expanders for row, by expander.
+
+        This is called from a worker thread, it must not touch any
+        widget: get the expanders with get_expanders() before and pass
+        the result to set_loaded() in the GTK thread before update().
+        """
+        key = (type(row), row.id)
+        return dict((expander, (key, expander.load(row)))
+                    for expander in expanders)
+
+    def set_loaded(self, loaded):
+        """
+        Hand the result of load() to the expanders.
+        """
+        for expander, value in loaded.iteritems():
+            expander.loaded = value
+
 
 class LinksExpander(InfoExpander):
 
@@ -411,28 +467,13 @@ class CountResultsTask(threading.Thread):
         self.__cancel = True
 
     def run(self):
-        session = db.Session()
         klass = self.klass
-        d = {}
-        for ndx in self.ids:
-            item = session.query(klass).filter(klass.id == ndx).one()
-            if self.__cancel:  # check whether caller asks to cancel
-                break
-            for k, v in item.top_level_count().items():
-                if isinstance(v, set):
-                    d[k] = v.union(d.get(k, set()))
-                else:
-                    d[k] = v + d.get(k, 0)
-        result = []
-        for k, v in sorted(d.items()):
-            if isinstance(k, tuple):
-                k = k[1]
-            if isinstance(v, set):
-                v = len(v)
-            result.append("%s: %d" % (k, v))
-            if self.__cancel:  # check whether caller asks to cancel
-                break
-        value = _("top level count: %s") % (", ".join(result))
+        with db.session_scope() as session:
+            d = db.top_level_count(session, [(klass, i) for i in self.ids],
+                                   cancelled=lambda: self.__cancel)
+        if d is None:  # caller asked to cancel
+            return
+        value = _("top level count: %s") % format_top_level_count(d)
         if bauble.gui:
             def callback(text):
                 statusbar = bauble.gui.widgets.statusbar
@@ -444,8 +485,290 @@ class CountResultsTask(threading.Thread):
                 gobject.idle_add(callback, value)
         else:
             logger.debug("showing text %s", value)
-        ## we should not leave the session around
-        session.close()
+
+
+class InfoBoxLoader(threading.Thread):
+    """
+    Load the values that the expanders of the infobox need for the
+    object of class klass with id, in a session of its own, and pass
+    them to callback in the GTK thread.  The expanders are taken from
+    the infobox before starting the thread.
+    """
+
+    def __init__(self, infobox, klass, id, callback,
+                 group=None, verbose=None, **kwargs):
+        super(InfoBoxLoader, self).__init__(
+            group=group, target=None, name=None, verbose=verbose)
+        self.infobox = infobox
+        self.expanders = infobox.get_expanders()
+        self.klass = klass
+        self.id = id
+        self.callback = callback
+        self.__cancel = False
+
+    def cancel(self):
+        self.__cancel = True
+
+    def run(self):
+        try:
+            name = 'infobox load %s' % self.klass.__name__
+            with sqlprofile.operation(name), db.session_scope() as session:
+                row = session.query(self.klass).get(self.id)
+                if row is None or self.__cancel:
+                    loaded = {}
+                else:
+                    loaded = self.infobox.load(row, self.expanders)
+        except Exception, e:
+            # the infobox will load what it needs when it is updated
+            logger.debug('InfoBoxLoader: %s(%s)' % (type(e).__name__, e))
+            loaded = {}
+        if not self.__cancel:
+            gobject.idle_add(self.callback, loaded)
+
+
+def format_top_level_count(d):
+    """format the result of db.top_level_count for the status bar
+    """
+    result = []
+    for k, v in sorted(d.items()):
+        if isinstance(k, tuple):
+            k = k[1]
+        if isinstance(v, set):
+            v = len(v)
+        result.append("%s: %d" % (k, v))
+    return ", ".join(result)
+
+
+class SearchResultsModel(gtk.GenericTreeModel):
+    """
+    A lazy, single column gtk.TreeModel for the SearchView results.
+
+    The top level rows are created from a list of (class, id) keys and
+    the database objects are only loaded when a row is rendered, in
+    batches of `load_batch` consecutive rows of the same class.  Rows
+    added with append() or prepend(), like the children added when a
+    row is expanded, hold their value directly.
+
+    Top level rows of a class for which `has_children(class)` is true
+    get a '-' placeholder child, so that the view shows the expander.
+    """
+
+    # how many rows of the same class to load with a single query
+    load_batch = 200
+
+    class Row(object):
+        __slots__ = ('key', 'value', 'parent', 'index', 'children')
+
+        def __init__(self, key=None, value=None, parent=None, index=0):
+            self.key = key
+            self.value = value
+            self.parent = parent
+            self.index = index
+            self.children = None  # None means: not computed yet
+
+    def __init__(self, session, keys, has_children=lambda klass: False):
+        gtk.GenericTreeModel.__init__(self)
+        # the model keeps its rows alive until they are removed, the
+        # view lets go of a row when it is told it was deleted
+        self.set_property('leak-references', False)
+        self.session = session
+        self.has_children = has_children
+        self.rows = [self.Row(key=key, index=i)
+                     for i, key in enumerate(keys)]
+
+    def _children(self, row):
+        if row is None:
+            return self.rows
+        if row.children is None:
+            row.children = []
+            if row.key is not None and self.has_children(row.key[0]):
+                row.children.append(self.Row(value='-', parent=row))
+        return row.children
+
+    def _load(self, row):
+        """load the object for row and the next rows of the same class
+        """
+        with sqlprofile.operation('populate'):
+            self._load_batch(row)
+
+    def _load_batch(self, row):
+        klass = row.key[0]
+        siblings = self._children(row.parent)
+        batch = []
+        for sibling in siblings[row.index:row.index + self.load_batch]:
+            if sibling.key is None or sibling.key[0] is not klass:
+                break
+            if sibling.value is None:
+                batch.append(sibling)
+        objs = dict((obj.id, obj) for obj in db.get_by_ids(
+            self.session, klass, [r.key[1] for r in batch]))
+        for r in batch:
+            r.value = objs.get(r.key[1])
+            if r.value is None:
+                # the object was deleted since the search
+                r.key = None
+                r.value = '-'
+
+    def _renumber(self, rows, start=0):
+        for i in range(start, len(rows)):
+            rows[i].index = i
+
+    def walk_rows(self, rows=None):
+        """iterate on the rows created so far, without creating more
+        """
+        for row in (rows is None and self.rows or rows):
+            yield row
+            if row.children:
+                for child in self.walk_rows(row.children):
+                    yield child
+
+    def find(self, obj):
+        """return the iters of the rows created so far that show obj,
+        compared on its (class, id) key, without loading any row
+        """
+        key = SearchView.markup_key(obj)
+        found = []
+        for row in self.walk_rows():
+            if row.key is not None:
+                match = (row.key[0], (row.key[1], )) == key
+            else:
+                match = row.value is obj or (
+                    key is not None and
+                    SearchView.markup_key(row.value) == key)
+            if match:
+                found.append(self.create_tree_iter(row))
+        return found
+
+    def loaded_values(self, rows=None):
+        """iterate on the values loaded so far, without loading more
+        """
+        for row in (rows is None and self.rows or rows):
+            if row.value is not None:
+                yield row.value
+            if row.children:
+                for value in self.loaded_values(row.children):
+                    yield value
+
+    def on_get_flags(self):
+        return gtk.TREE_MODEL_ITERS_PERSIST
+
+    def on_get_n_columns(self):
+        return 1
+
+    def on_get_column_type(self, index):
+        return gobject.TYPE_PYOBJECT
+
+    def on_get_iter(self, path):
+        row = None
+        for i in path:
+            rows = self._children(row)
+            if i >= len(rows):
+                return None
+            row = rows[i]
+        return row
+
+    def on_get_path(self, row):
+        path = []
+        while row is not None:
+            path.insert(0, row.index)
+            row = row.parent
+        return tuple(path)
+
+    def on_get_value(self, row, column):
+        if row.value is None and row.key is not None:
+            self._load(row)
+        return row.value
+
+    def on_iter_next(self, row):
+        siblings = self._children(row.parent)
+        if row.index + 1 < len(siblings):
+            return siblings[row.index + 1]
+        return None
+
+    def on_iter_children(self, row):
+        children = self._children(row)
+        return children and children[0] or None
+
+    def on_iter_has_child(self, row):
+        return len(self._children(row)) > 0
+
+    def on_iter_n_children(self, row):
+        return len(self._children(row))
+
+    def on_iter_nth_child(self, row, n):
+        children = self._children(row)
+        if 0 <= n < len(children):
+            return children[n]
+        return None
+
+    def on_iter_parent(self, row):
+        return row.parent
+
+    def insert(self, parent, position, values):
+        """insert a row holding values[0] under the parent iter
+        """
+        parent_row = parent is not None and self.get_user_data(parent) \
+            or None
+        siblings = self._children(parent_row)
+        if position < 0 or position > len(siblings):
+            position = len(siblings)
+        row = self.Row(value=values[0], parent=parent_row)
+        row.children = []
+        siblings.insert(position, row)
+        self._renumber(siblings, position)
+        treeiter = self.create_tree_iter(row)
+        self.row_inserted(self.get_path(treeiter), treeiter)
+        if parent is not None and len(siblings) == 1:
+            self.row_has_child_toggled(self.get_path(parent), parent)
+        return treeiter
+
+    def append(self, parent, values):
+        return self.insert(parent, -1, values)
+
+    def prepend(self, parent, values):
+        return self.insert(parent, 0, values)
+
+    def remove(self, treeiter):
+        row = self.get_user_data(treeiter)
+        path = self.get_path(treeiter)
+        siblings = self._children(row.parent)
+        del siblings[row.index]
+        self._renumber(siblings, row.index)
+        self.row_deleted(path)
+        if row.parent is not None and not siblings:
+            parent = self.create_tree_iter(row.parent)
+            self.row_has_child_toggled(self.get_path(parent), parent)
+        return False
+
+    def clear(self):
+        while self.rows:
+            row = self.rows.pop()
+            self.row_deleted((len(self.rows), ))
+
+
+# the invalidate_str_cache() method are specific to Species
+# and Accession right now....it's a bit of a hack since there's
+# no real interface that the method complies to...but it does
+# fix our string caching issues
+def _invalidate_str_cache(obj):
+    if hasattr(obj, 'invalidate_str_cache'):
+        obj.invalidate_str_cache()
+
+
+class MoreChildren(object):
+    """
+    The placeholder row following a page of children in the results
+    view, when the parent row has more children than shown.
+
+    :param kids: the children of the parent row, a query or a list
+    :param offset: the index in kids of the first child not shown
+    """
+
+    markup = '<i>%s</i>' % _('more...')
+
+    def __init__(self, kids, offset):
+        self.kids = kids
+        self.offset = offset
 
 
 class SearchView(pluginmgr.View):
@@ -472,7 +795,9 @@ class SearchView(pluginmgr.View):
                     markup_func=None):
                 '''
                 :param children: where to find the children for this type,
-                    can be a callable of the form C{children(row)}
+                    can be a callable of the form C{children(row)}, if
+                    it returns a query the children are fetched already
+                    sorted and a page at a time
 
                 :param infobox: the infobox for this type
 
@@ -532,20 +857,58 @@ class SearchView(pluginmgr.View):
         pictures_view.floating_window = pictures_view.PicturesView(
             parent=self.widgets.search_h2pane)
 
-        # we only need this for the timeout version of populate_results
-        self.populate_callback_id = None
-
         # the context menu cache holds the context menus by type in the results
         # view so that we don't have to rebuild them every time
         self.context_menu_cache = {}
         self.infobox_cache = {}
         self.infobox = None
+        # the pending gobject timeout and the running InfoBoxLoader of
+        # the infobox update
+        self.infobox_timeout = None
+        self.infobox_loader = None
 
         # keep all the search results in the same session, this should
         # be cleared when we do a new search
-        self.session = db.Session()
+        self.session = self.new_session()
         self.add_notes_page_to_bottom_notebook()
         self.running_threads = []
+        # the markup of the rows in the results view, by (class, id)
+        self.markup_cache = {}
+        self.history_id = None
+
+    def new_session(self):
+        """
+        Return a session for the view, that lets go of its connection
+        when the GTK main loop is idle, see release_connection().
+        """
+        session = db.Session(expire_on_commit=False)
+        sa.event.listen(session, 'after_begin', self.on_session_begin)
+        sa.event.listen(session, 'after_flush', self.on_session_flush)
+        return session
+
+    def on_session_begin(self, session, transaction, connection):
+        session.info['bauble.flushed'] = False
+        gobject.idle_add(self.release_connection, session)
+
+    def on_session_flush(self, session, flush_context):
+        session.info['bauble.flushed'] = True
+
+    def release_connection(self, session):
+        """
+        End the transaction of session if it only read, so that its
+        connection goes back to the pool, where the worker threads find
+        it, instead of being held by the view for as long as it lives.
+
+        The objects of the view's session are not expired on commit, so
+        ending a transaction that only read changes nothing.  A session
+        with changes, flushed or not, keeps its transaction.
+        """
+        if session.transaction is None or \
+                session.info.get('bauble.flushed') or \
+                session.new or session.dirty or session.deleted:
+            return False
+        session.commit()
+        return False
 
     def add_notes_page_to_bottom_notebook(self):
         '''add notebook page for notes
@@ -628,47 +991,114 @@ class SearchView(pluginmgr.View):
                     model.append([getattr(obj, k)
                                   for k in bottom_info['fields_used']])
 
+    # how long, in milliseconds, the selection has to stay on a row
+    # before its infobox is loaded
+    infobox_delay = 150
+
     def update_infobox(self):
         '''
         Sets the infobox according to the currently selected row.
         no infobox is shown if nothing is selected
+
+        The infobox is updated once the selection has not changed for
+        infobox_delay milliseconds, after an InfoBoxLoader has run the
+        queries of its expanders, so that moving the cursor through the
+        results does not load the infobox of every row on the way.
         '''
+        logger.debug('update_infobox')
+        self.cancel_infobox_update()
+        values = self.get_selected_values()
+        if not values:
+            self.set_infobox_from_row(None)
+            return
 
-        def set_infobox_from_row(row):
-            '''implement the logic for update_infobox'''
+        if object_session(values[0]) is None:
+            logger.debug('cannot populate info box from detached object')
+            return
 
-            logger.debug('set_infobox_from_row: %s --  %s' % (row, repr(row)))
-            # remove the current infobox if there is one and it is not needed
-            if row is None:
-                if self.infobox is not None and \
-                        self.infobox.parent == self.pane:
-                    self.pane.remove(self.infobox)
-                return
+        self.infobox_timeout = gobject.timeout_add(
+            self.infobox_delay, self.load_infobox, values[0])
 
-            new_infobox = None
-            selected_type = type(row)
-
-            # if we have already created an infobox of this type:
-            if selected_type in self.infobox_cache.keys():
-                new_infobox = self.infobox_cache[selected_type]
-            # if selected_type defines an infobox class:
-            elif selected_type in self.row_meta and \
-                    self.row_meta[selected_type].infobox is not None:
-                logger.debug('%s defines infobox class %s'
-                             % (selected_type,
-                                self.row_meta[selected_type].infobox))
-                # it might be in cache under different name
-                for ib in self.infobox_cache.values():
-                    if isinstance(ib, self.row_meta[selected_type].infobox):
-                        logger.debug('found same infobox under different name')
-                        new_infobox = ib
-                # otherwise create one and put in the infobox_cache
-                if not new_infobox:
-                    logger.debug('not found infobox, we make a new one')
-                    new_infobox = self.row_meta[selected_type].infobox()
-                self.infobox_cache[selected_type] = new_infobox
-            logger.debug('created or retrieved infobox %s %s'
-                         % (type(new_infobox), new_infobox))
+    def cancel_infobox_update(self):
+        '''
+        Forget the infobox update that is waiting or loading, if any.
+        '''
+        if self.infobox_timeout is not None:
+            gobject.source_remove(self.infobox_timeout)
+            self.infobox_timeout = None
+        if self.infobox_loader is not None:
+            self.infobox_loader.cancel()
+            self.infobox_loader = None
+
+    def load_infobox(self, row):
+        '''
+        Start loading the infobox of row, called by the update_infobox
+        timeout.
+        '''
+        self.infobox_timeout = None
+        infobox = self.get_infobox(type(row))
+        if infobox is None:
+            self.set_infobox_from_row(row)
+            return False
+
+        def on_loaded(loaded):
+            if self.infobox_loader is not loader:
+                # the selection changed in the meantime
+                return False
+            self.infobox_loader = None
+            infobox.set_loaded(loaded)
+            self.set_infobox_from_row(row)
+            return False
+
+        loader = InfoBoxLoader(infobox, type(row), row.id, on_loaded)
+        self.infobox_loader = loader
+        loader.start()
+        return False
+
+    def get_infobox(self, selected_type):
+        '''
+        Return the infobox for rows of selected_type, or None if the
+        type does not define one.
+        '''
+        new_infobox = None
+        # if we have already created an infobox of this type:
+        if selected_type in self.infobox_cache.keys():
+            new_infobox = self.infobox_cache[selected_type]
+        # if selected_type defines an infobox class:
+        elif selected_type in self.row_meta and \
+                self.row_meta[selected_type].infobox is not None:
+            logger.debug('%s defines infobox class %s'
+                         % (selected_type,
+                            self.row_meta[selected_type].infobox))
+            # it might be in cache under different name
+            for ib in self.infobox_cache.values():
+                if isinstance(ib, self.row_meta[selected_type].infobox):
+                    logger.debug('found same infobox under different name')
+                    new_infobox = ib
+            # otherwise create one and put in the infobox_cache
+            if not new_infobox:
+                logger.debug('not found infobox, we make a new one')
+                new_infobox = self.row_meta[selected_type].infobox()
+            self.infobox_cache[selected_type] = new_infobox
+        logger.debug('created or retrieved infobox %s %s'
+                     % (type(new_infobox), new_infobox))
+        return new_infobox
+
+    def set_infobox_from_row(self, row):
+        '''
+        Show the infobox of row in the pane, or remove the current
+        infobox if row is None.
+        '''
+        logger.debug('set_infobox_from_row: %s --  %s' % (row, repr(row)))
+        # remove the current infobox if there is one and it is not needed
+        if row is None:
+            if self.infobox is not None and \
+                    self.infobox.parent == self.pane:
+                self.pane.remove(self.infobox)
+            return
+
+        try:
+            new_infobox = self.get_infobox(type(row))
 
             # remove any old infoboxes connected to the pane
             if self.infobox is not None and \
@@ -681,27 +1111,14 @@ class SearchView(pluginmgr.View):
             if self.infobox is not None:
                 self.pane.pack2(self.infobox, resize=False, shrink=True)
                 self.pane.show_all()
-                self.infobox.update(row)
-
-        # start of update_infobox
-        logger.debug('update_infobox')
-        values = self.get_selected_values()
-        if not values:
-            set_infobox_from_row(None)
-            return
-
-        if object_session(values[0]) is None:
-            logger.debug('cannot populate info box from detached object')
-            return
-
-        try:
-            set_infobox_from_row(values[0])
+                with sqlprofile.operation(
+                        'infobox update %s' % type(row).__name__):
+                    self.infobox.update(row)
         except Exception, e:
             # if an error occurrs, log it and empty infobox.
-            logger.debug('SearchView.update_infobox: %s' % e)
+            logger.debug('SearchView.set_infobox_from_row: %s' % e)
             logger.debug(traceback.format_exc())
-            logger.debug(values)
-            set_infobox_from_row(None)
+            self.set_infobox_from_row(None)
 
     def get_selected_values(self):
         '''
@@ -717,6 +1134,15 @@ class SearchView(pluginmgr.View):
         Update the infobox and switch the accelerators depending on the
         type of the row that the cursor points to.
         '''
+        path, column = view.get_cursor()
+        model = view.get_model()
+        if path is not None and model is not None and \
+                isinstance(model[path][0], MoreChildren):
+            if self.show_more_children(model, path):
+                # the first of the new children is now at path
+                view.set_cursor(path)
+            return
+
         ## update all forward-looking info boxes
         self.update_infobox()
         ## update all backward-looking info boxes
@@ -781,14 +1207,15 @@ class SearchView(pluginmgr.View):
         if False:
             # create a new session for each search...
             self.session.close()
-            self.session = db.Session()
+            self.session = self.new_session()
         else:
             # reuse session, but undo all that has not been committed
             self.session.rollback()
         bold = '<b>%s</b>'
         results = []
         try:
-            results = search.search(text, self.session)
+            with sqlprofile.operation('search'):
+                results = search.search_keys(text, self.session)
         except ParseException, err:
             error_msg = _('Error in search string at column %s') % err.column
         except (BaubleError, AttributeError, Exception, SyntaxError), e:
@@ -813,46 +1240,26 @@ class SearchView(pluginmgr.View):
             model.append([msg])
             self.results_view.set_model(model)
         else:
-            if len(results) > 5000:
-                msg = _('This query returned %s results.  It may take a '
-                        'long time to get all the data. Are you sure you '
-                        'want to continue?') % len(results)
-                if not utils.yes_no_dialog(msg):
-                    return
             statusbar.push(sbcontext_id, _("Retrieving %s search "
                                            "results...") % len(results))
-            try:
-                # don't bother with a task if the results are small,
-                # this keeps the screen from flickering when the main
-                # window is set to a busy state
-                import time
-                start = time.time()
-                if len(results) > 1000:
-                    self.populate_results(results)
-                else:
-                    task = self._populate_worker(results)
-                    while True:
-                        try:
-                            task.next()
-                        except StopIteration:
-                            break
-                logger.debug(time.time() - start)
-            except StopIteration:
-                return
+            import time
+            start = time.time()
+            with sqlprofile.operation('populate'):
+                self.populate_results(results)
+            logger.debug(time.time() - start)
+            statusbar.pop(sbcontext_id)
+            statusbar.push(sbcontext_id, _('counting results'))
+            if len(set(klass for klass, obj_id in results)) == 1:
+                dots_thread = self.start_thread(AddOneDot())
+                self.start_thread(CountResultsTask(
+                    results[0][0], [obj_id for klass, obj_id in results],
+                    dots_thread))
             else:
-                statusbar.pop(sbcontext_id)
-                statusbar.push(sbcontext_id, _('counting results'))
-                if len(set(item.__class__ for item in results)) == 1:
-                    dots_thread = self.start_thread(AddOneDot())
-                    self.start_thread(CountResultsTask(
-                        results[0].__class__, [i.id for i in results],
-                        dots_thread))
-                else:
-                    statusbar.push(sbcontext_id,
-                                   _('size of non homogeneous result: %s') %
-                                   len(results))
-                self.results_view.set_cursor(0)
-                gobject.idle_add(lambda: self.results_view.scroll_to_cell(0))
+                statusbar.push(sbcontext_id,
+                               _('size of non homogeneous result: %s') %
+                               len(results))
+            self.results_view.set_cursor(0)
+            gobject.idle_add(lambda: self.results_view.scroll_to_cell(0))
 
         self.update_bottom_notebook()
 
@@ -877,12 +1284,14 @@ class SearchView(pluginmgr.View):
         self.remove_children(model, treeiter)
         try:
             kids = self.row_meta[type(row)].get_children(row)
-            if len(kids) == 0:
+            if not isinstance(kids, (orm.Query, db.SortedChildren)):
+                kids = sorted(kids, key=utils.natsort_key)
+            if not self.append_children_page(model, treeiter, kids, 0):
                 return True
         except saexc.InvalidRequestError, e:
             logger.debug(utils.utf8(e))
             model = self.results_view.get_model()
-            for found in utils.search_tree_model(model, row):
+            for found in find_in_model(model, row):
                 model.remove(found)
             return True
         except Exception, e:
@@ -890,73 +1299,90 @@ class SearchView(pluginmgr.View):
             logger.debug(traceback.format_exc())
             return True
         else:
-            self.append_children(
-                model, treeiter, sorted(kids, key=utils.natsort_key))
             return False
 
-    def populate_results(self, results, check_for_kids=False):
-        """
-        Adds results to the search view in a task.
+    # the number of children appended to an expanded row at a time
+    children_page = 500
 
-        :param results: a list or list-like object
-        :param check_for_kids: only used for testing
+    def append_children_page(self, model, parent, kids, offset):
         """
-        bauble.task.queue(self._populate_worker(results, check_for_kids))
+        Append a page of kids to parent, starting at offset, followed by
+        a MoreChildren row if there are more kids after the page.
+
+        :param kids: a query, which is then sorted by the database, or
+          an already sorted list or db.SortedChildren
 
-    def _populate_worker(self, results, check_for_kids=False):
+        Returns the number of kids appended.
         """
-        Generator function for adding the search results to the
-        model. This method is usually called by self.populate_results()
+        if isinstance(kids, orm.Query):
+            page = kids.offset(offset).limit(self.children_page + 1).all()
+        else:
+            page = kids[offset:offset + self.children_page + 1]
+        self.append_children(model, parent, page[:self.children_page])
+        if len(page) > self.children_page:
+            model.append(parent,
+                         [MoreChildren(kids, offset + self.children_page)])
+        return len(page[:self.children_page])
+
+    def show_more_children(self, model, path):
         """
-        nresults = len(results)
-        model = gtk.TreeStore(object)
-        model.set_default_sort_func(lambda *args: -1)
-        model.set_sort_column_id(-1, gtk.SORT_ASCENDING)
-        utils.clear_model(self.results_view)
-
-        groups = []
-
-        # sort by type so that groupby works properly
-        results = sorted(results, key=lambda x: type(x))
-
-        for key, group in itertools.groupby(results, key=lambda x: type(x)):
-            # return groups by type and natural sort each of the
-            # groups by their strings
-            groups.append(sorted(group, key=utils.natsort_key, reverse=True))
+        Replace the MoreChildren row at path with the next page of
+        children.  Returns the number of children appended.
+        """
+        treeiter = model.get_iter(path)
+        more = model[treeiter][0]
+        parent = model.iter_parent(treeiter)
+        model.remove(treeiter)
+        return self.append_children_page(model, parent, more.kids,
+                                         more.offset)
+
+    def sorted_keys(self, keys):
+        """
+        Return the (class, id) keys sorted for the results view, grouped
+        by class.
 
-        # sort the groups by type so we more or less always get the
-        # results by type in the same order
-        groups = sorted(groups, key=lambda x: type(x[0]), reverse=True)
+        The objects of a class are naturally sorted on the attributes
+        their string representation shows, klass.search_view_order, by
+        default the first property registered with the MapperSearch.
+        Only the ids and these attributes are selected, so the objects
+        are not loaded and the order doesn't depend on the size of the
+        group.
 
-        update_every = 200
-        steps_so_far = 0
+        :param keys: a list or list-like object of (class, id) pairs
+        """
+        groups = {}
+        for klass, obj_id in keys:
+            groups.setdefault(klass, set()).add(obj_id)
+        result = []
+        for klass in sorted(groups, key=lambda k: k.__name__):
+            ids = list(groups[klass])
+            order_by = getattr(klass, 'search_view_order', None) or \
+                search.MapperSearch._properties.get(klass, [])[:1]
+            if order_by:
+                rows = []
+                for start in range(0, len(ids), db.MAX_IN_IDS):
+                    chunk = ids[start:start + db.MAX_IN_IDS]
+                    rows.extend(db.order_by_rows(
+                        self.session.query(klass).filter(
+                            klass.id.in_(chunk)), order_by))
+                rows.sort(key=db.natsort_row_key)
+                ids = [row[0] for row in rows]
+            else:
+                ids.sort()
+            result.extend((klass, obj_id) for obj_id in ids)
+        return result
 
-        # iterate over slice of size "steps", yield after adding each
-        # slice to the model
-        #for obj in itertools.islice(itertools.chain(*groups), 0,None, steps):
-        #for obj in itertools.islice(itertools.chain(results), 0,None, steps):
+    def populate_results(self, keys):
+        """
+        Set a lazy SearchResultsModel holding the objects of keys as the
+        model of the results view.
 
-        added = set()
-        for obj in itertools.chain(*groups):
-            if obj in added:  # only add unique object
-                continue
-            else:
-                added.add(obj)
-            parent = model.prepend(None, [obj])
-            obj_type = type(obj)
-            if check_for_kids:
-                kids = self.row_meta[obj_type].get_children(obj)
-                if len(kids) > 0:
-                    model.prepend(parent, ['-'])
-            elif self.row_meta[obj_type].children is not None:
-                model.prepend(parent, ['-'])
-            #steps_so_far += chunk_size
-            steps_so_far += 1
-            if steps_so_far % update_every == 0:
-                percent = float(steps_so_far)/float(nresults)
-                if 0 < percent < 1.0:
-                    bauble.gui.progressbar.set_fraction(percent)
-                yield
+        :param keys: a list or list-like object of (class, id) pairs
+        """
+        self.reset_markup_cache()
+        model = SearchResultsModel(
+            self.session, self.sorted_keys(keys),
+            lambda klass: self.row_meta[klass].children is not None)
         self.results_view.freeze_child_notify()
         self.results_view.set_model(model)
         self.results_view.thaw_child_notify()
@@ -977,6 +1403,216 @@ class SearchView(pluginmgr.View):
                 model.append(i, ["_dummy"])
         return model
 
+    @staticmethod
+    def markup_key(value):
+        """
+        Return the (class, identity) key of value in the markup cache,
+        without loading value if it is expired.  None if value is not
+        persistent.
+        """
+        try:
+            state = sa.inspect(value)
+        except saexc.NoInspectionAvailable:
+            return None
+        if state.key is None:
+            return None
+        return (type(value), state.identity)
+
+    def row_markup(self, value):
+        """
+        Return the markup shown in the results view for value.
+        """
+        # if the value isn't part of a session then add it to the
+        # view's session so that we can access its child
+        # properties...this usually happens when one of the
+        # ViewMeta's get_children() functions return a list of
+        # object whose session was closed...we add it here for
+        # performance reasons so we only add it once it's visible
+        if not object_session(value):
+            if value in self.session:
+                # expire the object in the session with the same key
+                self.session.expire(value)
+            else:
+                self.session.merge(value)
+        r = value.search_view_markup_pair()
+        try:
+            main, substr = r
+        except:
+            main = r
+            substr = '(%s)' % type(value).__name__
+        return '%s\n%s' % (_mainstr_tmpl % utils.utf8(main),
+                            _substr_tmpl % utils.utf8(substr))
+
+    def visible_values(self):
+        """
+        Return the database objects in the rows of the results view
+        that are currently on screen, in display order.
+        """
+        visible = self.results_view.get_visible_range()
+        model = self.results_view.get_model()
+        if not visible or model is None:
+            return []
+        start, end = visible
+        values = []
+        treeiter = model.get_iter(start)
+        while treeiter is not None:
+            value = model[treeiter][0]
+            if not isinstance(value, (basestring, MoreChildren)):
+                values.append(value)
+            path = model.get_path(treeiter)
+            if path >= end:
+                break
+            if model.iter_has_child(treeiter) and \
+                    self.results_view.row_expanded(path):
+                treeiter = model.iter_children(treeiter)
+                continue
+            while treeiter is not None:
+                following = model.iter_next(treeiter)
+                if following is not None:
+                    treeiter = following
+                    break
+                treeiter = model.iter_parent(treeiter)
+        return values
+
+    def prefetch(self, klass, ids):
+        """
+        Load the relations listed in klass.search_view_prefetch for the
+        objects of klass with the given ids.
+
+        The objects are queried again with a subquery load of each
+        relation path, so a relation costs one IN query per chunk of
+        ids instead of one lazy load per object.
+        """
+        paths = getattr(klass, 'search_view_prefetch', None)
+        if not paths or not ids:
+            return
+        options = [orm.subqueryload_all(path) for path in paths]
+        for start in range(0, len(ids), db.MAX_IN_IDS):
+            chunk = ids[start:start + db.MAX_IN_IDS]
+            self.session.query(klass).filter(klass.id.in_(chunk)).\
+                options(*options).all()
+
+    def fill_markup_cache(self):
+        """
+        Compute the markup of the rows on screen that is not cached yet.
+        """
+        missing = []
+        ids = {}
+        for value in self.visible_values():
+            key = self.markup_key(value)
+            if key is None or key in self.markup_cache:
+                continue
+            missing.append((key, value))
+            if object_session(value) is self.session:
+                ids.setdefault(key[0], []).append(key[1][0])
+        for klass, klass_ids in ids.items():
+            try:
+                self.prefetch(klass, klass_ids)
+            except Exception, e:
+                logger.debug('prefetch(): (%s)%s' % (type(e), e))
+        for key, value in missing:
+            try:
+                self.markup_cache[key] = self.row_markup(value)
+            except Exception, e:
+                # cell_data_func deals with it when the row is painted
+                logger.debug('fill_markup_cache(): (%s)%s' % (type(e), e))
+
+    def reset_markup_cache(self):
+        """
+        Empty the markup cache and remember the last history row, the
+        view is up to date with the database up to that change.
+        """
+        self.markup_cache = {}
+        self.history_id = self.session.query(
+            func.max(db.History.id)).scalar()
+
+    def read_changes(self):
+        """
+        Return the (class, (id, )) keys of the objects changed since
+        the last call, and whether any of them was inserted.
+        """
+        changes = self.session.query(
+            db.History.id, db.History.table_name, db.History.table_id,
+            db.History.operation).\
+            filter(db.History.id > (self.history_id or 0)).all()
+        changed = set()
+        inserted = False
+        for id, table, row_id, operation in changes:
+            self.history_id = max(id, self.history_id)
+            klass = db.class_of_table(table)
+            if klass is not None:
+                changed.add((klass, (row_id, )))
+            inserted = inserted or operation == 'insert'
+        return changed, inserted
+
+    def forget_changed(self, keys):
+        """
+        Expire the objects with the given (class, (id, )) keys that are
+        in the view's session and drop their markup.
+        """
+        for key in keys:
+            obj = self.session.identity_map.get(key)
+            if obj is not None:
+                self.session.expire(obj)
+                _invalidate_str_cache(obj)
+            self.markup_cache.pop(key, None)
+
+    # the classes whose objects the markup of a class reads, by class
+    _markup_dependencies = {}
+
+    @classmethod
+    def markup_dependencies(cls, klass):
+        """
+        Return the set of the classes reached by the relation paths in
+        klass.search_view_prefetch, the markup of klass shows them.
+        """
+        try:
+            return cls._markup_dependencies[klass]
+        except KeyError:
+            pass
+        dependencies = set()
+        for path in getattr(klass, 'search_view_prefetch', None) or []:
+            target = klass
+            for name in path.split('.'):
+                target = sa.inspect(target).relationships[name].mapper.class_
+                dependencies.add(target)
+        cls._markup_dependencies[klass] = dependencies
+        return dependencies
+
+    def refresh_changed_rows(self, model, changed):
+        """
+        Re-render the rows of model showing one of the changed objects,
+        together with their ancestors and children, which may show data
+        of the changed object too, and the rows whose markup reads an
+        object of a changed class.  Rows not loaded yet are not loaded.
+        """
+        self.forget_changed(changed)
+        changed_classes = set(key[0] for key in changed)
+        readers = lambda klass: \
+            self.markup_dependencies(klass) & changed_classes
+        self.forget_changed([key for key in self.markup_cache
+                             if readers(key[0])])
+        related = []
+        for row in model.walk_rows():
+            key = row.key and (row.key[0], (row.key[1], )) or \
+                self.markup_key(row.value)
+            if key is not None and key not in changed and readers(key[0]):
+                related.append(row)
+                continue
+            if key not in changed:
+                continue
+            related.append(row)
+            related.extend(row.children or [])
+            parent = row.parent
+            while parent is not None:
+                related.append(parent)
+                parent = parent.parent
+        self.forget_changed(filter(None, [self.markup_key(row.value)
+                                          for row in related]))
+        for row in related:
+            treeiter = model.create_tree_iter(row)
+            model.row_changed(model.get_path(treeiter), treeiter)
+
     def cell_data_func(self, col, cell, model, treeiter):
         # start with a (redundant) check, whether the cell is visible.
         path = model.get_path(treeiter)
@@ -986,54 +1622,44 @@ class SearchView(pluginmgr.View):
             return
         # now update the the cell
         value = model[treeiter][0]
-        #logger.debug('TBR: far too detailed, please do not keep us here')
-        #logger.debug('TBR: %s' % value)
         if isinstance(value, basestring):
             cell.set_property('markup', value)
-        else:
-            # if the value isn't part of a session then add it to the
-            # view's session so that we can access its child
-            # properties...this usually happens when one of the
-            # ViewMeta's get_children() functions return a list of
-            # object whose session was closed...we add it here for
-            # performance reasons so we only add it once it's visible
-            if not object_session(value):
-                if value in self.session:
-                    # expire the object in the session with the same key
-                    self.session.expire(value)
-                else:
-                    self.session.merge(value)
-            try:
-                r = value.search_view_markup_pair()
-                #logger.debug('TBR: %s' % str(r))
-                try:
-                    main, substr = r
-                except:
-                    main = r
-                    substr = '(%s)' % type(value).__name__
-                cell.set_property(
-                    'markup', '%s\n%s' %
-                    (_mainstr_tmpl % utils.utf8(main),
-                     _substr_tmpl % utils.utf8(substr)))
-
-            except (saexc.InvalidRequestError, TypeError), e:
-                logger.warning(
-                    'bauble.view.SearchView.cell_data_func(): \n(%s)%s' %
-                    (type(e), e))
-
-                def remove():
-                    model = self.results_view.get_model()
-                    self.results_view.set_model(None)  # detach model
-                    for found in utils.search_tree_model(model, value):
-                        model.remove(found)
-                    self.results_view.set_model(model)
-                gobject.idle_add(remove)
+            return
+        if isinstance(value, MoreChildren):
+            cell.set_property('markup', value.markup)
+            return
+        key = self.markup_key(value)
+        markup = self.markup_cache.get(key)
+        if markup is None and key is not None:
+            # compute the markup of the whole screen at once
+            self.fill_markup_cache()
+            markup = self.markup_cache.get(key)
+        if markup is not None:
+            cell.set_property('markup', markup)
+            return
+        try:
+            markup = self.row_markup(value)
+            if key is not None:
+                self.markup_cache[key] = markup
+            cell.set_property('markup', markup)
+        except (saexc.InvalidRequestError, TypeError), e:
+            logger.warning(
+                'bauble.view.SearchView.cell_data_func(): \n(%s)%s' %
+                (type(e), e))
+
+            def remove():
+                model = self.results_view.get_model()
+                self.results_view.set_model(None)  # detach model
+                for found in find_in_model(model, value):
+                    model.remove(found)
+                self.results_view.set_model(model)
+            gobject.idle_add(remove)
 
-            except Exception, e:
-                logger.error(
-                    'bauble.view.SearchView.cell_data_func(): \n(%s)%s' %
-                    (type(e), e))
-                raise
+        except Exception, e:
+            logger.error(
+                'bauble.view.SearchView.cell_data_func(): \n(%s)%s' %
+                (type(e), e))
+            raise
 
     def get_expanded_rows(self):
         '''
@@ -1130,9 +1756,10 @@ class SearchView(pluginmgr.View):
 
     def update(self):
         """
-        Expire all the children in the model, collapse everything,
-        reexpand the rows to the previous state where possible and
-        update the infobox.
+        Re-render the rows changed since the last refresh, as found in
+        the history table, and update the infobox.  If objects were
+        inserted collapse everything and reexpand the rows to the
+        previous state where possible, to show the new children.
         """
         logger.debug('SearchView::update')
         model, paths = self.results_view.get_selection().get_selected_rows()
@@ -1144,17 +1771,24 @@ class SearchView(pluginmgr.View):
         except:
             pass
 
-        self.session.expire_all()
-
-        # the invalidate_str_cache() method are specific to Species
-        # and Accession right now....it's a bit of a hack since there's
-        # no real interface that the method complies to...but it does
-        # fix our string caching issues
-        def invalidate_cache(model, path, treeiter, data=None):
-            obj = model[path][0]
-            if hasattr(obj, 'invalidate_str_cache'):
-                obj.invalidate_str_cache()
-        model.foreach(invalidate_cache)
+        if isinstance(model, SearchResultsModel):
+            changed, inserted = self.read_changes()
+            if not inserted:
+                # nothing new to show, re-render the changed rows only
+                self.refresh_changed_rows(model, changed)
+                self.update_infobox()
+                self.update_bottom_notebook()
+                return
+            # a new object can be the child of any row, and change its
+            # markup, like the number of plants of an accession
+            self.session.expire_all()
+            self.markup_cache.clear()
+            map(_invalidate_str_cache, list(model.loaded_values()))
+        elif model is not None:
+            self.session.expire_all()
+            self.markup_cache.clear()
+            model.foreach(
+                lambda m, path, i: _invalidate_str_cache(m[path][0]))
         expanded_rows = self.get_expanded_rows()
         self.results_view.collapse_all()
         # expand_to_all_refs will invalidate the ref so get the path first
@@ -1274,43 +1908,81 @@ class Note:
 
 
 class AppendThousandRows(threading.Thread):
+    """
+    Append the next thousand rows of the history to the view, starting
+    after the (timestamp, id) key of the last row it shows and narrowed
+    by the filters of the view, see :meth:`bauble.db.History.filtered`.
+    """
+
+    # how many rows to get with a single query
+    step = 200
 
     def callback(self, rows):
+        if self.view.loader is not self:
+            return
         for row in rows:
             self.view.add_row(row)
+        self.view.last_key = rows[-1].timestamp, rows[-1].id
 
-    def cancel_callback(self):
-        row = ['---'] * 6
-        row[4] = '** ' + _('interrupted') + ' **'
-        self.view.liststore.append(row)
+    def done_callback(self, exhausted):
+        if self.view.loader is not self:
+            return
+        self.view.loader = None
+        self.view.exhausted = exhausted
 
-    def __init__(self, view, group=None, verbose=None, **kwargs):
+    def __init__(self, view, key=None, filters={}, group=None, verbose=None,
+                 **kwargs):
         super(AppendThousandRows, self).__init__(
             group=group, target=None, name=None, verbose=verbose)
         self.__stopped = threading.Event()
         self.view = view
+        self.key = key
+        self.filters = filters
 
     def cancel(self):
         self.__stopped.set()
 
+    @staticmethod
+    def next_rows(session, key, limit, **filters):
+        """
+        Return the first `limit` history rows, from the newest, that
+        come after the (timestamp, id) `key`, or from the first if key
+        is None.  The filters are passed to db.History.filtered.
+        """
+        History = db.History
+        q = History.filtered(session, **filters).\
+            order_by(History.timestamp.desc(), History.id.desc())
+        if key is not None:
+            timestamp, id = key
+            q = q.filter(sa.or_(History.timestamp < timestamp,
+                                sa.and_(History.timestamp == timestamp,
+                                        History.id < id)))
+        return q.limit(limit).all()
+
     def run(self):
-        session = db.Session()
-        q = session.query(db.History).order_by(db.History.timestamp.desc())
-        # add rows in small batches
-        offset = 0
-        step = 200
-        count = q.count()
-        while offset < count and not self.__stopped.isSet():
-            rows = q.offset(offset).limit(step).all()
-            gobject.idle_add(self.callback, rows)
-            offset += step
-        session.close()
-        if offset < count:
-            gobject.idle_add(self.cancel_callback)
+        key = self.key
+        appended = 0
+        exhausted = False
+        with db.session_scope() as session:
+            while appended < 1000 and not self.__stopped.isSet():
+                rows = self.next_rows(session, key, self.step, **self.filters)
+                if rows:
+                    gobject.idle_add(self.callback, rows)
+                    key = rows[-1].timestamp, rows[-1].id
+                    appended += len(rows)
+                if len(rows) < self.step:
+                    exhausted = True
+                    break
+        gobject.idle_add(self.done_callback, exhausted)
 
 
 class HistoryView(pluginmgr.View):
     """Show the tables row in the order they were last updated
+
+    The rows are appended a thousand at a time, when the view is
+    scrolled close to its end, and the values of a row are only made
+    readable when the row is shown.  The filter bar above the rows
+    narrows them by table, row id, user and time range.
     """
 
     TVC_TIMESTAMP = 0
@@ -1327,6 +1999,22 @@ class HistoryView(pluginmgr.View):
             root_widget_name='history_window')
         self.view.connect_signals(self)
         self.liststore = self.view.widgets.history_ls
+        # the (timestamp, id) of the last row in the view
+        self.last_key = None
+        # whether the last row in the view is the oldest in the history
+        self.exhausted = False
+        # the AppendThousandRows thread that is appending rows, if any
+        self.loader = None
+        # the keyword arguments to db.History.filtered
+        self.filters = {}
+        # the readable values of the rows shown so far, by their values
+        self.friendly = {}
+        self.create_filter_bar()
+        self.view.widgets.history_treeviewcolumn4.set_cell_data_func(
+            self.view.widgets.history_cellrenderertext4,
+            self.values_cell_data_func)
+        self.view.widgets.history_sv.get_vadjustment().connect(
+            'value-changed', self.on_scrolled)
         self.update()
 
     @staticmethod
@@ -1350,26 +2038,137 @@ class HistoryView(pluginmgr.View):
     @staticmethod
     def show_typed_value(v):
         try:
-            eval(v)
+            literal_eval(v)
             return v
-        except:
+        except (ValueError, SyntaxError):
             return u"»%s«" % v
 
+    @staticmethod
+    def parse_values(values):
+        """
+        Return the dictionary in the values of a history row, or an
+        empty dictionary if values does not hold one.
+        """
+        try:
+            d = literal_eval(values)
+        except (ValueError, SyntaxError):
+            logger.debug('cannot parse history values %s' % values)
+            return {}
+        if not isinstance(d, dict):
+            return {}
+        return d
+
+    def friendly_values(self, values):
+        d = self.parse_values(values)
+        d.pop('_created', None)
+        d.pop('_last_updated', None)
+        return ', '.join(u"%s: %s" % (k, self.show_typed_value(v))
+                         for k, v in sorted(d.items(), self.cmp_items))
+
+    def values_cell_data_func(self, column, cell, model, treeiter):
+        # setting a value of the model here would emit row-changed
+        # while the view is being painted, keep them aside instead
+        values = model.get_value(treeiter, self.TVC_DICT)
+        friendly = self.friendly.get(values)
+        if friendly is None:
+            friendly = self.friendly[values] = self.friendly_values(values)
+        cell.set_property('text', friendly)
+
     def add_row(self, item):
-        d = eval(item.values)
-        del d['_created']
-        del d['_last_updated']
-        friendly = ', '.join(u"%s: %s" % (k, self.show_typed_value(v))
-                             for k, v in sorted(d.items(), self.cmp_items)
-                             )
         self.liststore.append([
             ("%s" % item.timestamp)[:19], item.operation, item.user,
-            item.table_name, friendly, item.values
+            item.table_name, None, item.values
             ])
 
+    def create_filter_bar(self):
+        """
+        Put the entries to filter the history above the rows.
+        """
+        bar = gtk.HBox(spacing=5)
+        bar.set_border_width(5)
+        self.filter_entries = {}
+        for name, label in [('table_name', _('Table')),
+                            ('table_id', _('ID')),
+                            ('user', _('User')),
+                            ('since', _('From')),
+                            ('until', _('To'))]:
+            bar.pack_start(gtk.Label(label), expand=False, fill=False)
+            entry = gtk.Entry()
+            entry.set_width_chars(12)
+            entry.connect('activate', self.on_filter_activated)
+            bar.pack_start(entry, expand=False, fill=False)
+            self.filter_entries[name] = entry
+        button = gtk.Button(_('Filter'))
+        button.connect('clicked', self.on_filter_activated)
+        bar.pack_start(button, expand=False, fill=False)
+        self.pack_start(bar, expand=False, fill=False)
+        self.reorder_child(bar, 0)
+        bar.show_all()
+
+    @staticmethod
+    def parse_filters(texts):
+        """
+        Return the keyword arguments to db.History.filtered from the
+        texts of the filter entries, by argument name.
+
+        Raise ValueError if the ID or a date cannot be parsed.
+        """
+        filters = {}
+        for name, text in texts.items():
+            text = text.strip()
+            if not text:
+                continue
+            if name == 'table_id':
+                filters[name] = int(text)
+            elif name in ('since', 'until'):
+                filters[name] = date_parser.parse(
+                    text, dayfirst=prefs.prefs[prefs.parse_dayfirst_pref],
+                    yearfirst=prefs.prefs[prefs.parse_yearfirst_pref])
+            else:
+                filters[name] = utils.to_unicode(text)
+        return filters
+
+    def on_filter_activated(self, *args):
+        texts = dict((name, entry.get_text())
+                     for name, entry in self.filter_entries.items())
+        try:
+            filters = self.parse_filters(texts)
+        except ValueError, e:
+            utils.message_dialog(utils.xml_safe(e), gtk.MESSAGE_ERROR)
+            return
+        self.set_filters(**filters)
+
+    def set_filters(self, **filters):
+        """
+        Show only the history rows that match filters, see
+        db.History.filtered for the accepted names.
+        """
+        self.filters = filters
+        for name, entry in self.filter_entries.items():
+            value = filters.get(name)
+            entry.set_text(value is not None and utils.utf8(value) or '')
+        self.update()
+
+    def on_scrolled(self, adjustment):
+        # get more rows once the last screenful is in sight
+        if adjustment.value + 2 * adjustment.page_size >= adjustment.upper:
+            self.append_rows()
+
+    def append_rows(self):
+        """
+        Append the next thousand rows of the history, unless they are
+        already being appended or there are no more.
+        """
+        if self.loader is not None or self.exhausted:
+            return
+        self.loader = self.start_thread(
+            AppendThousandRows(self, self.last_key, self.filters))
+
     def on_row_activated(self, tree, path, column):
         row = self.liststore[path]
-        dic = eval(row[self.TVC_DICT])
+        dic = self.parse_values(row[self.TVC_DICT])
+        if 'id' not in dic:
+            return
         table = row[self.TVC_TABLE]
         obj_id = int(dic['id'])
         for table_name, equivalent, key in [
@@ -1397,8 +2196,14 @@ class HistoryView(pluginmgr.View):
         """
         Add the history items to the view.
         """
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
         self.liststore.clear()
-        self.start_thread(AppendThousandRows(self))
+        self.friendly.clear()
+        self.last_key = None
+        self.exhausted = False
+        self.append_rows()
 
 
 class HistoryCommandHandler(pluginmgr.CommandHandler):
@@ -1421,6 +2226,71 @@ class HistoryCommandHandler(pluginmgr.CommandHandler):
 pluginmgr.register_command(HistoryCommandHandler)
 
 
+class IndexesCommandHandler(pluginmgr.CommandHandler):
+    """
+    Create the indexes missing from a database made by an older
+    version, with the command `:indexes`.
+    """
+
+    command = 'indexes'
+    view = None
+
+    def __call__(self, cmd, arg):
+        try:
+            created = db.create_missing_indexes()
+        except Exception, e:
+            utils.message_details_dialog(
+                _('Could not create the indexes.\n\n%s') %
+                utils.xml_safe(e), traceback.format_exc(), gtk.MESSAGE_ERROR)
+            return
+        if created:
+            msg = _('Created the indexes:\n\n%s') % \
+                utils.xml_safe('\n'.join(created))
+        else:
+            msg = _('No index is missing.')
+        utils.message_dialog(msg)
+
+
+pluginmgr.register_command(IndexesCommandHandler)
+
+
+class SQLProfileCommandHandler(pluginmgr.CommandHandler):
+    """
+    `:sqlprofile on` and `:sqlprofile off` switch the profiling of the
+    SQL statements on and off, `:sqlprofile` shows the summaries of the
+    last operations.  See :mod:`bauble.sqlprofile`.
+    """
+
+    command = 'sqlprofile'
+    view = None
+
+    def __call__(self, cmd, arg):
+        if arg == 'on':
+            sqlprofile.enable()
+        elif arg == 'off':
+            sqlprofile.disable()
+        if sqlprofile.enabled:
+            msg = _('SQL profiling is on, the summaries also go to the log.')
+        else:
+            msg = _('SQL profiling is off.')
+        utils.message_details_dialog(
+            msg, '\n\n'.join(reversed(sqlprofile.recent)))
+
+
+pluginmgr.register_command(SQLProfileCommandHandler)
+
+
+def find_in_model(model, obj):
+    """
+    Return the iters of the rows of model showing obj, a lazy
+    SearchResultsModel is searched on the keys of its rows, without
+    loading them.
+    """
+    if isinstance(model, SearchResultsModel):
+        return model.find(obj)
+    return utils.search_tree_model(model, obj)
+
+
 def select_in_search_results(obj):
     """
     :param obj: the object the select
@@ -1438,7 +2308,7 @@ def select_in_search_results(obj):
     logger.debug("select_in_search_results %s is in session %s" %
                  (obj, obj in view.session))
     model = view.results_view.get_model()
-    found = utils.search_tree_model(model, obj)
+    found = find_in_model(model, obj)
     row_iter = None
     if len(found) > 0:
         row_iter = found[0]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""
+microbenchmark for bauble.search.SearchParser
+
+parses the query syntaxes used in bauble/test/test_search.py, first
+without the statement cache (every parse goes through pyparsing), then
+through SearchParser.parse_string, which only parses each text once.
+
+usage: python scripts/bench_search_parser.py [repetitions]
+"""
+
+import os
+import sys
+import timeit
+
+if 'PYTHONPATH' in os.environ:
+    sys.path.insert(0, os.environ['PYTHONPATH'])
+
+from bauble.search import SearchParser
+
+queries = [
+    'domain=test',
+    'domain==test',
+    "domain='test'",
+    'domain=test1 test2 test3',
+    'domain=test1,test2,test3',
+    'domain like test%',
+    'Echinocactus grusonii',
+    'test1 test2 test3',
+    "'test1', 'test2', 'test3'",
+    'species where species.genus=genus1',
+    'species where species.genus=genus1 OR species.sp=name AND '
+    'species.genus.family.family=name',
+    'species where species.genus=genus1 || species.sp=name && '
+    'species.genus.family.family=name',
+    'species where NOT species.genus.family.family=name',
+    'species where notes.id!=0',
+    'species where id between 0 and 1',
+    'plant where accession.species.id=113',
+    'genus where count(species.id) > 3',
+    'accession where _created > |datetime|-30|',
+    'species where accessions = Empty',
+    'accession where plants = Empty or sum(plants.quantity)=0',
+    ]
+
+
+def main(repetitions=100):
+    parser = SearchParser()
+
+    def uncached():
+        for q in queries:
+            parser.statement.parseString(q)
+
+    def cached():
+        for q in queries:
+            parser.parse_string(q)
+
+    for name, function in [('pyparsing', uncached), ('cached', cached)]:
+        elapsed = min(timeit.repeat(function, number=repetitions, repeat=3))
+        print '%-10s %8.3f ms per round of %d queries' % (
+            name, elapsed * 1000.0 / repetitions, len(queries))
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+"""
+make the missing thumbnails of the pictures in a directory
+
+walks the directory and its subdirectories and decodes each picture
+that has no up to date thumbnail yet, with a pool of processes, so that
+ghini can show the pictures without decoding the originals.  see
+bauble.utils.thumbnails.
+
+usage: python scripts/make_thumbnails.py picture_root [processes]
+"""
+
+import os
+import sys
+
+if 'PYTHONPATH' in os.environ:
+    sys.path.insert(0, os.environ['PYTHONPATH'])
+
+from bauble.utils import thumbnails
+
+
+def main(directory, processes=None):
+    made = thumbnails.make_all(directory, processes)
+    print '%d pictures have a thumbnail in %s' % (made,
+                                                  thumbnails.cache_dir())
+
+
+if __name__ == '__main__':
+    if not sys.argv[1:2]:
+        print __doc__
+        sys.exit(1)
+    main(sys.argv[1], *[int(i) for i in sys.argv[2:3]])